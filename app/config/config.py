@@ -1,3 +1,4 @@
+from typing import Dict, List
 from pydantic_settings import BaseSettings
 import os
 
@@ -22,12 +23,23 @@ class Settings(BaseSettings):
     JSON_DIR: str = os.path.join(DATA_DIR, 'json')
     # Директория для XML файлов
     XML_DIR: str = os.path.join(DATA_DIR, 'xml')
+    # Директория служебных файлов (токен доступа МойСклад, блокировки воркеров) вне
+    # публикуемых и экспортируемых директорий данных
+    STATE_DIR: str = os.path.join(os.path.expanduser('~'), '.warehouse-sync')
+    # Директория для отчетов профилирования запусков сбора данных
+    PROFILE_DIR: str = os.path.join(DATA_DIR, 'profiles')
+    # Профилировать каждый запуск /collect_products
+    PROFILE_SYNC_RUNS: bool = False
     # Путь и название файла для сохранения данных о товарах
     OUTPUT_FILE: str = os.path.join(DATA_DIR, 'products.json')
+    # Адрес базы данных каталога (SQLite локально, mysql+mysqldb://... в продакшене)
+    CATALOG_DB_URL: str = 'sqlite:///' + os.path.join(DATA_DIR, 'catalog.db')
     # ID Google таблицы
     GOOGLE_SPREADSHEET_ID: str = '1kwopnPKCGNeVL-NMjvHE0y6PBugoxJoZgDcwBRb0BN0'
     # Имя листа в Google таблице
     GOOGLE_SHEET_NAME: str = 'Data'
+    # Адрес Google Sheets API (пусто - стандартный; используется для локальной замены в тестах)
+    GOOGLE_SHEETS_ENDPOINT: str = ''
     # Путь к файлу с учетными данными Google
     GOOGLE_CREDENTIALS_FILE: str = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'credentials', 'google_sheets_credentials.json')
 
@@ -35,6 +47,96 @@ class Settings(BaseSettings):
     FTP_HOST: str
     FTP_USER: str
     FTP_PASSWORD: str
+    FTP_PORT: int = 21
+    # Максимальный возраст сохраненного списка изображений FTP в секундах перед повторным обходом
+    FTP_IMAGES_TTL: int = 3600
+
+    # Включение встроенного планировщика обновления источников
+    SCHEDULER_ENABLED: bool = False
+    # Интервалы обновления источников в секундах (0 - источник не обновляется по расписанию)
+    REFRESH_INTERVAL_STOCK: int = 300
+    REFRESH_INTERVAL_BALANCES: int = 900
+    REFRESH_INTERVAL_ASSORTMENT: int = 21600
+    REFRESH_INTERVAL_IMAGES: int = 86400
+    # Интервал быстрого обновления остатков и цен в секундах (0 - отключено)
+    STOCK_TICK_INTERVAL: int = 60
+    # Пауза для накопления событий вебхуков МойСклад перед обработкой в секундах
+    WEBHOOK_DEBOUNCE: float = 3.0
+    # Количество сущностей, при котором пачка вебхуков обрабатывается без ожидания
+    WEBHOOK_MAX_BATCH: int = 500
+    # Задержка перезаписи файлов каталога (JSON, XML) после точечных обновлений в секундах:
+    # обновления за это время объединяются в одну запись
+    CATALOG_OUTPUT_DEBOUNCE: float = 10.0
+    # Пауза перед повторной обработкой пачки вебхуков после ошибки в секундах
+    # (удваивается после каждой следующей ошибки до WEBHOOK_RETRY_MAX_DELAY)
+    WEBHOOK_RETRY_DELAY: float = 5.0
+    # Максимальная пауза перед повторной обработкой пачки вебхуков в секундах
+    WEBHOOK_RETRY_MAX_DELAY: float = 300.0
+    # Токен в параметре token адреса вебхука (пустая строка - проверка отключена)
+    WEBHOOK_TOKEN: str = ''
+    # Интервал замера памяти процесса для метрик в секундах (0 - только при опросе /metrics)
+    METRICS_RSS_SAMPLE_INTERVAL: float = 5.0
+    # Бюджет резидентной памяти процесса в МБ (0 - 80% лимита памяти контейнера)
+    MEMORY_BUDGET_MB: int = 0
+    # Доля бюджета, выше которой загрузка замедляется (меньше страница и параллельность)
+    MEMORY_SOFT_RATIO: float = 0.7
+    # Доля бюджета, выше которой загрузка приостанавливается до освобождения памяти
+    MEMORY_HARD_RATIO: float = 0.9
+    # Максимальное время приостановки загрузки при нехватке памяти в секундах
+    MEMORY_MAX_WAIT: float = 60.0
+    # Границы размера страницы и количества параллельных запросов страниц МойСклад
+    FETCH_MIN_PAGE_SIZE: int = 100
+    FETCH_MAX_PAGE_SIZE: int = 1000
+    FETCH_MAX_CONCURRENCY: int = 3
+    # Уровень логирования
+    LOG_LEVEL: str = 'INFO'
+    # Формат записей лога: text или json (одна строка JSON на запись)
+    LOG_FORMAT: str = 'text'
+    # Ротация logs/sync.log по размеру в байтах (используется, если не задан LOG_ROTATE_WHEN)
+    LOG_MAX_BYTES: int = 10 * 1024 * 1024
+    # Ротация logs/sync.log по времени: midnight, H, D и т.д. (пустая строка - ротация по размеру)
+    LOG_ROTATE_WHEN: str = ''
+    # Количество сохраняемых файлов лога после ротации
+    LOG_BACKUP_COUNT: int = 5
+    # Максимум информационных записей с одного места вызова за LOG_RATE_WINDOW секунд (0 - без ограничения)
+    LOG_RATE_LIMIT: int = 20
+    LOG_RATE_WINDOW: float = 10.0
+    # Размер очереди записей лога для фонового потока записи
+    LOG_QUEUE_SIZE: int = 10000
+    # Контроль задержки цикла событий и поиск блокирующих вызовов (переключается через /loop_monitor)
+    LOOP_MONITOR_ENABLED: bool = True
+    # Интервал замера задержки цикла событий в секундах
+    LOOP_MONITOR_INTERVAL: float = 0.5
+    # Блокировка цикла событий дольше этого времени в секундах логируется со стеком вызовов
+    LOOP_MONITOR_THRESHOLD: float = 0.25
+    # Задержка перед пересборкой каталога, чтобы объединить изменения нескольких источников
+    CATALOG_REBUILD_DELAY: float = 5.0
+    # Количество последних наборов изменений каталога, доступных через /changes
+    CHANGE_SET_RETENTION: int = 20
+    # Кодек архивов сырых данных: gzip, lzma или zstd (Python 3.14+ или пакет zstandard)
+    ARCHIVE_CODEC: str = 'gzip'
+    # Уровень сжатия архивов (gzip и lzma 0-9, zstd 1-22)
+    ARCHIVE_COMPRESSION_LEVEL: int = 6
+    # Количество хранимых архивов каждого набора данных (0 - без ограничения)
+    ARCHIVE_KEEP_COUNT: int = 10
+    # Срок хранения архивов в днях (0 - без ограничения)
+    ARCHIVE_KEEP_DAYS: int = 0
+    # Количество фоновых потоков (процессов) сжатия архивов
+    ARCHIVE_WORKERS: int = 1
+    # Сжимать архивы в пуле процессов вместо пула потоков
+    ARCHIVE_USE_PROCESSES: bool = False
+    # Выходные форматы по наборам данных, JSON в переменной окружения, например
+    # {"stock": ["json"], "catalog": ["json", "sheets"]} (остальные наборы - app/config/output_sinks.py)
+    OUTPUT_SINKS: Dict[str, List[str]] = {}
+    # Количество потоков одновременной записи выходных форматов
+    SINK_WORKERS: int = 4
+    # Срок действия результата загрузки наборов данных /assortment, /warehouse_stock,
+    # /warehouse_balances в секундах (0 - без кэша, одновременные запросы все равно объединяются)
+    FETCH_CACHE_TTL: float = 60.0
+    # Срок действия по наборам данных, например {"assortment": 600, "stock": 30}
+    FETCH_CACHE_TTLS: Dict[str, float] = {}
+    # Форматировать JSON файлы данных с отступом (по умолчанию компактная запись)
+    JSON_PRETTY: bool = False
     class Config:
         env_file = ".env"
 
@@ -44,3 +146,4 @@ settings = Settings()
 os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
 os.makedirs(settings.JSON_DIR, exist_ok=True)
 os.makedirs(settings.XML_DIR, exist_ok=True)
+os.makedirs(settings.STATE_DIR, mode=0o700, exist_ok=True)
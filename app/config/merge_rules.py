@@ -0,0 +1,34 @@
+# Правила объединения записей товаров с одинаковым кодом (поле -> источник значения).
+#
+# В группе записей с одним кодом:
+# - основная запись (primary) - первая запись с артикулом, если таких нет - первая запись группы;
+# - вариант (variant) - запись без артикула с наибольшим остатком, если таких нет - основная запись.
+#
+# Источники значения:
+# - primary - из основной записи;
+# - variant - из варианта;
+# - first_nonempty - первое непустое значение (основная запись, вариант, остальные записи);
+# - max - наибольшее числовое значение в группе;
+# - sum - сумма числовых значений группы;
+# - join - уникальные значения группы через ', ' (для списков вида "Склад 1, Склад 2").
+MERGE_RULES = {
+    'id': 'primary',
+    'article': 'primary',
+    'code': 'primary',
+    'externalCode': 'primary',
+    'pathname': 'primary',
+    'name': 'primary',
+    'description': 'primary',
+    'salePrice': 'variant',
+    'store': 'variant',
+    'stock': 'variant',
+    'updated': 'primary',
+}
+
+# Источник значения для полей, которых нет в MERGE_RULES
+MERGE_DEFAULT_RULE = 'primary'
+
+# Группы, в которых несколько записей с разными артикулами:
+# merge - объединять по правилам (основная запись - первая с артикулом),
+# keep - оставлять записи без объединения
+MERGE_ARTICLE_CONFLICTS = 'merge'
@@ -0,0 +1,28 @@
+# Выходные форматы наборов данных. Хранилище каталога и снимок каталога записываются
+# всегда, перечисленные здесь форматы - по выбору (переопределяются настройкой OUTPUT_SINKS).
+#
+# Форматы:
+#   json     - обработанные строки в JSON_DIR/{файл}.json
+#   xml      - обработанные строки в XML_DIR/{файл}.xml
+#   raw_json - сырые строки МойСклад в JSON_DIR/{файл}_raw.json
+#   archive  - сырые строки в сжатом архиве с историей (ArchiveService)
+#   sheets   - выгрузка каталога в Google Sheets (только для catalog)
+#
+# Неизвестный набор данных или формат приводит к ошибке при запуске приложения.
+#
+# Планировщик определяет изменение источника по его JSON файлу: без формата json
+# набор данных считается изменившимся после каждого обновления.
+OUTPUT_SINKS = {
+    'assortment': ['json', 'xml', 'archive'],
+    'stock': ['json', 'xml', 'raw_json', 'archive'],
+    'balances': ['json'],
+    'catalog': ['json', 'xml', 'sheets'],
+}
+
+# Имя файла и корневой элемент XML наборов данных
+DATASET_FILES = {
+    'assortment': ('assortment', 'assortment'),
+    'stock': ('warehouse_stock', 'warehouse_stock'),
+    'balances': ('warehouse_balances', 'warehouse_balances'),
+    'catalog': ('combined_products', 'products'),
+}
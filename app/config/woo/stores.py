@@ -0,0 +1,83 @@
+from typing import Dict, List, Optional
+from pydantic import BaseModel
+from pydantic_settings import BaseSettings
+from app.config.woo.config_vtoman import woo_config
+
+# Поля товара WooCommerce и поля каталога, из которых они заполняются
+DEFAULT_FIELD_MAPPING = {
+    'name': 'name',
+    'short_description': 'description',
+    'sku': 'code',
+}
+
+
+class PriceRule(BaseModel):
+    # Наценка в процентах к цене каталога
+    markup_percent: float = 0.0
+    # Фиксированная надбавка после наценки
+    add: float = 0.0
+    # Количество знаков после запятой при округлении (None - без округления)
+    round_digits: Optional[int] = None
+
+    def apply(self, price):
+        if price in (None, ''):
+            return price
+        value = float(price) * (1 + self.markup_percent / 100) + self.add
+        if self.round_digits is not None:
+            value = round(value, self.round_digits)
+            if self.round_digits <= 0:
+                value = int(value)
+        return value
+
+
+class WooStoreConfig(BaseModel):
+    # Имя магазина: префикс маршрутов (/{name}/products/...) и метка в отчетах; не должно
+    # совпадать с маршрутами приложения (products, scheduler, metrics и т.д.)
+    name: str
+    url: str
+    consumer_key: str
+    consumer_secret: str
+    version: str = "wc/v3"
+    xml_folder_url: str = ""
+    # Синхронизация магазина включена
+    enabled: bool = True
+    # Максимум одновременных запросов к магазину
+    concurrency: int = 2
+    # Поле товара WooCommerce -> поле каталога (дополняет DEFAULT_FIELD_MAPPING)
+    field_mapping: Dict[str, str] = {}
+    price_rule: PriceRule = PriceRule()
+
+
+def default_stores():
+    """Магазин vtoman из config_vtoman.py (WOO_URL и другие переменные окружения по-прежнему действуют)."""
+    return [WooStoreConfig(
+        name='vtoman',
+        url=woo_config.WOO_URL,
+        consumer_key=woo_config.WOO_CONSUMER_KEY,
+        consumer_secret=woo_config.WOO_CONSUMER_SECRET,
+        version=woo_config.WOO_VERSION,
+        xml_folder_url=woo_config.XML_FOLDER_URL,
+    )]
+
+
+class WooStoresConfig(BaseSettings):
+    # Реестр магазинов WooCommerce, JSON список в переменной окружения WOO_STORES, например:
+    # [{"name": "vtoman", "url": "...", "consumer_key": "...", "consumer_secret": "...",
+    #   "concurrency": 4, "price_rule": {"markup_percent": 10, "round_digits": 0}}]
+    WOO_STORES: List[WooStoreConfig] = []
+
+    class Config:
+        env_file = ".env"
+        extra = "ignore"
+
+
+def load_stores():
+    stores = WooStoresConfig().WOO_STORES or default_stores()
+    names = [store.name for store in stores]
+    duplicates = {name for name in names if names.count(name) > 1}
+    if duplicates:
+        raise ValueError(f"Повторяющиеся имена магазинов WooCommerce: {', '.join(sorted(duplicates))}")
+    return [store for store in stores if store.enabled]
+
+
+woo_stores = load_stores()
@@ -1,11 +1,22 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from app.routers import root, warehouse_stock, assortment, warehouse_balances, product_collector, ftp_images
-from app.routers.woo import vtoman
+from app.routers import root, warehouse_stock, assortment, warehouse_balances, product_collector, ftp_images, scheduler, stock_tick, webhooks, products, metrics, loop_monitor, changes, archives
+from app.routers.woo import stores as woo_stores
+from app.services.woo.woo_registry import woo_registry
+from app.services.scheduler_service import refresh_scheduler
+from app.services.catalog_index import catalog_index
+from app.services.archive_service import archive_service
+from app.services.product_collector_service import product_collector_service
 from app.utils.utils import logger
+from app.utils import json_codec
+from app.utils.metrics import rss_sampler
+from app.utils.loop_monitor import loop_monitor as event_loop_monitor
+from app.config import settings
+import asyncio
 import psutil
 
-app = FastAPI()
+# Ответы API кодируются кодеком приложения (orjson, если он установлен)
+app = FastAPI(default_response_class=json_codec.JsonResponse)
 
 # Настройка CORS
 app.add_middleware(
@@ -23,9 +34,29 @@ app.include_router(assortment.router)
 app.include_router(warehouse_balances.router)
 app.include_router(product_collector.router)
 app.include_router(ftp_images.router)
+app.include_router(scheduler.router)
+app.include_router(stock_tick.router)
+app.include_router(webhooks.router)
+app.include_router(products.router)
+app.include_router(metrics.router)
+app.include_router(loop_monitor.router)
+app.include_router(changes.router)
+app.include_router(archives.router)
 
-# Упрощенное подключение роутера для WooCommerce vtoman
-app.include_router(vtoman.router, prefix="/vtoman")
+# Реестр магазинов WooCommerce и маршруты каждого магазина (/vtoman/products/... и т.д.)
+app.include_router(woo_stores.router)
+# Имя магазина - первый сегмент его маршрутов, поэтому оно не должно совпадать с маршрутами приложения
+reserved_names = {route.path.strip('/').split('/')[0] for route in app.routes}
+for store_name, store_service in woo_registry.services.items():
+    if store_name in reserved_names:
+        raise ValueError(
+            f"Имя магазина WooCommerce '{store_name}' совпадает с маршрутом приложения /{store_name}, выберите другое имя"
+        )
+    app.include_router(woo_stores.create_store_router(store_service), prefix=f"/{store_name}")
+
+# Фоновые задачи, запущенные при старте: ссылки хранятся, чтобы задачи не были удалены
+# сборщиком мусора, и при остановке задачи отменяются
+background_tasks = []
 
 @app.on_event("startup")
 async def startup_event():
@@ -39,11 +70,35 @@ async def startup_event():
         logger.info(f"Доступная память: {memory.available / (1024 * 1024):.2f} MB")
         logger.info(f"Использованная память: {memory.used / (1024 * 1024):.2f} MB")
         logger.info(f"Процент использования памяти: {memory.percent}%")
+        if settings.SCHEDULER_ENABLED:
+            refresh_scheduler.start()
+        if settings.METRICS_RSS_SAMPLE_INTERVAL > 0:
+            background_tasks.append(asyncio.create_task(rss_sampler(settings.METRICS_RSS_SAMPLE_INTERVAL)))
+        if settings.LOOP_MONITOR_ENABLED:
+            event_loop_monitor.start()
+        # Прогрев индекса каталога для GET /products
+        background_tasks.append(asyncio.create_task(asyncio.to_thread(catalog_index.refresh)))
     except Exception as e:
         logger.error(f"Ошибка при выполнении startup_event: {e}", exc_info=True)
     finally:
         logger.info("Завершение выполнения startup_event")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """
+    Функция, выполняемая при остановке приложения.
+    """
+    await refresh_scheduler.stop()
+    event_loop_monitor.stop()
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+    # Файлы каталога, отложенные после точечных обновлений, записываются до остановки
+    await asyncio.to_thread(product_collector_service.flush_catalog_outputs)
+    # Дожидаемся сжатия поставленных в очередь архивов
+    await asyncio.to_thread(archive_service.shutdown)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,46 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.services.archive_service import archive_service
+from app.utils.utils import logger
+
+router = APIRouter()
+
+@router.get("/archives")
+async def get_archives(dataset: Optional[str] = None):
+    """
+    GET запрос. Возвращает архивы сырых данных (новые первыми), кодек и количество
+    архивов, ожидающих сжатия.
+    """
+    try:
+        archives = await asyncio.to_thread(archive_service.list_archives, dataset)
+    except Exception as e:
+        logger.error(f"Ошибка при получении списка архивов: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "codec": archive_service.codec,
+        "level": archive_service.level,
+        "pending": archive_service.pending(),
+        "archives": archives,
+    }
+
+@router.get("/archives/{name}")
+async def get_archive(
+    name: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """
+    GET запрос. Возвращает записи архива по имени файла. Архивы-списки отдаются страницами
+    (offset и limit), next_offset - смещение следующей страницы (null на последней).
+    """
+    try:
+        data = await asyncio.to_thread(archive_service.load_archive, name, offset, limit)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка при чтении архива {name}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if "data" in data:
+        return {"name": name, **data}
+    return {"name": name, "offset": offset, **data}
@@ -1,17 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from app.services.assortment_service import assortment_service
+from app.services.fetch_cache import fetch_cache
 from app.utils.utils import logger
 
 router = APIRouter()
 
 @router.get("/assortment")
-async def get_assortment():
+async def get_assortment(force: bool = False):
     """
     GET запрос. Получает данные об ассортименте товаров с МойСклад в асинхронном режиме.
     """
     logger.info("Начало обработки запроса GET /assortment")
     try:
-        result = await assortment_service.get_assortment()
+        result = await fetch_cache.get('assortment', assortment_service.get_assortment, force)
         logger.info("Запрос GET /assortment успешно обработан")
         return result
     except Exception as e:
@@ -2,8 +2,8 @@ from fastapi import APIRouter, HTTPException
 from app.services.async_sync_service import AsyncSyncService
 from app.utils.utils import logger
 from app.config.field_mapping import map_product
-import json
 import os
+from app.utils import json_codec
 
 router = APIRouter()
 
@@ -21,8 +21,7 @@ async def sync_products_async():
         cleaned_products = [map_product(product) for product in products]
 
         output_file = os.path.join('data', 'products_cleaned.json')
-        with open(output_file, 'w', encoding='utf-8') as f:
-            json.dump(cleaned_products, f, ensure_ascii=False, indent=2)
+        json_codec.dump_file(cleaned_products, output_file)
 
         return {
             "message": "Асинхронная синхронизация завершена успешно",
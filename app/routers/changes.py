@@ -0,0 +1,48 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
+from app.services.catalog_store import catalog_store
+from app.utils.utils import logger
+
+router = APIRouter()
+
+CHANGE_TYPES = ('new', 'changed', 'removed')
+
+@router.get("/changes")
+async def get_change_runs(limit: int = Query(20, ge=1, le=100)):
+    """
+    GET запрос. Возвращает последние запуски сборки каталога с количеством новых,
+    измененных, удаленных и неизменившихся товаров.
+    """
+    try:
+        runs = await asyncio.to_thread(catalog_store.list_change_runs, limit)
+    except Exception as e:
+        logger.error(f"Ошибка при получении наборов изменений: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"runs": runs}
+
+@router.get("/changes/{run_id}")
+async def get_changes(
+    run_id: str,
+    change: Optional[str] = None,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(1000, ge=1, le=10000),
+):
+    """
+    GET запрос. Возвращает товары набора изменений запуска (run_id или latest для последнего)
+    с типом изменения (new, changed, removed) и списком изменившихся полей.
+    """
+    if change is not None and change not in CHANGE_TYPES:
+        raise HTTPException(status_code=400, detail=f"Тип изменения должен быть одним из: {', '.join(CHANGE_TYPES)}")
+    try:
+        runs = await asyncio.to_thread(catalog_store.list_change_runs, 100)
+        run = next((r for r in runs if run_id in ('latest', r['run_id'])), None)
+        if run is None:
+            raise HTTPException(status_code=404, detail="Набор изменений не найден")
+        items = await asyncio.to_thread(catalog_store.load_changes, run['run_id'], change, offset, limit)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при получении набора изменений {run_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {**run, "offset": offset, "count": len(items), "items": items}
@@ -1,44 +1,130 @@
-import json
-import os
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import HTMLResponse, StreamingResponse
+import asyncio
+import hashlib
+import html
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import urlencode
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from app.services.ftp_service import ftp_service
 from app.utils.utils import logger
+from app.utils import json_codec
 from app.config import settings
 import io
 
 router = APIRouter()
 
+def filter_articles(articles, grouped_images, search):
+    """
+    Отбирает артикулы, у которых артикул или имя файла изображения содержит строку поиска.
+    """
+    if not search:
+        return articles
+    needle = search.lower()
+    return [
+        article for article in articles
+        if needle in article.lower() or any(needle in image["filename"].lower() for image in grouped_images[article])
+    ]
+
+def not_modified(request, etag, last_modified):
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return if_none_match == etag
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+def render_html(page_articles, grouped_images, page, pages, total, search, per_page):
+    """
+    Генерирует HTML-страницу по частям для потоковой отдачи.
+    """
+    def page_link(number, title):
+        query = urlencode({k: v for k, v in (("q", search), ("page", number), ("per_page", per_page)) if v})
+        return f'<a href="?{query}">{title}</a>'
+
+    yield (
+        "<html><body><h1>Список изображений по артикулам</h1>"
+        '<form method="get"><input name="q" value="' + html.escape(search or '') + '" placeholder="Артикул или файл">'
+        '<button type="submit">Найти</button></form>'
+        f"<p>Артикулов: {total}. Страница {page} из {pages}</p>"
+    )
+    for article in page_articles:
+        parts = [f"<h2>Артикул: {html.escape(article)}</h2><ul>"]
+        for image in grouped_images[article]:
+            parts.append(
+                f'<li><a href="{html.escape(image["ftp_link"])}" target="_blank">{html.escape(image["filename"])}</a></li>'
+            )
+        parts.append("</ul>")
+        yield "".join(parts)
+
+    navigation = []
+    if page > 1:
+        navigation.append(page_link(page - 1, "&larr; Назад"))
+    if page < pages:
+        navigation.append(page_link(page + 1, "Вперед &rarr;"))
+    yield f"<p>{' | '.join(navigation)}</p></body></html>"
+
 @router.get("/FTPimages", response_class=HTMLResponse)
-async def get_ftp_images():
+async def get_ftp_images(
+    request: Request,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(100, ge=1, le=1000),
+    q: str = '',
+    format: str = Query('html', pattern='^(html|json)$'),
+    refresh: bool = False,
+):
     """
-    GET запрос. Получает сгруппированный список ссылок на изображения с FTP сервера,
-    сохраняет их в JSON файл и возвращает HTML-страницу со списком.
+    GET запрос. Возвращает постраничный список ссылок на изображения с FTP сервера, сгруппированных
+    по артикулам, с поиском по артикулу или имени файла (q). Список берется из сохраненного индекса;
+    если индекс старше FTP_IMAGES_TTL, возвращается текущий индекс, а FTP обходится в фоне.
+    refresh=true обходит FTP до ответа.
+    format=json возвращает ту же страницу в JSON. Поддерживаются ETag и If-Modified-Since.
     """
     logger.info("Начало обработки запроса GET /FTPimages")
     try:
-        grouped_images = ftp_service.get_image_links()
-        logger.info(f"Получено {sum(len(images) for images in grouped_images.values())} ссылок на изображения")
-
-        # Сохранение данных в JSON файл
-        json_file_path = os.path.join(settings.JSON_DIR, 'ftp_images.json')
-        with open(json_file_path, 'w', encoding='utf-8') as f:
-            json.dump(grouped_images, f, ensure_ascii=False, indent=2)
-        logger.info(f"Данные сохранены в JSON файл: {json_file_path}")
-
-        html_content = "<html><body><h1>Список изображений по артикулам</h1>"
-        for article, images in grouped_images.items():
-            html_content += f"<h2>Артикул: {article}</h2><ul>"
-            for image in images:
-                html_content += f'<li><a href="{image["ftp_link"]}" target="_blank">{image["filename"]}</a></li>'
-            html_content += "</ul>"
-        html_content += "</body></html>"
-
-        return HTMLResponse(content=html_content)
+        version, modified_at, articles, grouped_images = await asyncio.to_thread(
+            ftp_service.load_image_index, settings.FTP_IMAGES_TTL, refresh
+        )
     except Exception as e:
         logger.error(f"Ошибка при получении ссылок на изображения: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+    params = f"{version}|{page}|{per_page}|{q}|{format}"
+    etag = f'W/"{hashlib.sha1(params.encode("utf-8")).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(modified_at, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if not_modified(request, etag, modified_at):
+        return Response(status_code=304, headers=headers)
+
+    matched = filter_articles(articles, grouped_images, q)
+    total = len(matched)
+    pages = max(1, (total + per_page - 1) // per_page)
+    page_articles = matched[(page - 1) * per_page:page * per_page]
+
+    if format == 'json':
+        return json_codec.JsonResponse(
+            content={
+                "total_articles": total,
+                "page": page,
+                "per_page": per_page,
+                "pages": pages,
+                "items": [{"article": article, "images": grouped_images[article]} for article in page_articles],
+            },
+            headers=headers
+        )
+
+    return StreamingResponse(
+        render_html(page_articles, grouped_images, page, pages, total, q, per_page),
+        media_type="text/html; charset=utf-8",
+        headers=headers
+    )
+
 @router.get("/image/{filename}")
 async def get_image(filename: str):
     """
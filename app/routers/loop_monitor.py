@@ -0,0 +1,26 @@
+from fastapi import APIRouter, HTTPException
+from app.utils.loop_monitor import loop_monitor
+
+router = APIRouter()
+
+@router.get("/loop_monitor")
+async def get_loop_monitor_status():
+    """
+    GET запрос. Показывает состояние монитора цикла событий и последние блокировки
+    с корутиной и стеком вызовов, удерживавшими цикл.
+    """
+    return loop_monitor.status()
+
+@router.get("/loop_monitor/{action}")
+async def switch_loop_monitor(action: str, interval: float = None, threshold: float = None):
+    """
+    GET запрос. Включает (enable) или выключает (disable) монитор цикла событий.
+    При включении можно задать интервал замера и порог блокировки в секундах.
+    """
+    if action == "enable":
+        loop_monitor.start(interval, threshold)
+    elif action == "disable":
+        loop_monitor.stop()
+    else:
+        raise HTTPException(status_code=404, detail=f"Неизвестное действие: {action}")
+    return loop_monitor.status()
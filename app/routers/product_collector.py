@@ -1,20 +1,41 @@
 from fastapi import APIRouter, HTTPException
 from app.services.product_collector_service import product_collector_service
 from app.utils.utils import logger
+from app.utils.profiling import list_profiles, load_profile
 
 router = APIRouter()
 
 @router.get("/collect_products")
-async def collect_products():
+async def collect_products(profile: bool = False, force: bool = False):
     """
     GET запрос. Собирает данные о товарах из всех источников, обрабатывает их и сохраняет в
-    различных форматах.
+    различных форматах. С параметром profile=true каждый этап профилируется, отчет
+    доступен через GET /profiles/{run_id}. Данные источников, загруженные не раньше
+    FETCH_CACHE_TTL секунд назад, берутся из кэша загрузок, force=true загружает их заново.
     """
     logger.info("Начало обработки запроса GET /collect_products")
     try:
-        result = await product_collector_service.collect_and_process_data()
+        result = await product_collector_service.collect_and_process_data(profile=profile, force=force)
         logger.info("Запрос GET /collect_products успешно обработан")
         return result
     except Exception as e:
         logger.error(f"Ошибка при сборе данных о товарах: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/profiles")
+async def get_profiles():
+    """
+    GET запрос. Возвращает список сохраненных отчетов профилирования запусков сбора данных.
+    """
+    return {"profiles": list_profiles()}
+
+@router.get("/profiles/{run_id}")
+async def get_profile(run_id: str):
+    """
+    GET запрос. Возвращает отчет профилирования запуска: этапы, самые затратные функции,
+    пики памяти и время блокирующего ввода-вывода.
+    """
+    try:
+        return load_profile(run_id)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Отчет профилирования не найден")
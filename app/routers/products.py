@@ -0,0 +1,55 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import Response
+from app.services.catalog_index import catalog_index
+from app.utils.utils import logger
+from app.utils import json_codec
+
+router = APIRouter()
+
+@router.get("/products")
+async def get_products(
+    request: Request,
+    category: Optional[str] = None,
+    store: Optional[str] = None,
+    stock_min: Optional[float] = None,
+    stock_max: Optional[float] = None,
+    updated_since: Optional[str] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = None,
+):
+    """
+    GET запрос. Возвращает товары последнего опубликованного каталога с фильтрами по категории
+    (включая подкатегории), складу, диапазону остатка и дате обновления ("YYYY-MM-DD HH:MM:SS").
+    Поддерживает курсорную пагинацию (cursor, limit), выбор полей (fields=code,name,stock) и ETag.
+    """
+    try:
+        if not catalog_index.is_fresh():
+            await asyncio.to_thread(catalog_index.refresh)
+
+        etag = catalog_index.etag(dict(request.query_params))
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
+        field_list = [f.strip() for f in fields.split(',') if f.strip()] if fields else None
+        items, next_cursor = catalog_index.query(
+            category=category, store=store, stock_min=stock_min, stock_max=stock_max,
+            updated_since=updated_since, cursor=cursor, limit=limit, fields=field_list
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка при выборке товаров каталога: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return json_codec.JsonResponse(
+        content={
+            "version": catalog_index.version,
+            "count": len(items),
+            "next_cursor": next_cursor,
+            "items": items,
+        },
+        headers={"ETag": etag, "Cache-Control": "no-cache"}
+    )
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, HTTPException
+from app.services.scheduler_service import refresh_scheduler
+from app.utils.utils import logger
+
+router = APIRouter()
+
+@router.get("/scheduler")
+async def get_scheduler_status():
+    """
+    GET запрос. Показывает состояние планировщика и свежесть каждого набора данных.
+    """
+    return refresh_scheduler.status()
+
+@router.get("/scheduler/refresh/{dataset}")
+async def refresh_dataset(dataset: str):
+    """
+    GET запрос. Немедленно обновляет указанный набор данных (stock, balances, assortment, images).
+    Каталог пересобирается, если данные изменились.
+    """
+    if dataset not in refresh_scheduler.datasets:
+        raise HTTPException(status_code=404, detail=f"Неизвестный набор данных: {dataset}")
+    logger.info(f"Начало обработки запроса GET /scheduler/refresh/{dataset}")
+    changed = await refresh_scheduler.refresh_and_rebuild(dataset)
+    return {
+        "dataset": dataset,
+        "changed": changed,
+        "status": refresh_scheduler.status()
+    }
@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException
+from app.services.stock_tick_service import stock_tick_service
+from app.utils.utils import logger
+
+router = APIRouter()
+
+@router.get("/stock_tick")
+async def run_stock_tick():
+    """
+    GET запрос. Быстро обновляет только остатки и цены: получает изменившиеся остатки из МойСклад
+    и отправляет stock_quantity, stock_status и цену в WooCommerce и Google Sheets.
+    """
+    logger.info("Начало обработки запроса GET /stock_tick")
+    try:
+        result = await stock_tick_service.run_tick()
+        logger.info("Запрос GET /stock_tick успешно обработан")
+        return result
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ошибка при быстром обновлении остатков: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
@@ -1,17 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from app.services.warehouse_balances_service import warehouse_balances_service
+from app.services.fetch_cache import fetch_cache
 from app.utils.utils import logger
 
 router = APIRouter()
 
 @router.get("/warehouse_balances")
-async def get_warehouse_balances():
+async def get_warehouse_balances(force: bool = False):
     """
     GET запрос. Получает данные об остатках по складам с МойСклад в асинхронном режиме.
     """
     logger.info("Начало обработки запроса GET /warehouse_balances")
     try:
-        result = await warehouse_balances_service.get_warehouse_balances()
+        result = await fetch_cache.get('balances', warehouse_balances_service.get_warehouse_balances, force)
         logger.info("Запрос GET /warehouse_balances успешно обработан")
         return result
     except Exception as e:
@@ -1,17 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from app.services.warehouse_stock_service import warehouse_stock_service
+from app.services.fetch_cache import fetch_cache
 from app.utils.utils import logger
 
 router = APIRouter()
 
 @router.get("/warehouse_stock")
-async def get_warehouse_stock():
+async def get_warehouse_stock(force: bool = False):
     """
     GET запрос. Получает все данные о складских запасах с МойСклад в асинхронном режиме.
     """
     logger.info("Начало обработки запроса GET /warehouse_stock")
     try:
-        result = await warehouse_stock_service.get_warehouse_stock()
+        result = await fetch_cache.get('stock', warehouse_stock_service.get_warehouse_stock, force)
         logger.info("Запрос GET /warehouse_stock успешно обработан")
         return result
     except Exception as e:
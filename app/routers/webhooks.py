@@ -0,0 +1,33 @@
+from fastapi import APIRouter, HTTPException, Request
+from app.services.webhook_service import webhook_service
+from app.config import settings
+from app.utils.utils import logger
+from app.utils import json_codec
+
+router = APIRouter()
+
+@router.post("/webhooks/moysklad")
+async def receive_moysklad_webhook(request: Request, token: str = ''):
+    """
+    POST запрос. Принимает вебхуки МойСклад об изменении товаров и складских документов.
+    События обрабатываются пачками в фоне, ответ возвращается сразу.
+    """
+    if settings.WEBHOOK_TOKEN and token != settings.WEBHOOK_TOKEN:
+        raise HTTPException(status_code=403, detail="Неверный токен вебхука")
+    try:
+        payload = json_codec.loads(await request.body())
+    except Exception:
+        raise HTTPException(status_code=400, detail="Некорректное тело запроса")
+    try:
+        accepted = webhook_service.accept(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    logger.info(f"Принято {accepted} событий вебхука МойСклад")
+    return {"accepted": accepted}
+
+@router.get("/webhooks/moysklad")
+async def get_webhook_status():
+    """
+    GET запрос. Показывает состояние очереди вебхуков МойСклад.
+    """
+    return webhook_service.status()
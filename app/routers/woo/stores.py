@@ -0,0 +1,107 @@
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException
+from app.services.woo.woo_registry import woo_registry
+from app.services.woo.feed_generator import feed_generator
+from app.utils.utils import logger
+
+router = APIRouter()
+
+@router.get("/woo/stores")
+async def get_woo_stores():
+    """
+    GET запрос. Возвращает магазины WooCommerce из реестра с ограничением параллельных
+    запросов, соответствием полей и правилом цены.
+    """
+    sku_maps = await asyncio.gather(*(
+        asyncio.to_thread(service.sku_map.status) for service in woo_registry.services.values()
+    ))
+    return {
+        "stores": [
+            {
+                "name": service.name,
+                "url": service.config.url,
+                "concurrency": service.config.concurrency,
+                "field_mapping": service.field_mapping,
+                "price_rule": service.price_rule.model_dump(),
+                "sku_map": sku_map,
+                "feed": dict(zip(("xml", "json"), feed_generator.paths(service.name))),
+            }
+            for service, sku_map in zip(woo_registry.services.values(), sku_maps)
+        ]
+    }
+
+@router.get("/woo/sync")
+async def sync_woo_stores(stores: Optional[str] = None, full: bool = False):
+    """
+    GET запрос. Синхронизирует каталог из общего снимка со всеми магазинами (или перечисленными
+    в stores=a,b) параллельно. Без full магазин получает только изменения последней сборки,
+    если он применил предыдущую.
+    """
+    names = [name.strip() for name in stores.split(',') if name.strip()] if stores else None
+    try:
+        return {"stores": await woo_registry.sync_catalog(names, full)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка при синхронизации магазинов WooCommerce: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.get("/woo/sku_map/rebuild")
+async def rebuild_woo_sku_maps(stores: Optional[str] = None):
+    """
+    GET запрос. Заново строит сохраненное соответствие SKU -> ID товара магазинов (всех
+    или перечисленных в stores=a,b) обходом всех товаров магазина.
+    """
+    names = [name.strip() for name in stores.split(',') if name.strip()] if stores else None
+    try:
+        return {"stores": await woo_registry.rebuild_sku_maps(names)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.get("/woo/reconcile")
+async def reconcile_woo_stores(stores: Optional[str] = None, dry_run: bool = False, create_missing: bool = True):
+    """
+    GET запрос. Полная сверка каталога с магазинами: товары магазина загружаются постранично,
+    сравниваются по полям с данными каталога, и отправляются только различия. В отчете -
+    количество различий по полям и товары, отсутствующие в магазине или в каталоге.
+    С dry_run=true только отчет, без записи.
+    """
+    names = [name.strip() for name in stores.split(',') if name.strip()] if stores else None
+    try:
+        return {"stores": await woo_registry.reconcile(names, dry_run, create_missing)}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Ошибка при сверке магазинов WooCommerce: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+def create_store_router(service):
+    """
+    Маршруты одного магазина, подключаются с префиксом /{имя магазина}.
+    """
+    store_router = APIRouter()
+
+    @store_router.post("/products/{codes}")
+    async def update_or_create_products(codes: str):
+        logger.info(f"Received request to update/create products in {service.name} with codes: {codes}")
+
+        product_codes = [code.strip() for code in codes.split(',')]
+        results = await service.update_or_create_products(product_codes)
+        return {"results": results}
+
+    @store_router.get("/products/{code}")
+    async def get_product_info(code: str):
+        """
+        GET запрос для получения информации о товаре по артикулу (code).
+        """
+        logger.info(f"Received GET request for product info with code: {code}")
+        product = service.get_product_from_catalog(code)
+        if not product:
+            logger.warning(f"Product not found for code: {code}")
+            raise HTTPException(status_code=404, detail="Product not found")
+        logger.info(f"Found product info for code: {code}")
+        return {"message": "Product info retrieved successfully", "product": product}
+
+    return store_router
@@ -0,0 +1,261 @@
+import gzip
+import lzma
+import os
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from app.config import settings
+from app.utils.utils import logger
+from app.utils.streaming_writers import JsonArrayWriter
+from app.utils import json_codec
+
+# Размер блока при сжатии файла
+COPY_CHUNK_SIZE = 1024 * 1024
+
+ARCHIVE_NAME = re.compile(r'^(?P<dataset>[\w.-]+)-(?P<created>\d{8}-\d{6}-\d{6})\.json\.(?P<ext>gz|xz|zst)$')
+
+
+def open_zstd(path, mode, level):
+    """zstd из стандартной библиотеки (Python 3.14+) или пакета zstandard."""
+    try:
+        from compression import zstd
+        return zstd.open(path, mode, level=level if 'w' in mode else None)
+    except ImportError:
+        import zstandard
+        if 'w' in mode:
+            return zstandard.open(path, mode, cctx=zstandard.ZstdCompressor(level=level))
+        return zstandard.open(path, mode)
+
+
+def zstd_available():
+    try:
+        from compression import zstd  # noqa: F401
+        return True
+    except ImportError:
+        pass
+    try:
+        import zstandard  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+# Кодек -> (расширение файла, функция открытия (путь, режим, уровень), допустимые уровни)
+CODECS = {
+    'gzip': ('gz', lambda path, mode, level: gzip.open(path, mode, compresslevel=level), range(0, 10)),
+    'lzma': ('xz', lambda path, mode, level: lzma.open(path, mode, preset=level if 'w' in mode else None), range(0, 10)),
+    'zstd': ('zst', open_zstd, range(1, 23)),
+}
+EXTENSIONS = {ext: codec for codec, (ext, _, _) in CODECS.items()}
+
+
+def compress_file(source, target, codec, level):
+    """
+    Сжимает файл source в target (через временный файл) и удаляет source.
+    Выполняется в пуле потоков или процессов, поэтому функция модульная и без состояния.
+
+    :return: Размер архива в байтах
+    """
+    _, opener, _ = CODECS[codec]
+    tmp_path = f"{target}.tmp"
+    try:
+        with open(source, 'rb') as src, opener(tmp_path, 'wb', level) as dst:
+            while True:
+                chunk = src.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                dst.write(chunk)
+        os.replace(tmp_path, target)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    finally:
+        try:
+            os.remove(source)
+        except OSError:
+            pass
+    return os.path.getsize(target)
+
+
+class ArchiveWriter(JsonArrayWriter):
+    """
+    Приемник сырых строк для архива: во время загрузки строки пишутся без сжатия во
+    временный файл, при закрытии сжатие передается в фоновый пул ArchiveService,
+    поэтому загрузка не ждет кодека. path - итоговый файл архива.
+    """
+
+    def __init__(self, service, dataset, path, spool_path):
+        super().__init__(spool_path, pretty=False)
+        self.service = service
+        self.dataset = dataset
+        self.archive_path = path
+        self.future = None
+
+    def close(self):
+        self.finish()
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+        self.future = self.service.submit(self.dataset, self.path, self.archive_path)
+
+
+class ArchiveService:
+    """
+    Архивы сырых данных МойСклад: файлы {набор}-{ГГГГММДД-ЧЧММСС-мкс}.json.{gz|xz|zst}
+    в ARCHIVE_DIR. Сжатие выполняется в фоновом пуле потоков (или процессов при
+    ARCHIVE_USE_PROCESSES), после каждого архива набора применяется политика хранения:
+    не больше ARCHIVE_KEEP_COUNT файлов и не старше ARCHIVE_KEEP_DAYS дней.
+    """
+
+    def __init__(self):
+        self.archive_dir = settings.ARCHIVE_DIR
+        self.codec = settings.ARCHIVE_CODEC
+        if self.codec not in CODECS:
+            raise ValueError(f"Неизвестный кодек архива {self.codec}, допустимы: {', '.join(CODECS)}")
+        if self.codec == 'zstd' and not zstd_available():
+            logger.warning("zstd недоступен (нужен Python 3.14+ или пакет zstandard), архивы сжимаются gzip")
+            self.codec = 'gzip'
+        levels = CODECS[self.codec][2]
+        self.level = min(max(settings.ARCHIVE_COMPRESSION_LEVEL, levels.start), levels.stop - 1)
+        self._executor = None
+        self._lock = threading.Lock()
+        self._pending = set()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                pool = ProcessPoolExecutor if settings.ARCHIVE_USE_PROCESSES else ThreadPoolExecutor
+                self._executor = pool(max_workers=max(1, settings.ARCHIVE_WORKERS))
+            return self._executor
+
+    def archive_path(self, dataset):
+        created = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+        return os.path.join(self.archive_dir, f"{dataset}-{created}.json.{CODECS[self.codec][0]}")
+
+    def writer(self, dataset):
+        """
+        Приемник сырых строк набора данных для page_fetcher (write/close/abort).
+        """
+        path = self.archive_path(dataset)
+        return ArchiveWriter(self, dataset, path, f"{path}.spool")
+
+    def save(self, dataset, data):
+        """
+        Архивирует готовые данные (список или словарь) набора.
+
+        :return: Путь к будущему файлу архива
+        """
+        path = self.archive_path(dataset)
+        spool_path = f"{path}.spool"
+        with open(spool_path, 'wb') as f:
+            f.write(json_codec.dumpb(data))
+        self.submit(dataset, spool_path, path)
+        return path
+
+    def submit(self, dataset, spool_path, path):
+        future = self.executor.submit(compress_file, spool_path, path, self.codec, self.level)
+        with self._lock:
+            self._pending.add(future)
+
+        def done(future):
+            with self._lock:
+                self._pending.discard(future)
+            try:
+                size = future.result()
+            except Exception as e:
+                logger.error(f"Ошибка архивирования {os.path.basename(path)}: {str(e)}")
+                return
+            logger.info(f"Архив {os.path.basename(path)} записан: {size / 1024:.1f} КБ ({self.codec})")
+            try:
+                self.apply_retention(dataset)
+            except Exception as e:
+                logger.error(f"Ошибка очистки архивов {dataset}: {str(e)}")
+
+        future.add_done_callback(done)
+        return future
+
+    def pending(self):
+        with self._lock:
+            return len(self._pending)
+
+    def list_archives(self, dataset=None):
+        """
+        :return: Архивы (новые первыми): имя, набор данных, время создания, кодек и размер
+        """
+        archives = []
+        for entry in os.scandir(self.archive_dir):
+            match = ARCHIVE_NAME.match(entry.name)
+            if not match or (dataset and match['dataset'] != dataset):
+                continue
+            archives.append({
+                "name": entry.name,
+                "dataset": match['dataset'],
+                "created": datetime.strptime(match['created'], '%Y%m%d-%H%M%S-%f').isoformat(),
+                "codec": EXTENSIONS[match['ext']],
+                "size": entry.stat().st_size,
+            })
+        archives.sort(key=lambda item: item['created'], reverse=True)
+        return archives
+
+    def load_archive(self, name, offset=0, limit=None):
+        """
+        Читает архив по имени файла. Архив-список читается потоково: разбираются записи
+        только до offset + limit, остаток файла не распаковывается.
+
+        :return: {"data": данные} для архива-объекта или {"items": записи, "next_offset":
+            смещение следующей страницы или None} для архива-списка
+        :raises FileNotFoundError: Архив не найден
+        """
+        match = ARCHIVE_NAME.match(name)
+        path = os.path.join(self.archive_dir, name)
+        if not match or not os.path.isfile(path):
+            raise FileNotFoundError(f"Архив {name} не найден")
+        _, opener, levels = CODECS[EXTENSIONS[match['ext']]]
+        with opener(path, 'rb', levels.start) as f:
+            head = f.read(json_codec.ARRAY_READ_SIZE)
+            if not head.lstrip().startswith(b'['):
+                return {"data": json_codec.loads(head + f.read())}
+            items = []
+            next_offset = None
+            for index, item in enumerate(json_codec.iter_array(f, head)):
+                if index < offset:
+                    continue
+                if limit is not None and len(items) == limit:
+                    next_offset = index
+                    break
+                items.append(item)
+            return {"items": items, "next_offset": next_offset}
+
+    def apply_retention(self, dataset):
+        """
+        Удаляет архивы набора сверх ARCHIVE_KEEP_COUNT и старше ARCHIVE_KEEP_DAYS (0 - без ограничения).
+
+        :return: Количество удаленных архивов
+        """
+        archives = self.list_archives(dataset)
+        expired = archives[settings.ARCHIVE_KEEP_COUNT:] if settings.ARCHIVE_KEEP_COUNT > 0 else []
+        if settings.ARCHIVE_KEEP_DAYS > 0:
+            cutoff = (datetime.now() - timedelta(days=settings.ARCHIVE_KEEP_DAYS)).isoformat()
+            expired += [item for item in archives if item['created'] < cutoff and item not in expired]
+        for item in expired:
+            try:
+                os.remove(os.path.join(self.archive_dir, item['name']))
+            except OSError:
+                pass
+        if expired:
+            logger.info(f"Удалено устаревших архивов {dataset}: {len(expired)}")
+        return len(expired)
+
+    def shutdown(self, wait=True):
+        """Дожидается записи поставленных архивов и останавливает пул."""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+archive_service = ArchiveService()
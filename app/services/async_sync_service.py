@@ -1,9 +1,10 @@
 import aiohttp
 import gzip
-import json
 import os
 from app.config import settings
 from app.utils.utils import logger
+from app.utils import json_codec
+from app.services.archive_service import archive_service
 
 class AsyncSyncService:
     """
@@ -55,7 +56,7 @@ class AsyncSyncService:
             async with aiohttp.ClientSession() as session:
                 async with session.get(status_url, headers=self.headers) as response:
                     if response.status == 200:
-                        status = await response.json()
+                        status = await response.json(loads=json_codec.loads)
                         logger.info(f"Получен статус задачи: {status['status']}")
                         return status
                     else:
@@ -80,7 +81,7 @@ class AsyncSyncService:
                         content = await response.read()
                         decompressed = gzip.decompress(content)
                         logger.info("Результат задачи успешно получен и декодирован")
-                        return json.loads(decompressed)
+                        return json_codec.loads(decompressed)
                     else:
                         logger.error(f"Не удалось получить результат задачи. Код ответа: {response.status}")
                         raise Exception(f"Не удалось получить результат задачи: {response.status}")
@@ -114,13 +115,10 @@ class AsyncSyncService:
 
             # Сохранение сырых данных
             raw_filename = os.path.join(settings.RAW_DATA_DIR, f"{endpoint.replace('/', '_')}-raw.json")
-            with open(raw_filename, 'w', encoding='utf-8') as f:
-                json.dump(raw_data, f, ensure_ascii=False, indent=2)
+            json_codec.dump_file(raw_data, raw_filename)
 
             # Архивирование сырых данных
-            archive_filename = os.path.join(settings.ARCHIVE_DIR, f"{endpoint.replace('/', '_')}-raw.gz")
-            with gzip.open(archive_filename, 'wt', encoding='utf-8') as f:
-                json.dump(raw_data, f, ensure_ascii=False, indent=2)
+            archive_filename = archive_service.save(endpoint.replace('/', '_'), raw_data)
 
             logger.info(f"Сырые данные сохранены в {raw_filename} и архивированы в {archive_filename}")
 
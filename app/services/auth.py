@@ -1,7 +1,10 @@
 import base64
+import os
 import aiohttp
 from app.config import settings
 from app.utils.utils import logger
+from app.utils import json_codec
+from app.utils.metrics import moysklad_trace
 
 class AuthService:
     """
@@ -14,6 +17,14 @@ class AuthService:
         """
         self.base_url = settings.MY_SKLAD_API_URL
         self.token = None
+        # Файл токена, общий для всех воркеров: воркер не запрашивает свой токен, если
+        # другой воркер уже получил действующий. Хранится в STATE_DIR, а не среди данных
+        self.token_file = os.path.join(settings.STATE_DIR, 'moysklad_token')
+        # Токен, сохраненный прежними версиями в публикуемой директории JSON, удаляется
+        try:
+            os.remove(os.path.join(settings.JSON_DIR, 'moysklad_token'))
+        except OSError:
+            pass
 
     def get_basic_auth_header(self):
         """
@@ -37,11 +48,12 @@ class AuthService:
             "Accept-Encoding": "gzip"
         }
 
-        async with aiohttp.ClientSession() as session:
+        async with aiohttp.ClientSession(trace_configs=[moysklad_trace]) as session:
             async with session.post(url, headers=headers) as response:
                 if response.status in [200, 201]:  # Учитываем оба кода состояния
-                    data = await response.json()
+                    data = await response.json(loads=json_codec.loads)
                     self.token = data["access_token"]
+                    self.save_shared_token(self.token)
                     logger.info("Токен доступа успешно получен")
                     return self.token
                 else:
@@ -55,6 +67,8 @@ class AuthService:
 
         :return: Словарь с заголовком авторизации
         """
+        if not self.token:
+            self.token = self.load_shared_token()
         if not self.token:
             await self.get_token()
         return {
@@ -68,8 +82,33 @@ class AuthService:
 
         :return: Новый токен доступа
         """
+        shared = self.load_shared_token()
+        if shared and shared != self.token:
+            logger.info("Используется токен доступа, обновленный другим воркером")
+            self.token = shared
+            return self.token
         logger.info("Обновление токена доступа")
         return await self.get_token()
 
+    def load_shared_token(self):
+        try:
+            with open(self.token_file, 'r', encoding='utf-8') as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def save_shared_token(self, token):
+        """
+        Сохраняет токен в общий файл (права 0600) с атомарной заменой.
+        """
+        tmp_path = f"{self.token_file}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(token)
+            os.replace(tmp_path, self.token_file)
+        except OSError as e:
+            logger.warning(f"Не удалось сохранить общий токен доступа: {str(e)}")
+
 # Создаем глобальный экземпляр сервиса аутентификации
 auth_service = AuthService()
@@ -0,0 +1,133 @@
+import base64
+import hashlib
+import heapq
+import threading
+from bisect import bisect_right
+from app.utils.utils import logger
+from app.services.catalog_store import catalog_store
+from app.services.catalog_snapshot import catalog_snapshot, write_snapshot
+
+
+class CatalogIndex:
+    """
+    Выборки товаров последнего опубликованного каталога поверх снимка catalog_snapshot.
+
+    Снимок отображен в память и общий для всех воркеров uvicorn, поэтому каждый воркер
+    не держит свою копию каталога. Товары в снимке упорядочены по (code, id), что дает
+    стабильный курсор между версиями каталога. Для фильтров по категории и складу в снимке
+    хранятся списки позиций, остаток и дата обновления читаются из индекса без разбора
+    товара, сам товар разбирается только при попадании в страницу.
+    """
+
+    def __init__(self):
+        self._view = None
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        view = self._view
+        return view.version if view is not None else None
+
+    def is_fresh(self):
+        return self.version is not None and self.version == catalog_snapshot.file_version()
+
+    def refresh(self):
+        """
+        Переключается на последнюю версию снимка. Если снимок еще не опубликован, а каталог
+        в хранилище есть (например, после обновления приложения), снимок строится из хранилища.
+        """
+        with self._lock:
+            view = catalog_snapshot.current()
+            if view is None:
+                catalog = catalog_store.load_catalog()
+                if not catalog:
+                    return
+                write_snapshot(catalog, catalog_snapshot.path)
+                view = catalog_snapshot.current()
+            if view is not None and view is not self._view:
+                logger.info(f"Индекс каталога переключен на снимок версии {view.version}: {len(view)} товаров")
+            self._view = view
+
+    def category_positions(self, view, category):
+        """
+        Позиции товаров категории и всех ее подкатегорий.
+        """
+        prefix = category + '/'
+        postings = [
+            view.postings('categories', pathname) for pathname in view.names('categories')
+            if pathname == category or pathname.startswith(prefix)
+        ]
+        if len(postings) == 1:
+            return postings[0]
+        return list(heapq.merge(*postings))
+
+    def query(self, category=None, store=None, stock_min=None, stock_max=None,
+              updated_since=None, cursor=None, limit=100, fields=None):
+        """
+        Выполняет выборку товаров.
+
+        :return: Кортеж (товары страницы, курсор следующей страницы)
+        """
+        view = self._view
+        if view is None:
+            return [], None
+        candidates = None
+        if category:
+            candidates = self.category_positions(view, category)
+        if store:
+            store_positions = view.postings('stores', store)
+            if candidates is None:
+                candidates = store_positions
+            else:
+                store_set = set(store_positions)
+                candidates = [p for p in candidates if p in store_set]
+        if candidates is None:
+            candidates = range(len(view))
+
+        start = 0
+        if cursor:
+            after = bisect_right(view.keys, decode_cursor(cursor))
+            start = bisect_right(candidates, after - 1)
+
+        items = []
+        last_position = None
+        for index in range(start, len(candidates)):
+            position = candidates[index]
+            if stock_min is not None or stock_max is not None:
+                stock = view.stock(position)
+                if stock_min is not None and (stock is None or stock < stock_min):
+                    continue
+                if stock_max is not None and (stock is None or stock > stock_max):
+                    continue
+            if updated_since and view.updated(position) < updated_since:
+                continue
+            if len(items) == limit:
+                break
+            product = view.record(position)
+            items.append({f: product[f] for f in fields if f in product} if fields else product)
+            last_position = position
+        else:
+            return items, None
+        return items, encode_cursor(view.key(last_position))
+
+    def etag(self, params):
+        """
+        ETag ответа: версия каталога и параметры запроса.
+        """
+        digest = hashlib.sha1(f"{self.version}|{sorted(params.items())}".encode('utf-8')).hexdigest()
+        return f'W/"{digest}"'
+
+
+def encode_cursor(key):
+    return base64.urlsafe_b64encode('\x1f'.join(key).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor):
+    try:
+        code, product_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split('\x1f')
+    except Exception:
+        raise ValueError("Некорректный курсор")
+    return (code, product_id)
+
+
+catalog_index = CatalogIndex()
@@ -0,0 +1,303 @@
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left, insort
+from app.config import settings
+from app.utils.utils import logger
+from app.utils import json_codec
+
+MAGIC = b'WSCSNAP1'
+# Запись индекса: смещение и длина товара, смещение и длина ключа, остаток, дата обновления
+ENTRY = struct.Struct('<QIQId24s')
+TRAILER = struct.Struct('<I8s')
+KEY_SEPARATOR = '\x1f'
+
+
+def snapshot_key(product):
+    return (product.get('code') or '', product.get('id') or '')
+
+
+def stock_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def write_snapshot(catalog, path):
+    """
+    Записывает снимок каталога: товары в компактном JSON, отсортированные по (code, id),
+    индекс смещений с остатком и датой обновления, списки позиций по категориям и складам.
+    Файл пишется во временный (свой у каждого процесса и потока, так как снимок могут
+    одновременно записывать несколько воркеров) и заменяет предыдущую версию переименованием.
+
+    Формат: MAGIC | товары | ключи | индекс | списки позиций | каталог разделов (JSON) | длина каталога | MAGIC
+    """
+    order = sorted(range(len(catalog)), key=lambda i: snapshot_key(catalog[i]))
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write_snapshot_file(catalog, order, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    logger.info(f"Снимок каталога сохранен: {path}, {len(order)} товаров")
+
+
+def write_snapshot_file(catalog, order, tmp_path):
+    entries = bytearray()
+    keys = bytearray()
+    categories = {}
+    stores = {}
+
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        for position, i in enumerate(order):
+            product = catalog[i]
+            record = json_codec.dumpb(product)
+            key = KEY_SEPARATOR.join(snapshot_key(product)).encode('utf-8')
+            updated = (product.get('updated') or '').encode('utf-8')[:24]
+            entries += ENTRY.pack(f.tell(), len(record), len(keys), len(key), stock_number(product.get('stock')), updated)
+            keys += key
+            f.write(record)
+            categories.setdefault(product.get('pathname') or '', array('I')).append(position)
+            for store in (product.get('store') or '').split(', '):
+                if store:
+                    stores.setdefault(store, array('I')).append(position)
+
+        write_index(f, len(order), keys, entries, categories, stores)
+
+
+def write_index(f, count, keys, entries, categories, stores):
+    """
+    Дописывает после товаров ключи, индекс, списки позиций и каталог разделов.
+    """
+    directory = {"count": count, "keys": f.tell()}
+    f.write(keys)
+    align(f, 8)
+    directory["entries"] = f.tell()
+    f.write(entries)
+    for name, postings in (("categories", categories), ("stores", stores)):
+        directory[name] = {}
+        for value, positions in postings.items():
+            directory[name][value] = [f.tell(), len(positions)]
+            f.write(positions.tobytes())
+    directory_bytes = json_codec.dumpb(directory)
+    f.write(directory_bytes)
+    f.write(TRAILER.pack(len(directory_bytes), MAGIC))
+    f.flush()
+    os.fsync(f.fileno())
+
+
+def patch_snapshot(view, products, path):
+    """
+    Записывает новую версию снимка, в которой заменены записи товаров products (ключ
+    (code, id) не меняется). Остальные записи и ключи копируются из view без разбора
+    JSON, поэтому точечное обновление не требует загрузки и кодирования всего каталога.
+
+    :return: False, если какого-то товара нет в снимке (нужна полная запись снимка)
+    """
+    replaced = {}
+    for product in products:
+        key = snapshot_key(product)
+        position = bisect_left(view.keys, key)
+        if position >= view.count or view.key(position) != key:
+            return False
+        replaced[position] = product
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        write_patched_file(view, replaced, tmp_path)
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+    logger.info(f"Снимок каталога обновлен точечно: {path}, {len(replaced)} товаров")
+    return True
+
+
+def write_patched_file(view, replaced, tmp_path):
+    postings = {
+        kind: {name: array('I', view.postings(kind, name)) for name in view.names(kind)}
+        for kind in ("categories", "stores")
+    }
+    for position, product in replaced.items():
+        previous = view.record(position)
+        move_posting(postings["categories"], [previous.get('pathname') or ''], [product.get('pathname') or ''], position)
+        move_posting(postings["stores"], store_names(previous), store_names(product), position)
+
+    entries = bytearray()
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        for position in range(view.count):
+            offset, length, key_offset, key_length, stock, updated = view.entry(position)
+            product = replaced.get(position)
+            if product is None:
+                record = view.mm[offset:offset + length]
+            else:
+                record = json_codec.dumpb(product)
+                stock = stock_number(product.get('stock'))
+                updated = (product.get('updated') or '').encode('utf-8')[:24]
+            entries += ENTRY.pack(f.tell(), len(record), key_offset, key_length, stock, updated)
+            f.write(record)
+        keys_length = key_offset + key_length if view.count else 0
+        keys = view.mm[view.keys_offset:view.keys_offset + keys_length]
+        write_index(f, view.count, keys, entries, postings["categories"], postings["stores"])
+
+
+def store_names(product):
+    return [store for store in (product.get('store') or '').split(', ') if store]
+
+
+def move_posting(postings, previous, current, position):
+    """Переносит позицию товара между списками позиций при изменении категории или складов."""
+    for name in set(previous) - set(current):
+        positions = postings.get(name)
+        if positions is not None:
+            positions.remove(position)
+            if not positions:
+                del postings[name]
+    for name in set(current) - set(previous):
+        insort(postings.setdefault(name, array('I')), position)
+
+
+def align(f, size):
+    padding = -f.tell() % size
+    if padding:
+        f.write(b'\0' * padding)
+
+
+class SnapshotView:
+    """
+    Одна версия снимка, отображенная в память только для чтения. Страницы файла общие для
+    всех процессов, отобразивших его, поэтому память не растет с количеством воркеров.
+    Старая версия остается доступной читателям, пока на нее есть ссылки, даже после замены файла.
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.version = f"{stat.st_ino:x}-{stat.st_mtime_ns:x}"
+        size = len(self.mm)
+        if self.mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Файл {path} не является снимком каталога")
+        directory_length, magic = TRAILER.unpack_from(self.mm, size - TRAILER.size)
+        if magic != MAGIC:
+            raise ValueError(f"Снимок каталога {path} записан не полностью")
+        start = size - TRAILER.size - directory_length
+        self.directory = json_codec.loads(self.mm[start:start + directory_length])
+        self.count = self.directory["count"]
+        self.entries_offset = self.directory["entries"]
+        self.keys_offset = self.directory["keys"]
+        self.keys = KeyList(self)
+
+    def __len__(self):
+        return self.count
+
+    def entry(self, position):
+        return ENTRY.unpack_from(self.mm, self.entries_offset + position * ENTRY.size)
+
+    def record(self, position):
+        offset, length = self.entry(position)[:2]
+        return json_codec.loads(self.mm[offset:offset + length])
+
+    def key(self, position):
+        offset, length = self.entry(position)[2:4]
+        start = self.keys_offset + offset
+        return tuple(self.mm[start:start + length].decode('utf-8').split(KEY_SEPARATOR, 1))
+
+    def stock(self, position):
+        value = self.entry(position)[4]
+        return None if math.isnan(value) else value
+
+    def updated(self, position):
+        return self.entry(position)[5].rstrip(b'\0').decode('utf-8')
+
+    def postings(self, kind, name):
+        """
+        Позиции товаров категории или склада без копирования (memoryview над отображением).
+        """
+        offset, count = self.directory[kind].get(name, (0, 0))
+        if not count:
+            return []
+        return memoryview(self.mm)[offset:offset + count * 4].cast('I')
+
+    def names(self, kind):
+        return self.directory[kind].keys()
+
+    def find_code(self, code):
+        """
+        Первая позиция товара с указанным кодом или None.
+        """
+        position = bisect_left(self.keys, (code, ''))
+        if position < self.count and self.keys[position][0] == code:
+            return position
+        return None
+
+
+class KeyList:
+    """Последовательность ключей (code, id) снимка для bisect."""
+
+    def __init__(self, view):
+        self.view = view
+
+    def __len__(self):
+        return self.view.count
+
+    def __getitem__(self, position):
+        return self.view.key(position)
+
+
+class CatalogSnapshot:
+    """
+    Доступ к текущей версии снимка каталога. При каждом обращении проверяются метаданные
+    файла, и после переименования новой версии читатели атомарно переключаются на нее.
+    """
+
+    def __init__(self):
+        self.path = os.path.join(settings.JSON_DIR, 'combined_products.snap')
+        self._view = None
+
+    def file_version(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return None
+        return f"{stat.st_ino:x}-{stat.st_mtime_ns:x}"
+
+    def current(self):
+        """
+        :return: SnapshotView текущей версии или None, если снимок еще не опубликован
+        """
+        version = self.file_version()
+        view = self._view
+        if version is None:
+            return None
+        if view is None or view.version != version:
+            try:
+                view = SnapshotView(self.path)
+            except (OSError, ValueError) as e:
+                logger.error(f"Не удалось открыть снимок каталога: {str(e)}")
+                return self._view
+            self._view = view
+            logger.info(f"Открыт снимок каталога версии {view.version}: {view.count} товаров")
+        return view
+
+    def get_by_code(self, code):
+        view = self.current()
+        if view is None:
+            return None
+        position = view.find_code(code)
+        return view.record(position) if position is not None else None
+
+
+catalog_snapshot = CatalogSnapshot()
@@ -0,0 +1,577 @@
+import threading
+import uuid
+from sqlalchemy import (
+    create_engine, event, MetaData, Table, Column, String, Text, Float, Integer, select, delete, update,
+    tuple_, bindparam
+)
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from app.config import settings
+from app.utils.utils import logger
+from app.utils import json_codec
+
+metadata = MetaData()
+
+# Товары из ассортимента
+products_table = Table(
+    'products', metadata,
+    Column('id', String(64), primary_key=True),
+    Column('article', String(255), index=True),
+    Column('code', String(255), index=True),
+    Column('external_code', String(255)),
+    Column('pathname', Text),
+    Column('name', Text),
+    Column('description', Text),
+    Column('updated', String(32)),
+    Column('sync_id', String(32), index=True),
+)
+
+# Остатки и цены из отчета по складским запасам
+stock_table = Table(
+    'stock', metadata,
+    Column('id', String(64), primary_key=True),
+    Column('sale_price', Float),
+    Column('stock', Float),
+    Column('category', Text),
+    Column('updated', String(32)),
+    Column('sync_id', String(32), index=True),
+)
+
+# Остатки по отдельным складам
+store_balances_table = Table(
+    'store_balances', metadata,
+    Column('id', String(64), primary_key=True),
+    Column('store', String(255), primary_key=True),
+    Column('position', Integer),
+    Column('stock', Float),
+    Column('sync_id', String(32), index=True),
+)
+
+# Опубликованный объединенный каталог
+catalog_table = Table(
+    'catalog', metadata,
+    Column('id', String(64), primary_key=True),
+    Column('article', String(255), index=True),
+    Column('code', String(255), index=True),
+    Column('external_code', String(255)),
+    Column('pathname', Text),
+    Column('name', Text),
+    Column('description', Text),
+    Column('sale_price', Float),
+    Column('store', Text),
+    Column('stock', Float),
+    Column('updated', String(32)),
+    Column('image_links', Text),
+    Column('position', Integer, index=True),
+    Column('sync_id', String(32), index=True),
+)
+
+# Хэши содержимого товаров опубликованного каталога (основа инкрементальной выгрузки)
+content_hashes_table = Table(
+    'content_hashes', metadata,
+    Column('id', String(64), primary_key=True),
+    Column('code', String(255), index=True),
+    Column('hash', String(32)),
+    Column('field_hashes', String(128)),
+    Column('run_id', String(32)),
+)
+
+# Запуски сборки каталога с набором изменений
+change_runs_table = Table(
+    'change_runs', metadata,
+    Column('run_id', String(32), primary_key=True),
+    Column('previous_run_id', String(32)),
+    Column('created', String(32)),
+    Column('new', Integer),
+    Column('changed', Integer),
+    Column('removed', Integer),
+    Column('unchanged', Integer),
+)
+
+# Новые, измененные и удаленные товары каждого запуска
+catalog_changes_table = Table(
+    'catalog_changes', metadata,
+    Column('run_id', String(32), primary_key=True),
+    Column('id', String(64), primary_key=True),
+    Column('code', String(255)),
+    Column('change', String(16), index=True),
+    Column('fields', Text),
+)
+
+# Соответствие SKU товара и ID товара в магазинах WooCommerce
+woo_sku_map_table = Table(
+    'woo_sku_map', metadata,
+    Column('store', String(64), primary_key=True),
+    Column('sku', String(255), primary_key=True),
+    Column('product_id', Integer, index=True),
+)
+
+# Соответствие ключей каталога и столбцов таблиц
+CATALOG_FIELDS = {
+    'id': 'id',
+    'article': 'article',
+    'code': 'code',
+    'externalCode': 'external_code',
+    'pathname': 'pathname',
+    'name': 'name',
+    'description': 'description',
+    'salePrice': 'sale_price',
+    'store': 'store',
+    'stock': 'stock',
+    'updated': 'updated',
+    'image_links': 'image_links',
+}
+
+UPSERT_CHUNK_SIZE = 1000
+
+
+class CatalogStore:
+    """
+    Хранилище каталога в SQL базе данных: SQLite для локальной работы, MySQL для продакшена.
+
+    Хранит товары, остатки, остатки по складам и опубликованный объединенный каталог.
+    Запись выполняется пакетными upsert, поиск по id, code и article использует индексы.
+    """
+
+    def __init__(self, url):
+        self.url = url
+        self.engine = create_engine(url, pool_pre_ping=True)
+        if self.engine.dialect.name == 'sqlite':
+            event.listen(self.engine, 'connect', self._configure_sqlite)
+        self._initialized = False
+        self._init_lock = threading.Lock()
+
+    @staticmethod
+    def _configure_sqlite(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.close()
+
+    def init(self):
+        """
+        Создает таблицы и индексы, если их еще нет.
+        """
+        if self._initialized:
+            return
+        with self._init_lock:
+            if not self._initialized:
+                metadata.create_all(self.engine)
+                self._initialized = True
+                logger.info(f"Хранилище каталога подключено: {self.engine.url.render_as_string(hide_password=True)}")
+
+    def upsert(self, connection, table, rows):
+        """
+        Пакетно вставляет или обновляет строки таблицы по первичному ключу.
+        """
+        if not rows:
+            return
+        key_columns = [column.name for column in table.primary_key.columns]
+        update_columns = [column.name for column in table.columns if column.name not in key_columns]
+        dialect = self.engine.dialect.name
+        for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+            chunk = rows[i:i + UPSERT_CHUNK_SIZE]
+            if dialect == 'sqlite':
+                stmt = sqlite_insert(table)
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=key_columns,
+                    set_={name: stmt.excluded[name] for name in update_columns}
+                )
+            elif dialect == 'mysql':
+                stmt = mysql_insert(table)
+                stmt = stmt.on_duplicate_key_update({name: stmt.inserted[name] for name in update_columns})
+            else:
+                raise ValueError(f"Upsert не поддерживается для базы данных {dialect}")
+            connection.execute(stmt, chunk)
+
+    def replace_rows(self, table, rows):
+        """
+        Полностью заменяет содержимое таблицы: upsert новых строк и удаление отсутствующих.
+        """
+        self.init()
+        sync_id = uuid.uuid4().hex
+        for row in rows:
+            row['sync_id'] = sync_id
+        with self.engine.begin() as connection:
+            self.upsert(connection, table, rows)
+            deleted = connection.execute(delete(table).where(table.c.sync_id != sync_id)).rowcount
+        logger.info(f"Таблица {table.name}: сохранено {len(rows)} строк, удалено {deleted} устаревших")
+
+    def start_replace(self, dataset):
+        """
+        Начинает потоковую замену таблицы набора данных (assortment, stock, balances):
+        строки записываются пачками через write(), устаревшие удаляются в close().
+        """
+        table, convert = {
+            'assortment': (products_table, assortment_rows),
+            'stock': (stock_table, stock_rows),
+            'balances': (store_balances_table, balance_rows),
+        }[dataset]
+        return TableReplace(self, table, convert)
+
+    def save_assortment(self, processed_data):
+        self.replace_rows(products_table, assortment_rows(processed_data))
+
+    def save_stock(self, processed_data):
+        self.replace_rows(stock_table, stock_rows(processed_data))
+
+    def save_balances(self, processed_data):
+        self.replace_rows(store_balances_table, balance_rows(processed_data))
+
+    def iter_combined(self, codes=None):
+        """
+        Возвращает товары ассортимента с остатками, ценами и складами, отсортированные по коду.
+
+        :param codes: Коды товаров, записи которых нужно вернуть (None - все товары)
+        """
+        self.init()
+        stores = {}
+        with self.engine.connect() as connection:
+            balances_query = (
+                select(store_balances_table.c.id, store_balances_table.c.store)
+                .where(store_balances_table.c.stock > 0)
+                .order_by(store_balances_table.c.id, store_balances_table.c.position)
+            )
+            query = (
+                select(products_table, stock_table.c.sale_price, stock_table.c.stock, stock_table.c.id.label('stock_id'))
+                .outerjoin(stock_table, stock_table.c.id == products_table.c.id)
+                .order_by(products_table.c.code, products_table.c.id)
+            )
+            if codes is not None:
+                codes = list(codes)
+                balances_query = balances_query.where(store_balances_table.c.id.in_(
+                    select(products_table.c.id).where(products_table.c.code.in_(codes))
+                ))
+                query = query.where(products_table.c.code.in_(codes))
+
+            for product_id, store in connection.execute(balances_query):
+                stores.setdefault(product_id, []).append(store)
+
+            for row in connection.execute(query).mappings():
+                product = {
+                    'id': row['id'],
+                    'article': row['article'],
+                    'code': row['code'],
+                    'externalCode': row['external_code'],
+                    'pathname': row['pathname'],
+                    'name': row['name'],
+                    'description': row['description'],
+                    'updated': row['updated'],
+                }
+                if row['stock_id'] is not None:
+                    product['salePrice'] = row['sale_price']
+                    product['stock'] = number(row['stock'])
+                if row['id'] in stores:
+                    product['store'] = ', '.join(stores[row['id']])
+                yield product
+
+    def save_catalog(self, catalog):
+        """
+        Сохраняет опубликованный объединенный каталог.
+        """
+        self.replace_rows(catalog_table, [
+            dict(catalog_row(product), position=position) for position, product in enumerate(catalog)
+        ])
+
+    def update_catalog(self, products):
+        """
+        Обновляет отдельные товары опубликованного каталога одним пакетным запросом.
+        """
+        if not products:
+            return
+        self.init()
+        columns = [column for column in CATALOG_FIELDS.values() if column != 'id']
+        # Имя параметра ключа отличается от имени столбца: одноименные параметры в update запрещены
+        stmt = (
+            update(catalog_table)
+            .where(catalog_table.c.id == bindparam('key_id'))
+            .values({column: bindparam(column) for column in columns})
+        )
+        rows = []
+        for product in products:
+            row = catalog_row(product)
+            row['key_id'] = row.pop('id')
+            rows.append(row)
+        with self.engine.begin() as connection:
+            connection.execute(stmt, rows)
+
+    def get_products_by_codes(self, codes):
+        """
+        Находит товары опубликованного каталога по кодам в порядке публикации.
+        """
+        self.init()
+        codes = list(codes)
+        products = []
+        with self.engine.connect() as connection:
+            for i in range(0, len(codes), UPSERT_CHUNK_SIZE):
+                rows = connection.execute(
+                    select(catalog_table)
+                    .where(catalog_table.c.code.in_(codes[i:i + UPSERT_CHUNK_SIZE]))
+                    .order_by(catalog_table.c.position)
+                ).mappings()
+                products.extend(catalog_product(row) for row in rows)
+        return products
+
+    def load_catalog(self):
+        """
+        Загружает опубликованный каталог в порядке публикации.
+        """
+        self.init()
+        with self.engine.connect() as connection:
+            rows = connection.execute(select(catalog_table).order_by(catalog_table.c.position)).mappings()
+            return [catalog_product(row) for row in rows]
+
+    def get_product_by_code(self, code):
+        """
+        Находит товар опубликованного каталога по коду (индексный запрос).
+        """
+        self.init()
+        with self.engine.connect() as connection:
+            row = connection.execute(
+                select(catalog_table).where(catalog_table.c.code == code).order_by(catalog_table.c.position).limit(1)
+            ).mappings().first()
+            return catalog_product(row) if row else None
+
+    def iter_content_hashes(self):
+        """
+        Возвращает хэши товаров (id, code, hash, field_hashes), упорядоченные по id.
+        """
+        self.init()
+        with self.engine.connect() as connection:
+            result = connection.execution_options(stream_results=True, yield_per=UPSERT_CHUNK_SIZE).execute(
+                select(
+                    content_hashes_table.c.id, content_hashes_table.c.code,
+                    content_hashes_table.c.hash, content_hashes_table.c.field_hashes
+                ).order_by(content_hashes_table.c.id)
+            )
+            for row in result:
+                yield tuple(row)
+
+    def update_content_hashes(self, rows, removed_ids=()):
+        """
+        Записывает хэши новых и измененных товаров и удаляет хэши удаленных.
+        """
+        self.init()
+        with self.engine.begin() as connection:
+            self.upsert(connection, content_hashes_table, rows)
+            self.delete_ids(connection, content_hashes_table, removed_ids)
+
+    def delete_ids(self, connection, table, ids):
+        ids = list(ids)
+        for i in range(0, len(ids), UPSERT_CHUNK_SIZE):
+            connection.execute(delete(table).where(table.c.id.in_(ids[i:i + UPSERT_CHUNK_SIZE])))
+
+    def save_change_set(self, run, hash_rows, removed_ids, change_rows, retention):
+        """
+        Сохраняет набор изменений запуска и обновляет хэши товаров одной транзакцией.
+        Хранятся только последние retention запусков.
+        """
+        self.init()
+        with self.engine.begin() as connection:
+            self.upsert(connection, content_hashes_table, hash_rows)
+            self.delete_ids(connection, content_hashes_table, removed_ids)
+            connection.execute(change_runs_table.insert(), [run])
+            for i in range(0, len(change_rows), UPSERT_CHUNK_SIZE):
+                connection.execute(catalog_changes_table.insert(), change_rows[i:i + UPSERT_CHUNK_SIZE])
+            expired = connection.execute(
+                select(change_runs_table.c.run_id).order_by(change_runs_table.c.created.desc()).offset(retention)
+            ).scalars().all()
+            if expired:
+                connection.execute(delete(catalog_changes_table).where(catalog_changes_table.c.run_id.in_(expired)))
+                connection.execute(delete(change_runs_table).where(change_runs_table.c.run_id.in_(expired)))
+
+    def list_change_runs(self, limit=20):
+        self.init()
+        with self.engine.connect() as connection:
+            rows = connection.execute(
+                select(change_runs_table).order_by(change_runs_table.c.created.desc()).limit(limit)
+            ).mappings()
+            return [dict(row) for row in rows]
+
+    def load_changes(self, run_id, change=None, offset=0, limit=1000):
+        """
+        Возвращает товары набора изменений запуска в порядке кода.
+        """
+        self.init()
+        query = select(
+            catalog_changes_table.c.id, catalog_changes_table.c.code,
+            catalog_changes_table.c.change, catalog_changes_table.c.fields
+        ).where(catalog_changes_table.c.run_id == run_id)
+        if change:
+            query = query.where(catalog_changes_table.c.change == change)
+        query = query.order_by(catalog_changes_table.c.code, catalog_changes_table.c.id).offset(offset).limit(limit)
+        with self.engine.connect() as connection:
+            return [
+                {**row, 'fields': row['fields'].split(',') if row['fields'] else []}
+                for row in connection.execute(query).mappings()
+            ]
+
+    def load_sku_map(self, store):
+        """
+        Возвращает соответствие SKU -> ID товара магазина WooCommerce.
+        """
+        self.init()
+        with self.engine.connect() as connection:
+            result = connection.execute(
+                select(woo_sku_map_table.c.sku, woo_sku_map_table.c.product_id).where(woo_sku_map_table.c.store == store)
+            )
+            return dict(result.all())
+
+    def save_sku_map(self, store, mapping, replace=False):
+        """
+        Записывает соответствия SKU -> ID товара магазина. С replace удаляет остальные соответствия магазина.
+        """
+        self.init()
+        rows = [{'store': store, 'sku': sku, 'product_id': product_id} for sku, product_id in mapping.items()]
+        with self.engine.begin() as connection:
+            if replace:
+                connection.execute(delete(woo_sku_map_table).where(woo_sku_map_table.c.store == store))
+            self.upsert(connection, woo_sku_map_table, rows)
+
+    def delete_sku_map(self, store, skus):
+        self.init()
+        skus = list(skus)
+        with self.engine.begin() as connection:
+            for i in range(0, len(skus), UPSERT_CHUNK_SIZE):
+                connection.execute(delete(woo_sku_map_table).where(
+                    woo_sku_map_table.c.store == store, woo_sku_map_table.c.sku.in_(skus[i:i + UPSERT_CHUNK_SIZE])
+                ))
+
+    def get_codes_by_ids(self, ids):
+        """
+        Возвращает коды товаров ассортимента по их ID.
+        """
+        self.init()
+        ids = list(ids)
+        codes = {}
+        with self.engine.connect() as connection:
+            for i in range(0, len(ids), UPSERT_CHUNK_SIZE):
+                chunk = ids[i:i + UPSERT_CHUNK_SIZE]
+                result = connection.execute(
+                    select(products_table.c.id, products_table.c.code).where(products_table.c.id.in_(chunk))
+                )
+                codes.update(dict(result.all()))
+        return codes
+
+
+class TableReplace:
+    """
+    Замена содержимого таблицы по частям. Каждая пачка записывается upsert с общим sync_id,
+    при закрытии удаляются строки, не попавшие в замену. Если замена отменена, уже
+    записанные строки остаются, а устаревшие не удаляются до следующей полной замены.
+
+    Устаревшие строки определяются по первичным ключам, записанным этой заменой, а не по
+    sync_id: одновременная замена той же таблицы из другого процесса перезаписывает sync_id
+    строк, и удаление по sync_id стерло бы строки, записанные ею.
+    """
+
+    def __init__(self, store, table, convert):
+        self.store = store
+        self.table = table
+        self.convert = convert
+        self.sync_id = uuid.uuid4().hex
+        self.count = 0
+        self.key_columns = list(table.primary_key.columns)
+        self.keys = set()
+        store.init()
+
+    def write(self, rows):
+        rows = self.convert(rows)
+        for row in rows:
+            row['sync_id'] = self.sync_id
+            self.keys.add(tuple(row[column.name] for column in self.key_columns))
+        with self.store.engine.begin() as connection:
+            self.store.upsert(connection, self.table, rows)
+        self.count += len(rows)
+
+    def close(self):
+        deleted = 0
+        with self.store.engine.begin() as connection:
+            existing = connection.execute(select(*self.key_columns)).all()
+            stale = [tuple(key) for key in existing if tuple(key) not in self.keys]
+            for i in range(0, len(stale), UPSERT_CHUNK_SIZE):
+                chunk = stale[i:i + UPSERT_CHUNK_SIZE]
+                if len(self.key_columns) == 1:
+                    condition = self.key_columns[0].in_([key[0] for key in chunk])
+                else:
+                    condition = tuple_(*self.key_columns).in_(chunk)
+                deleted += connection.execute(delete(self.table).where(condition)).rowcount
+        logger.info(f"Таблица {self.table.name}: сохранено {self.count} строк, удалено {deleted} устаревших")
+
+    def abort(self):
+        logger.warning(f"Замена таблицы {self.table.name} прервана после {self.count} строк")
+
+
+def assortment_rows(processed_data):
+    return [
+        {
+            'id': item['id'],
+            'article': item.get('article', ''),
+            'code': item.get('code', ''),
+            'external_code': item.get('externalCode', ''),
+            'pathname': item.get('pathname', ''),
+            'name': item.get('name', ''),
+            'description': item.get('description', ''),
+            'updated': item.get('updated', ''),
+        }
+        for item in processed_data if item.get('id')
+    ]
+
+
+def stock_rows(processed_data):
+    return [
+        {
+            'id': item['id'],
+            'sale_price': item.get('salePrice'),
+            'stock': item.get('stock'),
+            'category': item.get('category', ''),
+            'updated': item.get('updated', ''),
+        }
+        for item in processed_data if item.get('id')
+    ]
+
+
+def balance_rows(processed_data):
+    rows = []
+    for item in processed_data:
+        if not item.get('id'):
+            continue
+        for position, (store, stock) in enumerate(item.get('stockByStore', {}).items()):
+            rows.append({'id': item['id'], 'store': store, 'position': position, 'stock': stock})
+    return rows
+
+
+def number(value):
+    """Возвращает целое число для целых значений остатка, сохраненных как float."""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    return value
+
+
+def catalog_row(product):
+    row = {column: product.get(key) for key, column in CATALOG_FIELDS.items() if key in product}
+    if 'image_links' in row:
+        row['image_links'] = json_codec.dumps(row['image_links'])
+    for column in ('sale_price', 'stock'):
+        if row.get(column) == '':
+            row[column] = None
+    for column in CATALOG_FIELDS.values():
+        row.setdefault(column, None)
+    return row
+
+
+def catalog_product(row):
+    product = {}
+    for key, column in CATALOG_FIELDS.items():
+        value = row[column]
+        if value is None:
+            continue
+        if key == 'image_links':
+            value = json_codec.loads(value)
+        elif key == 'stock':
+            value = number(value)
+        product[key] = value
+    return product
+
+
+catalog_store = CatalogStore(settings.CATALOG_DB_URL)
@@ -0,0 +1,240 @@
+import hashlib
+import os
+import uuid
+import zlib
+from datetime import datetime
+from app.config import settings
+from app.utils.utils import logger, load_json_file
+from app.utils import json_codec
+from app.services.catalog_store import catalog_store, CATALOG_FIELDS
+
+# Поля товара, по которым считается хэш содержимого
+HASHED_FIELDS = list(CATALOG_FIELDS)
+
+
+def canonical(value):
+    """Представление значения для хэша: 5 и 5.0 дают одинаковый хэш."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return repr(value)
+
+
+def content_hash(product):
+    """
+    Хэш содержимого товара и хэши отдельных полей.
+
+    :return: Кортеж (хэш товара, строка из CRC32 полей HASHED_FIELDS по 8 шестнадцатеричных символов)
+    """
+    values = [canonical(product.get(field)).encode('utf-8') for field in HASHED_FIELDS]
+    digest = hashlib.blake2b(b'\x1f'.join(values), digest_size=16).hexdigest()
+    field_hashes = ''.join(f"{zlib.crc32(value):08x}" for value in values)
+    return digest, field_hashes
+
+
+def changed_fields(previous, current):
+    """Поля, хэши которых отличаются."""
+    if not previous or len(previous) != len(current):
+        return list(HASHED_FIELDS)
+    return [
+        field for i, field in enumerate(HASHED_FIELDS)
+        if previous[i * 8:(i + 1) * 8] != current[i * 8:(i + 1) * 8]
+    ]
+
+
+class ChangeSet:
+    """
+    Набор изменений каталога относительно предыдущего запуска: новые, измененные
+    (с перечнем полей) и удаленные товары.
+    """
+
+    def __init__(self, run_id, previous_run_id):
+        self.run_id = run_id
+        self.previous_run_id = previous_run_id
+        self.created = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")
+        # Списки (товар, хэш, хэши полей) и (товар, хэш, хэши полей, изменившиеся поля)
+        self.new = []
+        self.changed = []
+        # Список (id, code)
+        self.removed = []
+        self.unchanged = 0
+
+    def is_empty(self):
+        return not (self.new or self.changed or self.removed)
+
+    def codes(self):
+        """Коды новых и измененных товаров."""
+        return [item[0].get('code') for item in self.new + self.changed]
+
+    def updates(self, fields=None):
+        """
+        Изменения в формате точечных обновлений: код товара -> {поле: новое значение}.
+
+        :param fields: Учитывать только эти поля
+        """
+        updates = {}
+        for product, _, _, changed in self.changed:
+            values = {field: product.get(field, '') for field in changed if fields is None or field in fields}
+            if values:
+                updates[product.get('code')] = values
+        return updates
+
+    def summary(self):
+        return {
+            "run_id": self.run_id,
+            "previous_run_id": self.previous_run_id,
+            "created": self.created,
+            "new": len(self.new),
+            "changed": len(self.changed),
+            "removed": len(self.removed),
+            "unchanged": self.unchanged,
+        }
+
+
+class ChangeTracker:
+    """
+    Индекс хэшей содержимого товаров опубликованного каталога между запусками.
+
+    При каждой сборке каталог сравнивается с сохраненными хэшами слиянием по id:
+    хэши читаются из хранилища потоком в порядке id, каталог обходится в том же порядке,
+    поэтому дополнительная память - только список позиций. Набор изменений сохраняется
+    в хранилище и используется выгрузками, чтобы пропускать неизменившиеся товары.
+
+    Для каждого канала выгрузки (Google Sheets и т.д.) запоминается последний примененный
+    запуск: если канал пропустил запуск с изменениями (например, выгрузка завершилась
+    ошибкой), набор изменений для него неполный и канал выполняет полную выгрузку.
+    Сборки без изменений запуском не сохраняются.
+    """
+
+    def __init__(self):
+        self.state_file = os.path.join(settings.JSON_DIR, 'change_channels.json')
+        self.last_change_set = None
+
+    def load_state(self):
+        state = load_json_file(self.state_file) if os.path.exists(self.state_file) else {}
+        return state if isinstance(state, dict) else {}
+
+    def save_state(self, state):
+        json_codec.dump_file(state, self.state_file)
+
+    def diff(self, catalog):
+        """
+        Сравнивает каталог с сохраненными хэшами. Хэши не обновляются до commit().
+
+        :return: ChangeSet
+        """
+        change_set = self.new_change_set()
+        order = sorted((i for i, p in enumerate(catalog) if p.get('id')), key=lambda i: catalog[i]['id'])
+        previous = catalog_store.iter_content_hashes()
+        prev = next(previous, None)
+        for i in order:
+            product = catalog[i]
+            product_id = product['id']
+            while prev is not None and prev[0] < product_id:
+                change_set.removed.append((prev[0], prev[1]))
+                prev = next(previous, None)
+            digest, field_hashes = content_hash(product)
+            if prev is not None and prev[0] == product_id:
+                if prev[2] == digest:
+                    change_set.unchanged += 1
+                else:
+                    change_set.changed.append((product, digest, field_hashes, changed_fields(prev[3], field_hashes)))
+                prev = next(previous, None)
+            else:
+                change_set.new.append((product, digest, field_hashes))
+        while prev is not None:
+            change_set.removed.append((prev[0], prev[1]))
+            prev = next(previous, None)
+        previous.close()
+        logger.info(
+            f"Изменения каталога: новых {len(change_set.new)}, измененных {len(change_set.changed)}, "
+            f"удаленных {len(change_set.removed)}, без изменений {change_set.unchanged}"
+        )
+        return change_set
+
+    def commit(self, change_set):
+        """
+        Сохраняет набор изменений и обновляет хэши товаров. Пустой набор не сохраняется:
+        каталог совпадает с предыдущим запуском, поэтому run_id набора становится previous_run_id.
+        """
+        if change_set.is_empty():
+            change_set.run_id = change_set.previous_run_id
+            self.last_change_set = change_set
+            return
+        hash_rows = []
+        change_rows = []
+        for item in change_set.new + change_set.changed:
+            product, digest, field_hashes = item[:3]
+            hash_rows.append({
+                'id': product['id'], 'code': product.get('code'), 'hash': digest,
+                'field_hashes': field_hashes, 'run_id': change_set.run_id,
+            })
+            change_rows.append({
+                'run_id': change_set.run_id, 'id': product['id'], 'code': product.get('code'),
+                'change': 'changed' if len(item) == 4 else 'new',
+                'fields': ','.join(item[3]) if len(item) == 4 else '',
+            })
+        for product_id, code in change_set.removed:
+            change_rows.append({
+                'run_id': change_set.run_id, 'id': product_id, 'code': code, 'change': 'removed', 'fields': '',
+            })
+        catalog_store.save_change_set(
+            change_set.summary(), hash_rows, [product_id for product_id, _ in change_set.removed],
+            change_rows, settings.CHANGE_SET_RETENTION
+        )
+        self.last_change_set = change_set
+
+    def new_change_set(self):
+        runs = catalog_store.list_change_runs(limit=1)
+        return ChangeSet(
+            f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}",
+            runs[0]['run_id'] if runs else None
+        )
+
+    def record_patch(self, patched):
+        """
+        Сохраняет точечное изменение товаров (быстрое обновление остатков, вебхуки) как
+        отдельный запуск: инкрементальные выгрузки каналов, не получивших это изменение,
+        видят его в наборе изменений.
+
+        :param patched: Пары (товар до изменения, товар после изменения)
+        :return: ChangeSet
+        """
+        change_set = self.new_change_set()
+        for previous, product in patched:
+            if not product.get('id'):
+                continue
+            _, previous_hashes = content_hash(previous)
+            digest, field_hashes = content_hash(product)
+            fields = changed_fields(previous_hashes, field_hashes)
+            if fields:
+                change_set.changed.append((product, digest, field_hashes, fields))
+        self.commit(change_set)
+        return change_set
+
+    def in_sync(self, channel, previous_run_id):
+        """
+        Канал применил запуск previous_run_id (или более ранний запуск, после которого
+        сохранены только запуски без изменений), поэтому следующего набора изменений
+        достаточно для инкрементальной выгрузки.
+        """
+        applied = self.load_state().get(channel)
+        if previous_run_id is None or applied is None:
+            return False
+        if applied == previous_run_id:
+            return True
+        runs = {run['run_id']: run for run in catalog_store.list_change_runs(limit=settings.CHANGE_SET_RETENTION)}
+        run_id = previous_run_id
+        while run_id != applied:
+            run = runs.get(run_id)
+            if run is None or run['new'] or run['changed'] or run['removed']:
+                return False
+            run_id = run['previous_run_id']
+        return True
+
+    def mark_applied(self, channel, run_id):
+        state = self.load_state()
+        state[channel] = run_id
+        self.save_state(state)
+
+
+change_tracker = ChangeTracker()
@@ -0,0 +1,88 @@
+import asyncio
+import time
+from datetime import datetime
+from app.config import settings
+from app.utils.utils import logger
+from app.utils.metrics import fetch_cache_requests
+
+
+class CachedFetch:
+    def __init__(self, result, fetched_at, duration):
+        self.result = result
+        self.fetched_at = fetched_at
+        self.duration = duration
+
+
+class FetchCache:
+    """
+    Кэш результатов загрузки наборов данных МойСклад (assortment, stock, balances).
+
+    Результат загрузки набора данных действует FETCH_CACHE_TTL секунд (FETCH_CACHE_TTLS -
+    отдельно по наборам), повторный запрос в этот срок возвращает его без обращения
+    к МойСклад. Одновременные запросы одного набора ждут одну общую загрузку, force
+    начинает новую загрузку, но тоже присоединяется к уже идущей. Ошибки не кэшируются.
+    """
+
+    def __init__(self):
+        self._results = {}
+        # Набор данных -> (цикл событий, задача загрузки)
+        self._inflight = {}
+
+    def ttl(self, dataset):
+        return settings.FETCH_CACHE_TTLS.get(dataset, settings.FETCH_CACHE_TTL)
+
+    def freshness(self, dataset, cached, source):
+        age = time.time() - cached.fetched_at
+        ttl = self.ttl(dataset)
+        return {
+            "source": source,
+            "fetched_at": datetime.fromtimestamp(cached.fetched_at).isoformat(timespec='seconds'),
+            "age": round(age, 2),
+            "ttl": ttl,
+            "expires_in": round(max(ttl - age, 0), 2),
+            "fetch_duration": round(cached.duration, 2),
+        }
+
+    def response(self, dataset, cached, source):
+        fetch_cache_requests.inc(dataset=dataset, result=source)
+        return {**cached.result, "cache": self.freshness(dataset, cached, source)}
+
+    async def run(self, dataset, fetch):
+        started = time.time()
+        result = await fetch()
+        cached = CachedFetch(result, time.time(), time.time() - started)
+        self._results[dataset] = cached
+        return cached
+
+    async def get(self, dataset, fetch, force=False):
+        """
+        Результат загрузки набора данных из кэша, общей идущей загрузки или новой загрузки fetch().
+
+        :param force: Не использовать кэш
+        :return: Результат загрузки с метаданными свежести в поле cache
+        """
+        cached = self._results.get(dataset)
+        if not force and cached is not None and time.time() - cached.fetched_at < self.ttl(dataset):
+            return self.response(dataset, cached, "cache")
+
+        loop = asyncio.get_running_loop()
+        inflight = self._inflight.get(dataset)
+        if inflight is not None and inflight[0] is loop and not inflight[1].done():
+            logger.info(f"Загрузка {dataset} уже выполняется, запрос ожидает ее результат")
+            return self.response(dataset, await asyncio.shield(inflight[1]), "shared")
+
+        # Загрузка продолжается, даже если запросивший ее клиент отключился
+        task = loop.create_task(self.run(dataset, fetch))
+        self._inflight[dataset] = (loop, task)
+        task.add_done_callback(lambda _: self._release(dataset, task))
+        return self.response(dataset, await asyncio.shield(task), "upstream")
+
+    def _release(self, dataset, task):
+        inflight = self._inflight.get(dataset)
+        if inflight is not None and inflight[1] is task:
+            del self._inflight[dataset]
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning(f"Загрузка {dataset} завершилась ошибкой, результат не кэширован")
+
+
+fetch_cache = FetchCache()
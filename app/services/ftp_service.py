@@ -1,19 +1,41 @@
+import os
+import threading
+import time
 from ftplib import FTP
 from app.config import settings
 from app.utils.utils import logger
+from app.utils.metrics import upstream_timer, upstream_bytes
+from app.utils import json_codec
 from collections import defaultdict
 from urllib.parse import quote
 
 class FTPService:
     def __init__(self):
         self.host = settings.FTP_HOST
+        self.port = settings.FTP_PORT
         self.user = settings.FTP_USER
         self.password = settings.FTP_PASSWORD
+        self.index_file = os.path.join(settings.JSON_DIR, 'ftp_images.json')
+        # Кэш индекса изображений: (версия файла, время изменения, отсортированные артикулы, данные)
+        self._index = None
+        # Блокировка замены кэша индекса и запуска фонового обновления (обход FTP выполняется без нее)
+        self._index_lock = threading.Lock()
+        self._refresh_thread = None
+        # Обновление ftp_images.json выполняется по очереди (планировщик, /collect_products
+        # и /FTPimages?refresh=true), чтение кэша индекса при этом не блокируется
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def netloc(self):
+        return self.host if self.port == 21 else f"{self.host}:{self.port}"
 
     def connect(self):
         try:
-            ftp = FTP(self.host)
-            ftp.login(user=self.user, passwd=self.password)
+            with upstream_timer('ftp') as timer:
+                ftp = FTP()
+                ftp.connect(self.host, self.port)
+                ftp.login(user=self.user, passwd=self.password)
+                timer.status = 'ok'
             return ftp
         except Exception as e:
             logger.error(f"Ошибка при подключении к FTP серверу: {str(e)}")
@@ -23,7 +45,9 @@ class FTPService:
         ftp = self.connect()
         try:
             files = []
-            ftp.retrlines('LIST', files.append)
+            with upstream_timer('ftp') as timer:
+                ftp.retrlines('LIST', files.append)
+                timer.status = 'ok'
 
             grouped_images = defaultdict(list)
             for file in files:
@@ -33,7 +57,7 @@ class FTPService:
                     if len(parts) == 2:
                         article = parts[0]
                         # Создаем FTP-ссылку
-                        ftp_link = f"ftp://{self.user}:{quote(self.password)}@{self.host}/{filename}"
+                        ftp_link = f"ftp://{self.user}:{quote(self.password)}@{self.netloc}/{filename}"
                         grouped_images[article].append({"filename": filename, "ftp_link": ftp_link})
 
             return grouped_images
@@ -43,11 +67,75 @@ class FTPService:
         finally:
             ftp.quit()
 
+    def refresh_image_links(self):
+        """
+        Получает список изображений с FTP и сохраняет его в JSON файл ftp_images.json.
+        Одновременные обновления выполняются по очереди.
+        """
+        with self._refresh_lock:
+            grouped_images = self.get_image_links()
+            json_codec.dump_file(grouped_images, self.index_file)
+        logger.info(f"Данные сохранены в JSON файл: {self.index_file}")
+        return grouped_images
+
+    def load_image_index(self, max_age=None, force_refresh=False):
+        """
+        Возвращает индекс изображений из сохраненного списка. Если списка нет или запрошено
+        принудительное обновление, FTP обходится сразу. Если список старше max_age секунд,
+        возвращается текущий список, а FTP обходится одной фоновой задачей.
+
+        :return: Кортеж (версия, время изменения, отсортированные артикулы, сгруппированные изображения)
+        """
+        try:
+            stat = os.stat(self.index_file)
+        except OSError:
+            stat = None
+        if force_refresh or stat is None:
+            self.refresh_image_links()
+        elif max_age and time.time() - stat.st_mtime > max_age:
+            self.start_background_refresh()
+        return self.read_image_index()
+
+    def start_background_refresh(self):
+        """
+        Запускает фоновое обновление списка изображений, если оно еще не выполняется.
+        """
+        with self._index_lock:
+            if self._refresh_thread is not None and self._refresh_thread.is_alive():
+                return
+            self._refresh_thread = threading.Thread(target=self._background_refresh, name='ftp-images-refresh', daemon=True)
+            self._refresh_thread.start()
+
+    def _background_refresh(self):
+        logger.info("Список изображений устарел, фоновое обновление с FTP")
+        try:
+            self.refresh_image_links()
+            self.read_image_index()
+        except Exception as e:
+            logger.error(f"Ошибка фонового обновления списка изображений: {str(e)}", exc_info=True)
+
+    def read_image_index(self):
+        """
+        Загружает сохраненный список в кэш индекса, если файл изменился с прошлой загрузки.
+        """
+        stat = os.stat(self.index_file)
+        version = f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+        index = self._index
+        if index is None or index[0] != version:
+            grouped_images = json_codec.load_file(self.index_file)
+            index = (version, stat.st_mtime, sorted(grouped_images), grouped_images)
+            with self._index_lock:
+                self._index = index
+        return index
+
     def get_image(self, filename):
         ftp = self.connect()
         try:
             image_data = bytearray()
-            ftp.retrbinary(f'RETR {filename}', image_data.extend)
+            with upstream_timer('ftp') as timer:
+                ftp.retrbinary(f'RETR {filename}', image_data.extend)
+                timer.status = 'ok'
+            upstream_bytes.inc(len(image_data), upstream='ftp')
             return image_data
         except Exception as e:
             logger.error(f"Ошибка при получении изображения {filename}: {str(e)}")
@@ -1,20 +1,53 @@
+import httplib2
+import google_auth_httplib2
+from google.auth.credentials import AnonymousCredentials
 from google.oauth2 import service_account
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from app.config import settings
 from app.utils.utils import logger
+from app.utils.metrics import upstream_timer, upstream_bytes, upstream_retries
 import time
 import random
 import pytz
 from datetime import datetime
 
+# Порядок столбцов в таблице
+COLUMNS = ['id', 'article', 'code', 'externalCode', 'pathname', 'name', 'description', 'salePrice', 'store', 'stock', 'updated', 'image_links']
+
+def column_letter(column):
+    """Возвращает буквенное обозначение столбца таблицы по его имени."""
+    return chr(ord('A') + COLUMNS.index(column))
+
+class InstrumentedHttp(httplib2.Http):
+    """
+    HTTP транспорт googleapiclient с записью метрик запросов к Google Sheets.
+    """
+
+    def request(self, *args, **kwargs):
+        with upstream_timer('sheets') as timer:
+            response, content = super().request(*args, **kwargs)
+            timer.status = response.status
+        upstream_bytes.inc(len(content or b''), upstream='sheets')
+        return response, content
+
 class GoogleSheetsService:
     def __init__(self):
-        self.credentials = service_account.Credentials.from_service_account_file(
-            settings.GOOGLE_CREDENTIALS_FILE,
-            scopes=['https://www.googleapis.com/auth/spreadsheets']
+        client_options = None
+        if settings.GOOGLE_SHEETS_ENDPOINT:
+            # Локальная замена Google Sheets API (тесты и бенчмарки) не требует авторизации
+            self.credentials = AnonymousCredentials()
+            client_options = {'api_endpoint': settings.GOOGLE_SHEETS_ENDPOINT}
+        else:
+            self.credentials = service_account.Credentials.from_service_account_file(
+                settings.GOOGLE_CREDENTIALS_FILE,
+                scopes=['https://www.googleapis.com/auth/spreadsheets']
+            )
+        self.service = build(
+            'sheets', 'v4',
+            http=google_auth_httplib2.AuthorizedHttp(self.credentials, http=InstrumentedHttp()),
+            client_options=client_options
         )
-        self.service = build('sheets', 'v4', credentials=self.credentials)
         self.spreadsheet_id = settings.GOOGLE_SPREADSHEET_ID
         self.sheet_name = settings.GOOGLE_SHEET_NAME
 
@@ -35,8 +68,7 @@ class GoogleSheetsService:
                 range=f"{self.sheet_name}!A1:Z"
             ).execute()
 
-            # Определяем порядок столбцов, добавляем image_links
-            columns = ['id', 'article', 'code', 'externalCode', 'pathname', 'name', 'description', 'salePrice', 'store', 'stock', 'updated', 'image_links']
+            columns = COLUMNS
 
             # Подготавливаем данные для вставки
             values = [columns]  # Заголовки
@@ -70,6 +102,7 @@ class GoogleSheetsService:
                         if e.resp.status in [403, 500, 503] and attempt < 4:
                             wait_time = (2 ** attempt) + (random.randint(0, 1000) / 1000)
                             logger.warning(f"Attempt {attempt + 1} failed. Retrying in {wait_time} seconds...")
+                            upstream_retries.inc(upstream='sheets')
                             time.sleep(wait_time)
                         else:
                             raise
@@ -93,6 +126,45 @@ class GoogleSheetsService:
             logger.error(f"Ошибка при выгрузке в Google Sheets: {str(e)}", exc_info=True)
             raise
 
+    def update_cells_by_code(self, updates):
+        """
+        Точечно обновляет отдельные ячейки строк, найденных по коду товара.
+
+        :param updates: Словарь код товара -> {столбец: значение}
+        :return: Количество обновленных строк
+        """
+        sheets = self.service.spreadsheets()
+        code_column = column_letter('code')
+        result = sheets.values().get(
+            spreadsheetId=self.spreadsheet_id,
+            range=f"{self.sheet_name}!{code_column}:{code_column}"
+        ).execute()
+        rows_by_code = {}
+        for index, row in enumerate(result.get('values', [])[1:], start=2):
+            if row:
+                rows_by_code[row[0]] = index
+
+        data = []
+        updated_rows = 0
+        for code, fields in updates.items():
+            row = rows_by_code.get(code)
+            if not row:
+                continue
+            updated_rows += 1
+            for column, value in fields.items():
+                data.append({
+                    'range': f"{self.sheet_name}!{column_letter(column)}{row}",
+                    'values': [[str(value)]]
+                })
+
+        if data:
+            sheets.values().batchUpdate(
+                spreadsheetId=self.spreadsheet_id,
+                body={'valueInputOption': 'RAW', 'data': data}
+            ).execute()
+        logger.info(f"Точечно обновлено {updated_rows} строк в Google Sheets")
+        return updated_rows
+
     def apply_formatting(self, sheet_id):
         """Применяет форматирование к таблице."""
         requests = [
@@ -0,0 +1,130 @@
+import asyncio
+import aiohttp
+from fastapi import HTTPException
+from app.config import settings
+from app.utils.utils import logger
+from app.utils import json_codec
+from app.utils.metrics import moysklad_trace, upstream_retries, rows_processed
+from app.utils.backpressure import backpressure
+from app.services.auth import auth_service
+
+
+class PageFetcher:
+    """
+    Постраничная загрузка отчетов и сущностей МойСклад с регулированием по памяти.
+
+    Размер страницы и количество параллельных запросов задает backpressure перед каждым
+    окном страниц. Строки окна преобразуются TransformPool (большие наборы - в пуле
+    процессов) в порядке страниц, обработанные строки копятся в буфере не больше
+    backpressure.buffer_limit() строк и пишутся в приемники в отдельном потоке,
+    поэтому в памяти не держится весь набор данных.
+
+    Строки пишутся в приемники набора данных (SinkSet из sink_registry): выбранные
+    конфигурацией форматы и замену таблицы хранилища каталога, приемники пишутся одновременно.
+    """
+
+    def __init__(self):
+        self.base_url = settings.MY_SKLAD_API_URL
+
+    async def fetch_page(self, session, url, params, retries, retry_delay):
+        for attempt in range(retries):
+            try:
+                for _ in range(2):
+                    headers = await auth_service.get_auth_header()
+                    async with session.get(url, headers=headers, params=params) as response:
+                        if response.status == 200:
+                            return await response.json(loads=json_codec.loads)
+                        if response.status == 401:
+                            logger.warning("Получен код 401, попытка обновления токена")
+                            upstream_retries.inc(upstream='moysklad')
+                            await auth_service.refresh_token()
+                            continue
+                        logger.error(f"Неожиданный код ответа: {response.status}")
+                        raise HTTPException(status_code=response.status, detail="Ошибка при получении данных от API МойСклад")
+                raise HTTPException(status_code=401, detail="Не удалось авторизоваться в API МойСклад")
+            except Exception as e:
+                if attempt == retries - 1:
+                    raise
+                logger.warning(f"Попытка {attempt + 1} не удалась: {str(e)}. Повтор через {retry_delay} секунд...")
+                upstream_retries.inc(upstream='moysklad')
+                await asyncio.sleep(retry_delay)
+
+    async def fetch(self, endpoint, process_rows, sinks, dataset=None,
+                    retries=1, retry_delay=5, timeout=None, keep_partial=False):
+        """
+        Загружает все страницы эндпоинта и пишет строки в приемники.
+
+        :param process_rows: Функция преобразования сырых строк в обработанные (row_transforms)
+        :param sinks: SinkSet - приемники обработанных и сырых строк
+        :param keep_partial: При ошибке сохранить уже полученные данные, а не отменять запись
+        :return: Количество обработанных строк
+        """
+        url = f"{self.base_url}/{endpoint}"
+        logger.info(f"Начало получения данных для эндпоинта: {endpoint}")
+        buffered, raw_buffered = [], []
+        written = 0
+        keep_raw = any(sink.raw for sink in sinks.sinks)
+
+        async def flush():
+            nonlocal buffered, raw_buffered, written
+            rows, raw_rows = buffered, raw_buffered
+            buffered, raw_buffered = [], []
+            await asyncio.to_thread(sinks.write, rows, raw_rows)
+            written += len(rows)
+
+        try:
+            offset = 0
+            total = None
+            timeout = aiohttp.ClientTimeout(total=timeout)
+            async with aiohttp.ClientSession(timeout=timeout, trace_configs=[moysklad_trace]) as session:
+                while total is None or offset < total:
+                    await backpressure.wait_for_memory()
+                    limit, concurrency = backpressure.next_window()
+                    # Первая страница сообщает общее количество строк
+                    offsets = [offset + i * limit for i in range(concurrency if total is not None else 1)]
+                    if total is not None:
+                        offsets = [o for o in offsets if o < total]
+                    pages = await asyncio.gather(*(
+                        self.fetch_page(session, url, {"offset": o, "limit": limit}, retries, retry_delay)
+                        for o in offsets
+                    ))
+
+                    finished = False
+                    window_rows = []
+                    for data in pages:
+                        rows = data.get('rows', [])
+                        if total is None:
+                            total = data.get('meta', {}).get('size')
+                        window_rows.extend(rows)
+                        if len(rows) < limit:
+                            finished = True
+                            break
+                    del pages
+                    if keep_raw:
+                        raw_buffered.extend(window_rows)
+                    processed = process_rows(window_rows)
+                    if len(processed) < len(window_rows):
+                        logger.warning(f"Пропущено некорректных записей: {len(window_rows) - len(processed)} ({endpoint})")
+                    buffered.extend(processed)
+                    del window_rows
+                    logger.info(f"Получено {written + len(buffered)} записей из {total if total is not None else '?'} ({endpoint})")
+                    if len(buffered) >= backpressure.buffer_limit():
+                        await flush()
+                    if finished:
+                        break
+                    offset = offsets[-1] + limit
+        except Exception as e:
+            if not keep_partial:
+                await asyncio.to_thread(sinks.abort)
+                raise
+            logger.error(f"Ошибка при получении данных для эндпоинта {endpoint}, сохраняются полученные данные: {str(e)}")
+
+        await flush()
+        await asyncio.to_thread(sinks.close)
+        if dataset:
+            rows_processed.inc(written, dataset=dataset)
+        logger.info(f"Получение данных для эндпоинта {endpoint} завершено: {written} записей")
+        return written
+
+
+page_fetcher = PageFetcher()
@@ -1,115 +1,112 @@
+import asyncio
 import os
-import json
+import threading
+import time
 from datetime import datetime
-import xml.etree.ElementTree as ET
+from contextlib import contextmanager, ExitStack
 from app.utils.utils import logger, load_json_file
-from app.services.google_sheets_service import google_sheets_service
+from app.utils.metrics import stage_timer
+from app.utils.profiling import RunProfiler, current_profiler
+from app.services.google_sheets_service import google_sheets_service, COLUMNS
+from app.services.catalog_store import catalog_store
+from app.services.product_merger import product_merger
+from app.services.change_tracker import change_tracker
+from app.services.catalog_snapshot import catalog_snapshot, write_snapshot, patch_snapshot
+from app.services.sink_registry import sink_registry, BatchSink
 from app.config import settings
 from app.routers.assortment import get_assortment
 from app.routers.warehouse_balances import get_warehouse_balances
 from app.routers.warehouse_stock import get_warehouse_stock
-from app.routers.ftp_images import get_ftp_images
+from app.services.ftp_service import ftp_service
+
+# Файлы источников, из которых собирается объединенный каталог
+SOURCE_FILES = {
+    'assortment': 'assortment.json',
+    'stock': 'warehouse_stock.json',
+    'balances': 'warehouse_balances.json',
+    'images': 'ftp_images.json',
+}
 
 class ProductCollectorService:
     def __init__(self):
         self.json_dir = settings.JSON_DIR
         self.xml_dir = settings.XML_DIR
+        # Кэш загруженных источников: имя -> (mtime_ns, size, данные)
+        self._source_cache = {}
+        # Блокировка записи каталога (пересборка и точечные обновления)
+        self.catalog_lock = threading.Lock()
+        self.catalog_file = os.path.join(self.json_dir, 'combined_products.json')
+        # Отложенная запись файлов каталога (JSON, XML) после точечных обновлений
+        self._outputs_timer = None
+        self._outputs_dirty = False
+        self._outputs_lock = threading.Lock()
 
-    def combine_data(self):
-        logger.info("Начало объединения данных")
-        combined_data = {}
-
-        # Загрузка данных из файлов
-        assortment_data = load_json_file(os.path.join(self.json_dir, 'assortment.json'))
-        warehouse_stock_data = load_json_file(os.path.join(self.json_dir, 'warehouse_stock.json'))
-        warehouse_balances_data = load_json_file(os.path.join(self.json_dir, 'warehouse_balances.json'))
-
-        # Обработка данных ассортимента
-        for item in assortment_data:
-            if isinstance(item, dict) and 'id' in item:
-                product_id = item['id']
-                combined_data[product_id] = {
-                    'id': product_id,
-                    'article': item.get('article', ''),
-                    'code': item.get('code', ''),
-                    'externalCode': item.get('externalCode', ''),
-                    'pathname': item.get('pathname', ''),
-                    'name': item.get('name', ''),
-                    'description': item.get('description', ''),
-                    'updated': item.get('updated', '')
-                }
+    @contextmanager
+    def stage(self, name):
+        """
+        Контекст этапа сбора данных: длительность и память этапа записываются в метрики,
+        а при включенном профилировании этап дополнительно профилируется.
+        """
+        profiler = current_profiler.get()
+        with ExitStack() as stack:
+            stack.enter_context(stage_timer(name))
+            if profiler is not None:
+                stack.enter_context(profiler.stage(name))
+            yield
 
-        # Добавление данных о складских запасах
-        for item in warehouse_stock_data:
-            if isinstance(item, dict) and 'id' in item:
-                product_id = item['id']
-                if product_id in combined_data:
-                    combined_data[product_id]['salePrice'] = item.get('salePrice', '')
-                    combined_data[product_id]['stock'] = item.get('stock', '')
-
-        # Добавление данных об остатках по складам
-        for item in warehouse_balances_data:
-            if isinstance(item, dict) and 'id' in item:
-                product_id = item['id']
-                if product_id in combined_data:
-                    combined_data[product_id]['store'] = item.get('store', '')
+    def load_source(self, name):
+        """
+        Загружает данные источника из JSON файла. Файл перечитывается только если он изменился
+        с момента предыдущей загрузки, иначе возвращаются данные из кэша.
+        """
+        file_path = os.path.join(self.json_dir, SOURCE_FILES[name])
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            self._source_cache.pop(name, None)
+            return load_json_file(file_path)
 
+        cached = self._source_cache.get(name)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+        logger.info(f"Загрузка источника {name} из {file_path}")
+        data = load_json_file(file_path)
+        self._source_cache[name] = (stat.st_mtime_ns, stat.st_size, data)
+        return data
+
+    def combine_data(self):
+        """
+        Объединяет ассортимент, остатки и склады запросом к хранилищу каталога.
+
+        :return: Список товаров, отсортированный по коду
+        """
+        logger.info("Начало объединения данных")
+        combined_data = list(catalog_store.iter_combined())
         logger.info(f"Объединено {len(combined_data)} записей")
-        return list(combined_data.values())
+        return combined_data
 
-    def merge_duplicate_products(self, combined_data):
+    def merge_duplicate_products(self, combined_data, result=None):
         """
-        Объединяет парные записи о товарах на основе поля 'code'.
+        Объединяет записи о товарах с одинаковым кодом по правилам app/config/merge_rules.py.
 
-        :param combined_data: Список словарей с данными о товарах
+        :param combined_data: Список словарей с данными о товарах, отсортированный по коду
+        :param result: Словарь отчета, в который добавляется отчет об объединении
         :return: Список объединенных данных о товарах
         """
-        # Создаем словарь для хранения товаров по коду
-        products_by_code = {}
-
-        # Проходим по всем товарам
-        for product in combined_data:
-            code = product.get('code')
-            if code not in products_by_code:
-                products_by_code[code] = []
-            products_by_code[code].append(product)
-
-        merged_products = []
-
-        # Объединяем парные записи
-        for code, products in products_by_code.items():
-            if len(products) == 2:
-                # Определяем, какая запись имеет значение в поле 'article'
-                product_with_article = next((p for p in products if p.get('article')), None)
-                product_without_article = next((p for p in products if not p.get('article')), None)
-
-                if product_with_article and product_without_article:
-                    # Объединяем данные
-                    merged_product = {
-                        'id': product_with_article['id'],
-                        'article': product_with_article['article'],
-                        'code': product_with_article['code'],
-                        'externalCode': product_with_article['externalCode'],
-                        'pathname': product_with_article['pathname'],
-                        'name': product_with_article['name'],
-                        'description': product_with_article['description'],
-                        'salePrice': product_without_article.get('salePrice', ''),
-                        'store': product_without_article.get('store', ''),
-                        'stock': product_without_article.get('stock', ''),
-                        'updated': product_with_article['updated']
-                    }
-                    merged_products.append(merged_product)
-                else:
-                    # Если не удалось определить пару, добавляем оба продукта
-                    merged_products.extend(products)
-            else:
-                # Если нет пары, добавляем продукт как есть
-                merged_products.extend(products)
-
-        logger.info(f"Объединено {len(combined_data) - len(merged_products)} пар товаров")
+        merged_products = list(product_merger.merge(combined_data))
+        product_merger.log_report()
+        if result is not None:
+            result["merge"] = product_merger.report
         return merged_products
 
-    async def collect_and_process_data(self):
+    async def collect_and_process_data(self, profile=False, force=False):
+        """
+        Собирает данные из всех источников, объединяет их и выгружает.
+
+        :param profile: Профилировать этапы запуска (cProfile и tracemalloc) и сохранить отчет
+        :param force: Загрузить источники заново, не используя кэш загрузок
+        """
         logger.info("Начало сбора и обработки данных о товарах")
         result = {
             "message": "Данные частично обработаны",
@@ -117,48 +114,47 @@ class ProductCollectorService:
             "errors": [],
             "warnings": []
         }
+        profiler = None
+        if profile or settings.PROFILE_SYNC_RUNS:
+            profiler = RunProfiler()
+            profiler.start()
+            current_profiler.set(profiler)
         try:
             # Существующая логика
-            await get_assortment()
-            result["steps_completed"].append("Assortment data update")
-            await get_warehouse_balances()
-            result["steps_completed"].append("Warehouse balances data update")
-            await get_warehouse_stock()
-            result["steps_completed"].append("Warehouse stock data update")
-
-            combined_data = self.combine_data()
-            result["steps_completed"].append("Data combination")
-            logger.info(f"Объединено {len(combined_data)} записей")
-
-            merged_data = self.merge_duplicate_products(combined_data)
-            result["steps_completed"].append("Duplicate products merged")
-            logger.info(f"После объединения дубликатов осталось {len(merged_data)} записей")
-
-            if not merged_data:
-                result["warnings"].append("No data after merging duplicates")
+            result["sinks"] = {}
+            # Свежесть данных источников: загружены сейчас или взяты из кэша загрузок
+            result["sources"] = {}
+            for name, fetch, step in (
+                ('assortment', get_assortment, "Assortment data update"),
+                ('balances', get_warehouse_balances, "Warehouse balances data update"),
+                ('stock', get_warehouse_stock, "Warehouse stock data update"),
+            ):
+                with self.stage(name):
+                    fetched = await fetch(force=force)
+                result["sinks"][name] = fetched.get("sinks")
+                result["sources"][name] = fetched.get("cache")
+                result["steps_completed"].append(step)
 
-            # Новая логика: запуск эндпоинта /FTPimages
-            await get_ftp_images()
+            with self.stage('images'):
+                await asyncio.to_thread(ftp_service.refresh_image_links)
             result["steps_completed"].append("FTP images data update")
 
-            # Добавление ссылок на изображения
-            merged_data = self.add_image_links(merged_data)
-            result["steps_completed"].append("Image links added to products")
-
-            json_filename = os.path.join(self.json_dir, 'combined_products.json')
-            self.save_to_json(merged_data, json_filename)
-            xml_filename = os.path.join(self.xml_dir, 'combined_products.xml')
-            self.save_to_xml(merged_data, xml_filename)
-            result["steps_completed"].append("Data saving (JSON and XML)")
+            # Сборка ждет catalog_lock и записи в хранилище и файлы - выполняется в потоке
+            merged_data, json_filename, xml_filename = await asyncio.to_thread(self.build_catalog, result)
 
-            if merged_data:
+            if not sink_registry.enabled('catalog', 'sheets'):
+                result["steps_completed"].append("Google Sheets upload disabled")
+            elif merged_data:
+                started = time.perf_counter()
                 try:
-                    sheet_url = await google_sheets_service.upload_to_sheets(merged_data)
-                    result["steps_completed"].append("Google Sheets upload")
-                    result["google_sheet_url"] = sheet_url
+                    with self.stage('sheets_upload'):
+                        await self.upload_to_sheets(merged_data, change_tracker.last_change_set, result)
                 except Exception as e:
                     logger.error(f"Ошибка при выгрузке в Google Sheets: {str(e)}", exc_info=True)
                     result["errors"].append(f"Google Sheets upload failed: {str(e)}")
+                result.setdefault("sinks", {}).setdefault("catalog", {})["sheets"] = {
+                    "rows": len(merged_data), "seconds": round(time.perf_counter() - started, 3)
+                }
             else:
                 result["warnings"].append("Skipping Google Sheets upload due to empty data")
 
@@ -169,26 +165,190 @@ class ProductCollectorService:
         except Exception as e:
             logger.error(f"Ошибка при сборе и обработке данных: {str(e)}", exc_info=True)
             result["errors"].append(f"General error: {str(e)}")
+        finally:
+            if profiler is not None:
+                current_profiler.set(None)
+                profiler.stop()
+                try:
+                    result["profile_run_id"] = profiler.run_id
+                    result["profile_report"] = await asyncio.to_thread(profiler.save)
+                except Exception as e:
+                    logger.error(f"Ошибка при сохранении отчета профилирования: {str(e)}", exc_info=True)
+                    result["errors"].append(f"Profile report failed: {str(e)}")
         return result
 
-    def save_to_json(self, data, filename):
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        logger.info(f"Данные сохранены в JSON: {filename}")
-
-    def save_to_xml(self, data, filename):
-        root = ET.Element('products')
-        for item in data:
-            product = ET.SubElement(root, 'product')
-            for key, value in item.items():
-                ET.SubElement(product, key).text = str(value)
-        tree = ET.ElementTree(root)
-        tree.write(filename, encoding='utf-8', xml_declaration=True)
-        logger.info(f"Данные сохранены в XML: {filename}")
+    async def upload_to_sheets(self, merged_data, changes, result):
+        """
+        Выгружает каталог в Google Sheets с учетом набора изменений: без изменений выгрузка
+        пропускается, если изменились только значения полей - обновляются отдельные ячейки,
+        при новых или удаленных товарах (меняются строки таблицы) выполняется полная выгрузка.
+        """
+        if changes is not None and change_tracker.in_sync('sheets', changes.previous_run_id) \
+                and not changes.new and not changes.removed:
+            updates = changes.updates(COLUMNS)
+            for fields in updates.values():
+                if 'image_links' in fields:
+                    fields['image_links'] = '\n'.join(fields['image_links'] or [])
+            if updates:
+                await asyncio.to_thread(google_sheets_service.update_cells_by_code, updates)
+                result["steps_completed"].append("Google Sheets incremental update")
+            else:
+                result["steps_completed"].append("Google Sheets upload skipped (no changes)")
+            result["sheets_updated"] = len(updates)
+            result["google_sheet_url"] = f"https://docs.google.com/spreadsheets/d/{google_sheets_service.spreadsheet_id}"
+        else:
+            result["google_sheet_url"] = await google_sheets_service.upload_to_sheets(merged_data)
+            result["steps_completed"].append("Google Sheets upload")
+        if changes is not None:
+            change_tracker.mark_applied('sheets', changes.run_id)
+
+    def build_catalog(self, result=None):
+        """
+        Собирает объединенный каталог из последних сохраненных данных источников
+        и сохраняет его в хранилище, снимок и выбранные форматы (JSON, XML).
+
+        :param result: Словарь отчета, в который добавляются выполненные шаги
+        :return: Кортеж (данные каталога, путь к JSON файлу, путь к XML файлу; None для невыбранных форматов)
+        """
+        if result is None:
+            result = {"steps_completed": [], "warnings": []}
+
+        with self.stage('combine'):
+            combined_data = self.combine_data()
+        result["steps_completed"].append("Data combination")
+
+        with self.stage('merge'):
+            merged_data = self.merge_duplicate_products(combined_data, result)
+        result["steps_completed"].append("Duplicate products merged")
+        logger.info(f"После объединения дубликатов осталось {len(merged_data)} записей")
+
+        if not merged_data:
+            result["warnings"].append("No data after merging duplicates")
+
+        # Добавление ссылок на изображения
+        with self.stage('image_links'):
+            merged_data = self.add_image_links(merged_data)
+        result["steps_completed"].append("Image links added to products")
+
+        json_filename, xml_filename = self.catalog_paths()
+        with self.catalog_lock:
+            with self.stage('hash'):
+                changes = change_tracker.diff(merged_data)
+            outputs = [path for path in (json_filename, xml_filename, catalog_snapshot.path) if path]
+            if changes.is_empty() and all(os.path.exists(path) for path in outputs):
+                # Каталог не изменился с прошлой сборки - опубликованные файлы актуальны
+                result["steps_completed"].append("Data saving skipped (no changes)")
+            else:
+                with self.stage('save'):
+                    sinks = self.save_catalog_outputs(merged_data, catalog_store.save_catalog)
+                # Файлы каталога записаны полностью, отложенная запись после точечных обновлений не нужна
+                self._outputs_dirty = False
+                result.setdefault("sinks", {})["catalog"] = sinks.report()
+                result["steps_completed"].append(f"Data saving ({', '.join(sinks.formats())})")
+            change_tracker.commit(changes)
+            result["changes"] = changes.summary()
+        return merged_data, json_filename, xml_filename
+
+    def catalog_paths(self):
+        """
+        :return: Кортеж (путь к JSON, путь к XML) каталога, None для невыбранных форматов
+        """
+        return (
+            self.catalog_file if sink_registry.enabled('catalog', 'json') else None,
+            os.path.join(self.xml_dir, 'combined_products.xml') if sink_registry.enabled('catalog', 'xml') else None,
+        )
+
+    def save_catalog_outputs(self, catalog, save_to_store):
+        """
+        Записывает каталог одновременно в хранилище (save_to_store), снимок каталога
+        и выбранные конфигурацией форматы.
+
+        :return: SinkSet с отчетом о времени записи
+        """
+        sinks = sink_registry.open('catalog', {
+            'store': BatchSink(save_to_store),
+            'snapshot': BatchSink(lambda rows: write_snapshot(rows, catalog_snapshot.path)),
+        })
+        try:
+            sinks.write(catalog)
+        except Exception:
+            sinks.abort()
+            raise
+        sinks.close()
+        return sinks
+
+    def load_catalog(self):
+        """
+        Загружает последний опубликованный объединенный каталог из хранилища.
+        """
+        return catalog_store.load_catalog()
+
+    def patch_catalog(self, updates):
+        """
+        Точечно обновляет поля товаров сохраненного каталога без полной пересборки: в хранилище
+        обновляются только строки этих товаров, в снимке - только их записи, а файлы каталога
+        (JSON, XML) перезаписываются с задержкой CATALOG_OUTPUT_DEBOUNCE, одной записью на
+        несколько обновлений. Изменение сохраняется отдельным запуском набора изменений.
+
+        :param updates: Словарь код товара -> {поле: значение}
+        :return: Кортеж (список обновленных товаров, ChangeSet изменения)
+        """
+        with self.catalog_lock:
+            patched = []
+            for product in catalog_store.get_products_by_codes(updates):
+                previous = dict(product)
+                product.update(updates[product['code']])
+                patched.append((previous, product))
+            products = [product for _, product in patched]
+            if products:
+                catalog_store.update_catalog(products)
+                view = catalog_snapshot.current()
+                if view is None or not patch_snapshot(view, products, catalog_snapshot.path):
+                    write_snapshot(catalog_store.load_catalog(), catalog_snapshot.path)
+                self.schedule_catalog_outputs()
+            changes = change_tracker.record_patch(patched)
+        logger.info(f"В каталоге точечно обновлено {len(products)} товаров")
+        return products, changes
+
+    def schedule_catalog_outputs(self):
+        """
+        Планирует перезапись файлов каталога после точечного обновления. Обновления в течение
+        CATALOG_OUTPUT_DEBOUNCE секунд объединяются в одну запись.
+        """
+        self._outputs_dirty = True
+        with self._outputs_lock:
+            if self._outputs_timer is None:
+                self._outputs_timer = threading.Timer(settings.CATALOG_OUTPUT_DEBOUNCE, self.flush_catalog_outputs)
+                self._outputs_timer.daemon = True
+                self._outputs_timer.start()
+
+    def flush_catalog_outputs(self):
+        """
+        Перезаписывает файлы каталога из хранилища, если после последней записи были
+        точечные обновления (вызывается таймером и при остановке приложения).
+        """
+        with self._outputs_lock:
+            timer, self._outputs_timer = self._outputs_timer, None
+        if timer is not None:
+            timer.cancel()
+        with self.catalog_lock:
+            if not self._outputs_dirty:
+                return
+            self._outputs_dirty = False
+            try:
+                sinks = sink_registry.open('catalog')
+                if sinks:
+                    try:
+                        sinks.write(catalog_store.load_catalog())
+                    except Exception:
+                        sinks.abort()
+                        raise
+                    sinks.close()
+            except Exception as e:
+                logger.error(f"Ошибка записи файлов каталога после точечных обновлений: {str(e)}", exc_info=True)
 
     def add_image_links(self, products):
-        ftp_images_file = os.path.join(self.json_dir, 'ftp_images.json')
-        ftp_images = load_json_file(ftp_images_file)
+        ftp_images = self.load_source('images')
 
         for product in products:
             article = product.get('article')
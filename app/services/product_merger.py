@@ -0,0 +1,187 @@
+from itertools import groupby
+from app.config.merge_rules import MERGE_RULES, MERGE_DEFAULT_RULE, MERGE_ARTICLE_CONFLICTS
+from app.utils.utils import logger
+
+# Количество кодов с конфликтом артикулов, сохраняемых в отчете
+REPORT_SAMPLE_SIZE = 20
+
+
+def to_number(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def group_numbers(group, field):
+    return [n for n in (to_number(p.get(field)) for p in group.records) if n is not None]
+
+
+def pick_max(group, field):
+    numbers = group_numbers(group, field)
+    return integral(max(numbers)) if numbers else ''
+
+
+def pick_sum(group, field):
+    numbers = group_numbers(group, field)
+    return integral(sum(numbers)) if numbers else ''
+
+
+def pick_join(group, field):
+    values = {}
+    for product in group.records:
+        for value in str(product.get(field) or '').split(', '):
+            if value:
+                values[value] = None
+    return ', '.join(values)
+
+
+def pick_first_nonempty(group, field):
+    for product in group.ordered():
+        value = product.get(field)
+        if value not in (None, ''):
+            return value
+    return ''
+
+
+def integral(value):
+    return int(value) if isinstance(value, float) and value.is_integer() else value
+
+
+SOURCES = {
+    'primary': lambda group, field: group.primary.get(field, ''),
+    'variant': lambda group, field: group.variant.get(field, ''),
+    'first_nonempty': pick_first_nonempty,
+    'max': pick_max,
+    'sum': pick_sum,
+    'join': pick_join,
+}
+
+
+class MergeGroup:
+    """
+    Записи товаров с одинаковым кодом: основная запись и вариант выбираются за один проход.
+    """
+
+    def __init__(self, records):
+        self.records = records
+        self.primary = None
+        self.variant = None
+        self.articles = set()
+        variant_stock = None
+        for product in records:
+            article = product.get('article')
+            if article:
+                self.articles.add(article)
+                if self.primary is None:
+                    self.primary = product
+            else:
+                stock = to_number(product.get('stock'))
+                if self.variant is None or (stock is not None and (variant_stock is None or stock > variant_stock)):
+                    self.variant = product
+                    variant_stock = stock
+        if self.primary is None:
+            self.primary = records[0]
+        if self.variant is None or self.variant is self.primary:
+            self.variant = self.primary
+
+    def ordered(self):
+        yield self.primary
+        if self.variant is not self.primary:
+            yield self.variant
+        for product in self.records:
+            if product is not self.primary and product is not self.variant:
+                yield product
+
+
+class ProductMerger:
+    """
+    Объединение записей товаров с одинаковым кодом по правилам MERGE_RULES.
+
+    Вход отсортирован по коду, поэтому группы обрабатываются за один проход без
+    дополнительных индексов: время и память линейны по количеству записей, в памяти
+    держится только текущая группа. Записи без кода не объединяются.
+    """
+
+    def __init__(self, rules=None, default_rule=None, article_conflicts=None):
+        self.rules = dict(MERGE_RULES if rules is None else rules)
+        self.default_rule = default_rule or MERGE_DEFAULT_RULE
+        self.article_conflicts = article_conflicts or MERGE_ARTICLE_CONFLICTS
+        for field, rule in list(self.rules.items()) + [('*', self.default_rule)]:
+            if rule not in SOURCES:
+                raise ValueError(f"Неизвестное правило объединения '{rule}' для поля {field}")
+        if self.article_conflicts not in ('merge', 'keep'):
+            raise ValueError(f"Некорректное значение MERGE_ARTICLE_CONFLICTS: {self.article_conflicts}")
+        # Источник значения для каждого поля правил вычисляется один раз
+        self.plan = [(field, SOURCES[rule]) for field, rule in self.rules.items()]
+        self.default_source = SOURCES[self.default_rule]
+        self.report = None
+
+    def new_report(self):
+        return {
+            "input": 0,
+            "output": 0,
+            "groups_merged": 0,
+            "records_merged": 0,
+            "group_sizes": {},
+            "article_conflicts": 0,
+            "article_conflicts_kept": 0,
+            "conflict_codes": [],
+        }
+
+    def merge_group(self, group):
+        merged = {field: source(group, field) for field, source in self.plan}
+        for product in group.records:
+            for field in product:
+                if field not in merged:
+                    merged[field] = self.default_source(group, field)
+        return merged
+
+    def merge(self, products):
+        """
+        Объединяет записи с одинаковым кодом. Отчет о последнем объединении - в self.report.
+
+        :param products: Итерируемые записи товаров, отсортированные по коду
+        :return: Генератор объединенных записей
+        """
+        report = self.report = self.new_report()
+        for code, records in groupby(products, key=lambda p: p.get('code')):
+            records = list(records)
+            report["input"] += len(records)
+            if not code or len(records) == 1:
+                report["output"] += len(records)
+                yield from records
+                continue
+
+            group = MergeGroup(records)
+            if len(group.articles) > 1:
+                report["article_conflicts"] += 1
+                if len(report["conflict_codes"]) < REPORT_SAMPLE_SIZE:
+                    report["conflict_codes"].append(code)
+                if self.article_conflicts == 'keep':
+                    report["article_conflicts_kept"] += 1
+                    report["output"] += len(records)
+                    yield from records
+                    continue
+
+            report["groups_merged"] += 1
+            report["records_merged"] += len(records)
+            size = str(len(records))
+            report["group_sizes"][size] = report["group_sizes"].get(size, 0) + 1
+            report["output"] += 1
+            yield self.merge_group(group)
+
+    def log_report(self):
+        report = self.report
+        logger.info(
+            f"Объединено {report['groups_merged']} групп товаров ({report['records_merged']} записей), "
+            f"размеры групп: {report['group_sizes']}, записей после объединения: {report['output']}"
+        )
+        if report["article_conflicts"]:
+            logger.warning(
+                f"Группы с разными артикулами: {report['article_conflicts']}, "
+                f"оставлены без объединения: {report['article_conflicts_kept']}, коды: {report['conflict_codes']}"
+            )
+
+
+product_merger = ProductMerger()
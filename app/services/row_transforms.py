@@ -0,0 +1,97 @@
+"""
+Преобразование сырых строк МойСклад в строки наборов данных.
+
+Функции чистые и не зависят от настроек и логгера приложения. Строка, которую не удалось
+преобразовать, пропускается, количество пропущенных строк логирует PageFetcher.
+"""
+
+
+def extract_id_from_url(url):
+    """
+    Извлекает ID товара из URL.
+    """
+    if not isinstance(url, str):
+        return ''
+    return url.split('/')[-1].split('?')[0]
+
+
+def stock_store_names(stock_stores):
+    """
+    Названия складов с ненулевым остатком через запятую.
+    """
+    return ', '.join(store['name'] for store in stock_stores if store.get('stock', 0) > 0)
+
+
+def sale_price(item):
+    """
+    Цена продажи в гривнах (в МойСклад цены хранятся в копейках).
+    """
+    price = item.get('salePrice')
+    if isinstance(price, dict):
+        return price.get('value', 0) / 100
+    elif isinstance(price, (int, float)):
+        return price / 100
+    return 0
+
+
+def category(item):
+    """
+    Категория товара: путь группы товара, если он не пустой, иначе название группы.
+    """
+    folder = item.get('folder', {})
+    if isinstance(folder, dict):
+        return folder.get('pathName') or folder.get('name', '')
+    return ''
+
+
+def transform_assortment(rows):
+    processed = []
+    for item in rows:
+        try:
+            processed.append({
+                'id': extract_id_from_url(item['meta']['href']),
+                'article': item.get('article', ''),
+                'code': item.get('code', ''),
+                'description': item.get('description', ''),
+                'externalCode': item.get('externalCode', ''),
+                'name': item.get('name', ''),
+                'pathname': item.get('pathName', ''),
+                'stockStore': stock_store_names(item.get('stockStore', [])),
+                'updated': item.get('updated', '')
+            })
+        except Exception:
+            continue
+    return processed
+
+
+def transform_stock(rows):
+    processed = []
+    for item in rows:
+        try:
+            processed.append({
+                'id': extract_id_from_url(item['meta']['href']),  # ID товара
+                'name': item.get('name', ''),  # название товара
+                'code': item.get('code', ''),  # код товара
+                'article': item.get('article', ''),  # артикул товара
+                'salePrice': sale_price(item),  # стоимость товара
+                'stock': item.get('stock', 0),  # остаток товара на складе
+                'category': category(item),  # категория товара
+                'updated': item.get('updated', '')  # дата и время последнего обновления товара
+            })
+        except Exception:
+            continue
+    return processed
+
+
+def transform_balances(rows):
+    processed = []
+    for item in rows:
+        if not isinstance(item, dict):
+            continue
+        stores = [store for store in item.get('stockByStore', []) if store.get('stock', 0) > 0]
+        processed.append({
+            'id': extract_id_from_url(item.get('meta', {}).get('href', '')),
+            'store': ', '.join([store['name'] for store in stores]),
+            'stockByStore': {store['name']: store['stock'] for store in stores}
+        })
+    return processed
@@ -0,0 +1,278 @@
+import asyncio
+import fcntl
+import hashlib
+import os
+import time
+from datetime import datetime
+from app.config import settings
+from app.utils.utils import logger, kiev_tz
+from app.services.assortment_service import assortment_service
+from app.services.warehouse_stock_service import warehouse_stock_service
+from app.services.warehouse_balances_service import warehouse_balances_service
+from app.services.ftp_service import ftp_service
+from app.services.fetch_cache import fetch_cache
+from app.services.product_collector_service import product_collector_service, SOURCE_FILES
+from app.services.stock_tick_service import stock_tick_service
+
+
+class DatasetState:
+    """
+    Состояние свежести одного набора данных.
+    """
+
+    def __init__(self, name, interval):
+        self.name = name
+        self.interval = interval
+        self.last_started = None
+        self.last_refreshed = None
+        self.last_changed = None
+        self.last_duration = None
+        self.fingerprint = None
+        self.error = None
+        self.running = False
+
+    def to_dict(self):
+        now = time.time()
+        return {
+            "interval": self.interval,
+            "running": self.running,
+            "last_started": format_timestamp(self.last_started),
+            "last_refreshed": format_timestamp(self.last_refreshed),
+            "last_changed": format_timestamp(self.last_changed),
+            "age_seconds": round(now - self.last_refreshed, 1) if self.last_refreshed else None,
+            "last_duration": self.last_duration,
+            "error": self.error,
+        }
+
+
+def format_timestamp(timestamp):
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, kiev_tz).strftime("%d.%m.%Y %H:%M:%S")
+
+
+class RefreshScheduler:
+    """
+    Планировщик обновления источников данных с независимыми интервалами.
+
+    Каждый источник (остатки, остатки по складам, ассортимент, изображения) обновляется
+    по своему расписанию. После обновления сравнивается отпечаток сохраненного файла источника,
+    и объединенный каталог пересобирается только если хотя бы один источник изменился.
+
+    При нескольких воркерах uvicorn планировщик работает только в одном из них: воркер,
+    захвативший файловую блокировку в STATE_DIR, становится ведущим, остальные не запускают
+    фоновые задачи (иначе каждый воркер загружал бы данные и пересобирал каталог параллельно).
+    """
+
+    def __init__(self):
+        self.datasets = {
+            'stock': DatasetState('stock', settings.REFRESH_INTERVAL_STOCK),
+            'balances': DatasetState('balances', settings.REFRESH_INTERVAL_BALANCES),
+            'assortment': DatasetState('assortment', settings.REFRESH_INTERVAL_ASSORTMENT),
+            'images': DatasetState('images', settings.REFRESH_INTERVAL_IMAGES),
+        }
+        self.catalog = {
+            "last_rebuilt": None,
+            "last_duration": None,
+            "rebuilt_from": [],
+            "total_products": None,
+            "error": None,
+        }
+        self._tasks = []
+        self._locks = {name: asyncio.Lock() for name in self.datasets}
+        self._changed_sources = set()
+        self._rebuild_event = asyncio.Event()
+        # Пересборки (фоновый цикл, ручное обновление, вебхуки) выполняются по очереди
+        self._rebuild_lock = asyncio.Lock()
+        self._leader_lock = None
+        self.lock_file = os.path.join(settings.STATE_DIR, 'scheduler.lock')
+
+    async def fetch_dataset(self, name):
+        """
+        Загружает один набор данных из внешнего источника и сохраняет его в JSON.
+        """
+        # Через кэш загрузок: запрос, уже загружающий набор, не дублируется, результат обновляет кэш
+        if name == 'stock':
+            await fetch_cache.get(name, warehouse_stock_service.get_warehouse_stock, force=True)
+        elif name == 'balances':
+            await fetch_cache.get(name, warehouse_balances_service.get_warehouse_balances, force=True)
+        elif name == 'assortment':
+            await fetch_cache.get(name, assortment_service.get_assortment, force=True)
+        elif name == 'images':
+            await asyncio.to_thread(ftp_service.refresh_image_links)
+        else:
+            raise ValueError(f"Неизвестный набор данных: {name}")
+
+    async def refresh(self, name):
+        """
+        Обновляет набор данных и отмечает его как измененный, если изменилось содержимое файла.
+
+        :return: True, если данные источника изменились
+        """
+        state = self.datasets[name]
+        async with self._locks[name]:
+            state.running = True
+            state.last_started = time.time()
+            logger.info(f"Планировщик: обновление набора данных {name}")
+            try:
+                await self.fetch_dataset(name)
+                fingerprint = await asyncio.to_thread(self.file_fingerprint, name)
+                state.last_refreshed = time.time()
+                state.error = None
+                # Без JSON файла (формат json отключен в OUTPUT_SINKS) изменение не определить
+                changed = fingerprint is None or fingerprint != state.fingerprint
+                if changed:
+                    state.fingerprint = fingerprint
+                    state.last_changed = state.last_refreshed
+                    self._changed_sources.add(name)
+                    self._rebuild_event.set()
+                    logger.info(f"Планировщик: данные {name} изменились, каталог будет пересобран")
+                else:
+                    logger.info(f"Планировщик: данные {name} не изменились")
+                return changed
+            except Exception as e:
+                state.error = str(getattr(e, 'detail', e))
+                logger.error(f"Планировщик: ошибка при обновлении {name}: {state.error}", exc_info=True)
+                return False
+            finally:
+                state.running = False
+                state.last_duration = round(time.time() - state.last_started, 2)
+
+    def file_fingerprint(self, name):
+        """
+        Вычисляет отпечаток (SHA-256) файла источника.
+        """
+        file_path = os.path.join(settings.JSON_DIR, SOURCE_FILES[name])
+        if not os.path.exists(file_path):
+            return None
+        digest = hashlib.sha256()
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    async def rebuild_catalog(self):
+        """
+        Пересобирает объединенный каталог из измененных источников. Изменения, отмеченные
+        до начала пересборки, учитываются ею, поэтому сигнал фоновому циклу снимается;
+        если изменений нет (их уже учла другая пересборка), каталог не пересобирается.
+        """
+        async with self._rebuild_lock:
+            self._rebuild_event.clear()
+            if not self._changed_sources:
+                logger.info("Планировщик: изменения источников уже учтены в каталоге, пересборка не требуется")
+                return
+            changed = sorted(self._changed_sources)
+            self._changed_sources.clear()
+            started = time.time()
+            logger.info(f"Планировщик: пересборка каталога, изменились источники: {', '.join(changed)}")
+            try:
+                merged_data, _, _ = await asyncio.to_thread(product_collector_service.build_catalog)
+                self.catalog["total_products"] = len(merged_data)
+                self.catalog["rebuilt_from"] = changed
+                self.catalog["last_rebuilt"] = time.time()
+                self.catalog["error"] = None
+            except Exception as e:
+                self.catalog["error"] = str(e)
+                logger.error(f"Планировщик: ошибка при пересборке каталога: {str(e)}", exc_info=True)
+            finally:
+                self.catalog["last_duration"] = round(time.time() - started, 2)
+
+    async def refresh_and_rebuild(self, name):
+        """
+        Обновляет набор данных и сразу пересобирает каталог, если данные изменились
+        (ручное обновление и вебхуки, без ожидания фонового цикла).
+
+        :return: True, если данные источника изменились
+        """
+        changed = await self.refresh(name)
+        if changed:
+            await self.rebuild_catalog()
+        return changed
+
+    async def _dataset_loop(self, name):
+        state = self.datasets[name]
+        while True:
+            await self.refresh(name)
+            await asyncio.sleep(state.interval)
+
+    async def _stock_tick_loop(self):
+        while True:
+            try:
+                await stock_tick_service.run_tick()
+            except Exception as e:
+                logger.error(f"Планировщик: ошибка быстрого обновления остатков: {str(getattr(e, 'detail', e))}", exc_info=True)
+            await asyncio.sleep(settings.STOCK_TICK_INTERVAL)
+
+    async def _rebuild_loop(self):
+        while True:
+            await self._rebuild_event.wait()
+            # Небольшая пауза, чтобы объединить изменения нескольких источников в одну пересборку
+            await asyncio.sleep(settings.CATALOG_REBUILD_DELAY)
+            await self.rebuild_catalog()
+
+    def acquire_leadership(self):
+        """
+        Захватывает файловую блокировку планировщика. Блокировка держится, пока открыт файл,
+        и освобождается системой при завершении процесса воркера.
+
+        :return: True, если этот воркер стал ведущим
+        """
+        if self._leader_lock is not None:
+            return True
+        lock = open(self.lock_file, 'a')
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return False
+        self._leader_lock = lock
+        return True
+
+    def release_leadership(self):
+        if self._leader_lock is not None:
+            self._leader_lock.close()
+            self._leader_lock = None
+
+    def start(self):
+        """
+        Запускает фоновые задачи обновления для всех наборов данных с ненулевым интервалом.
+        Задачи запускаются только в ведущем воркере.
+        """
+        if self._tasks:
+            return
+        if not self.acquire_leadership():
+            logger.info(f"Планировщик: работает в другом воркере (блокировка {self.lock_file}), в воркере {os.getpid()} не запускается")
+            return
+        for name, state in self.datasets.items():
+            if state.interval > 0:
+                self._tasks.append(asyncio.create_task(self._dataset_loop(name)))
+                logger.info(f"Планировщик: {name} обновляется каждые {state.interval} секунд")
+        if settings.STOCK_TICK_INTERVAL > 0:
+            self._tasks.append(asyncio.create_task(self._stock_tick_loop()))
+            logger.info(f"Планировщик: быстрое обновление остатков каждые {settings.STOCK_TICK_INTERVAL} секунд")
+        self._tasks.append(asyncio.create_task(self._rebuild_loop()))
+
+    async def stop(self):
+        """
+        Останавливает все фоновые задачи планировщика.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self.release_leadership()
+
+    def status(self):
+        catalog = dict(self.catalog)
+        catalog["last_rebuilt"] = format_timestamp(catalog["last_rebuilt"])
+        return {
+            "running": bool(self._tasks),
+            "leader": self._leader_lock is not None,
+            "datasets": {name: state.to_dict() for name, state in self.datasets.items()},
+            "catalog": catalog,
+            "stock_tick": stock_tick_service.last_result,
+        }
+
+
+refresh_scheduler = RefreshScheduler()
@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.config import settings
+from app.config.output_sinks import OUTPUT_SINKS, DATASET_FILES
+from app.utils.utils import logger
+from app.utils.streaming_writers import JsonArrayWriter, XmlListWriter
+from app.services.archive_service import archive_service
+
+# Форматы без потоковой записи, которые выполняет сам сервис набора данных: формат -> наборы данных
+SERVICE_FORMATS = {'sheets': ('catalog',)}
+
+
+class TimedSink:
+    """
+    Приемник с замером времени: write(rows), close() и abort() делегируются sink,
+    raw - приемник сырых строк МойСклад.
+    """
+
+    def __init__(self, name, sink, raw=False):
+        self.name = name
+        self.sink = sink
+        self.raw = raw
+        self.rows = 0
+        self.seconds = 0.0
+
+    def call(self, method, *args):
+        started = time.perf_counter()
+        try:
+            getattr(self.sink, method)(*args)
+        finally:
+            self.seconds += time.perf_counter() - started
+
+    def write(self, rows):
+        self.call('write', rows)
+        self.rows += len(rows)
+
+    def report(self):
+        return {"rows": self.rows, "seconds": round(self.seconds, 3)}
+
+
+class BatchSink:
+    """
+    Приемник для записи всего набора одним вызовом: строки копятся в write(),
+    при закрытии вызывается save(rows) (сохранение каталога в хранилище, снимок каталога).
+    """
+
+    def __init__(self, save):
+        self.save = save
+        self.rows = []
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+    def close(self):
+        rows, self.rows = self.rows, []
+        self.save(rows)
+
+    def abort(self):
+        self.rows = []
+
+
+class SinkSet:
+    """
+    Приемники одного набора данных. Каждая пачка строк пишется во все приемники
+    одновременно в пуле потоков SinkRegistry, закрытие выполняется так же.
+    """
+
+    def __init__(self, registry, dataset, sinks):
+        self.registry = registry
+        self.dataset = dataset
+        self.sinks = sinks
+
+    def __bool__(self):
+        return bool(self.sinks)
+
+    def formats(self):
+        return [sink.name for sink in self.sinks]
+
+    def path(self, name):
+        """Путь файла приемника name (None, если формат не выбран)."""
+        for sink in self.sinks:
+            if sink.name == name:
+                return getattr(sink.sink, 'archive_path', None) or getattr(sink.sink, 'path', None)
+        return None
+
+    def run(self, calls):
+        """
+        Выполняет вызовы (приемник, метод, аргументы) параллельно и ждет все.
+        Первая ошибка пробрасывается после завершения остальных вызовов.
+        """
+        if len(calls) == 1:
+            sink, method, args = calls[0]
+            getattr(sink, method)(*args)
+            return
+        futures = [self.registry.executor.submit(getattr(sink, method), *args) for sink, method, args in calls]
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+
+    def write(self, rows, raw_rows=()):
+        """Пишет обработанные строки rows и сырые строки raw_rows в соответствующие приемники."""
+        calls = [(sink, 'write', (raw_rows if sink.raw else rows,)) for sink in self.sinks]
+        calls = [call for call in calls if call[2][0]]
+        if calls:
+            self.run(calls)
+
+    def close(self):
+        if self.sinks:
+            self.run([(sink, 'call', ('close',)) for sink in self.sinks])
+        logger.info(f"Запись {self.dataset}: " + ", ".join(
+            f"{sink.name} {sink.rows} строк за {sink.seconds:.2f} с" for sink in self.sinks
+        ))
+
+    def abort(self):
+        for sink in self.sinks:
+            try:
+                sink.sink.abort()
+            except Exception as e:
+                logger.error(f"Ошибка при отмене записи {self.dataset}/{sink.name}: {str(e)}")
+
+    def report(self):
+        """Количество строк и время записи по приемникам."""
+        return {sink.name: sink.report() for sink in self.sinks}
+
+
+class SinkRegistry:
+    """
+    Реестр выходных форматов наборов данных. Форматы набора выбираются конфигурацией
+    (app/config/output_sinks.py и настройка OUTPUT_SINKS), новые форматы подключаются
+    через register().
+    """
+
+    def __init__(self):
+        # Формат -> (фабрика (набор данных, имя файла, корень XML) -> приемник, приемник сырых строк)
+        self.factories = {}
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=max(1, settings.SINK_WORKERS), thread_name_prefix='sink')
+            return self._executor
+
+    def register(self, name, factory, raw=False):
+        self.factories[name] = (factory, raw)
+
+    def formats(self, dataset):
+        """Выбранные форматы набора данных."""
+        formats = settings.OUTPUT_SINKS.get(dataset, OUTPUT_SINKS.get(dataset, []))
+        return list(dict.fromkeys(formats))
+
+    def validate(self):
+        """
+        Проверяет выбранные форматы всех наборов данных (app/config/output_sinks.py и OUTPUT_SINKS).
+
+        :raises ValueError: Неизвестный набор данных или формат
+        """
+        for dataset in {**OUTPUT_SINKS, **settings.OUTPUT_SINKS}:
+            if dataset not in DATASET_FILES:
+                raise ValueError(
+                    f"Неизвестный набор данных {dataset} в OUTPUT_SINKS, допустимы: {', '.join(DATASET_FILES)}"
+                )
+            allowed = list(self.factories) + [name for name, datasets in SERVICE_FORMATS.items() if dataset in datasets]
+            unknown = [name for name in self.formats(dataset) if name not in allowed]
+            if unknown:
+                raise ValueError(
+                    f"Неизвестные форматы {', '.join(unknown)} набора данных {dataset} в OUTPUT_SINKS, "
+                    f"допустимы: {', '.join(allowed)}"
+                )
+
+    def enabled(self, dataset, name):
+        return name in self.formats(dataset)
+
+    def open(self, dataset, required=None):
+        """
+        Создает приемники выбранных форматов набора данных.
+
+        :param required: Обязательные приемники {имя: приемник} (хранилище каталога и т.д.)
+        :return: SinkSet
+        """
+        filename, xml_root = DATASET_FILES[dataset]
+        sinks = [TimedSink(name, sink) for name, sink in (required or {}).items()]
+        for name in self.formats(dataset):
+            if name in SERVICE_FORMATS and dataset in SERVICE_FORMATS[name]:
+                continue
+            if name not in self.factories:
+                raise ValueError(f"Неизвестный формат {name} набора данных {dataset} в OUTPUT_SINKS")
+            factory, raw = self.factories[name]
+            sinks.append(TimedSink(name, factory(dataset, filename, xml_root), raw))
+        return SinkSet(self, dataset, sinks)
+
+
+sink_registry = SinkRegistry()
+sink_registry.register(
+    'json', lambda dataset, filename, xml_root: JsonArrayWriter(os.path.join(settings.JSON_DIR, f"{filename}.json"))
+)
+sink_registry.register(
+    'xml', lambda dataset, filename, xml_root: XmlListWriter(os.path.join(settings.XML_DIR, f"{filename}.xml"), xml_root)
+)
+sink_registry.register(
+    'raw_json',
+    lambda dataset, filename, xml_root: JsonArrayWriter(os.path.join(settings.JSON_DIR, f"{filename}_raw.json")),
+    raw=True
+)
+sink_registry.register('archive', lambda dataset, filename, xml_root: archive_service.writer(filename), raw=True)
+# Ошибка в выборе форматов обнаруживается при запуске, а не отключает формат незаметно
+sink_registry.validate()
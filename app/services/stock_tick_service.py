@@ -0,0 +1,230 @@
+import asyncio
+import os
+import aiohttp
+import pytz
+from datetime import datetime
+from fastapi import HTTPException
+from app.config import settings
+from app.utils.utils import logger, load_json_file
+from app.utils import json_codec
+from app.utils.metrics import moysklad_trace, upstream_retries
+from app.services.auth import auth_service
+from app.services.google_sheets_service import google_sheets_service
+from app.services.product_collector_service import product_collector_service
+from app.services.catalog_store import catalog_store
+from app.services.change_tracker import change_tracker
+from app.services.woo.woo_registry import woo_registry
+
+# МойСклад принимает даты в фильтрах в московском времени
+moscow_tz = pytz.timezone('Europe/Moscow')
+
+
+class StockTickService:
+    """
+    Быстрое обновление только остатков и цен без полной синхронизации каталога.
+
+    Получает текущие остатки из отчета report/stock/all/current (только изменившиеся с прошлого
+    запуска) и цены товаров, обновленных с прошлого запуска, сравнивает их с последним каталогом
+    и отправляет в WooCommerce и Google Sheets только stock_quantity, stock_status и цену.
+    """
+
+    def __init__(self):
+        self.base_url = settings.MY_SKLAD_API_URL
+        self.state_file = os.path.join(settings.JSON_DIR, 'stock_tick_state.json')
+        self.last_result = None
+        self._lock = asyncio.Lock()
+
+    async def request_json(self, endpoint, params):
+        """
+        Выполняет GET запрос к API МойСклад с повтором при истечении токена.
+        """
+        url = f"{self.base_url}/{endpoint}"
+        for _ in range(2):
+            headers = await auth_service.get_auth_header()
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=60), trace_configs=[moysklad_trace]) as session:
+                async with session.get(url, headers=headers, params=params) as response:
+                    if response.status == 200:
+                        return await response.json(loads=json_codec.loads)
+                    elif response.status == 401:
+                        logger.warning("Получен код 401, попытка обновления токена")
+                        upstream_retries.inc(upstream='moysklad')
+                        await auth_service.refresh_token()
+                    else:
+                        logger.error(f"Неожиданный код ответа: {response.status}")
+                        raise HTTPException(status_code=response.status, detail="Ошибка при получении данных от API МойСклад")
+        raise HTTPException(status_code=401, detail="Не удалось авторизоваться в API МойСклад")
+
+    async def fetch_current_stock(self, changed_since=None):
+        """
+        Получает текущие остатки. Если указан changed_since, возвращаются только позиции,
+        остаток которых изменился после этого момента.
+
+        :return: Словарь ID товара -> остаток
+        """
+        params = {"include": "zeroLines"}
+        if changed_since:
+            params["changedSince"] = changed_since
+        rows = await self.request_json("report/stock/all/current", params)
+        logger.info(f"Получено {len(rows)} текущих остатков")
+        return {row['assortmentId']: row.get('stock', 0) for row in rows if row.get('assortmentId')}
+
+    async def fetch_changed_prices(self, updated_since):
+        """
+        Получает цены продажи товаров, обновленных после указанного момента.
+
+        :return: Словарь ID товара -> цена продажи в гривнах
+        """
+        prices = {}
+        offset = 0
+        limit = 1000
+        while True:
+            data = await self.request_json("entity/assortment", {
+                "filter": f"updated>={updated_since}",
+                "offset": offset,
+                "limit": limit
+            })
+            rows = data.get('rows', [])
+            for item in rows:
+                sale_prices = item.get('salePrices') or []
+                if sale_prices:
+                    prices[item['id']] = sale_prices[0].get('value', 0) / 100
+            if len(rows) < limit:
+                break
+            offset += limit
+        logger.info(f"Получено {len(prices)} цен обновленных товаров")
+        return prices
+
+    def load_state(self):
+        state = load_json_file(self.state_file) if os.path.exists(self.state_file) else {}
+        return state if isinstance(state, dict) else {}
+
+    def save_state(self, state):
+        json_codec.dump_file(state, self.state_file)
+
+    def diff_catalog(self, catalog, stock_by_id, prices_by_id):
+        """
+        Сравнивает полученные остатки и цены с каталогом.
+
+        :return: Словарь код товара -> {поле: новое значение} только для изменившихся полей
+        """
+        codes_by_id = catalog_store.get_codes_by_ids(set(stock_by_id) | set(prices_by_id))
+        catalog_by_code = {product.get('code'): product for product in catalog}
+
+        updates = {}
+        for field, values in (('stock', stock_by_id), ('salePrice', prices_by_id)):
+            for product_id, value in values.items():
+                code = codes_by_id.get(product_id)
+                product = catalog_by_code.get(code)
+                if product is None:
+                    continue
+                if product.get(field) != value:
+                    updates.setdefault(code, {})[field] = value
+        return updates
+
+    async def push_to_woo(self, patched, updates):
+        """
+        Отправляет во все магазины WooCommerce только изменившиеся поля: остаток и статус
+        наличия, цену, а также название и описание, если они изменились.
+
+        :return: Общее количество обновленных товаров
+        """
+        results = await woo_registry.push_updates(patched, updates)
+        return sum(results.values())
+
+    async def apply_updates(self, updates, state=None, result=None, catalog=None):
+        """
+        Применяет изменения полей товаров: обновляет каталог и отправляет изменения
+        в WooCommerce и Google Sheets.
+
+        :param updates: Словарь код товара -> {поле каталога: новое значение}
+        :param state: Состояние быстрого обновления (если не передано - загружается и сохраняется)
+        :param result: Словарь отчета, в который добавляется количество обновлений и ошибки
+        :param catalog: Уже загруженный каталог (для повторной отправки неотправленных товаров)
+        """
+        own_state = state is None
+        if own_state:
+            state = self.load_state()
+        if result is None:
+            result = {"woo_updated": 0, "sheets_updated": 0, "errors": []}
+
+        patched = []
+        changes = None
+        if updates:
+            patched, changes = await asyncio.to_thread(product_collector_service.patch_catalog, updates)
+
+        # Товары, которые не удалось отправить в прошлый раз, отправляются повторно
+        pending = {code: {'stock': None, 'salePrice': None} for code in state.get('pending_woo', [])}
+        if pending and catalog is None:
+            catalog = await asyncio.to_thread(product_collector_service.load_catalog)
+        woo_updates = {**pending, **updates}
+        woo_products = patched + [p for p in catalog or [] if p.get('code') in pending and p.get('code') not in updates]
+        if woo_products:
+            try:
+                result["woo_updated"] = await self.push_to_woo(woo_products, woo_updates)
+                state['pending_woo'] = []
+                for name in woo_registry.services:
+                    await asyncio.to_thread(self.mark_applied, f"woo:{name}", changes)
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении товаров в WooCommerce: {str(e)}", exc_info=True)
+                result["errors"].append(f"WooCommerce update failed: {str(e)}")
+                state['pending_woo'] = sorted(woo_updates)
+
+        if updates:
+            try:
+                result["sheets_updated"] = await asyncio.to_thread(
+                    google_sheets_service.update_cells_by_code, updates
+                )
+                await asyncio.to_thread(self.mark_applied, 'sheets', changes)
+            except Exception as e:
+                logger.error(f"Ошибка при обновлении товаров в Google Sheets: {str(e)}", exc_info=True)
+                result["errors"].append(f"Google Sheets update failed: {str(e)}")
+
+        if own_state:
+            self.save_state(state)
+        return result
+
+    def mark_applied(self, channel, changes):
+        """
+        Отмечает, что канал получил точечное изменение: если до него канал применил
+        предыдущий запуск, он остается готовым к инкрементальной выгрузке.
+        """
+        if changes is not None and change_tracker.in_sync(channel, changes.previous_run_id):
+            change_tracker.mark_applied(channel, changes.run_id)
+
+    async def push_updates(self, updates):
+        """
+        Применяет изменения полей товаров, не пересекаясь с выполняющимся быстрым обновлением.
+        """
+        async with self._lock:
+            return await self.apply_updates(updates)
+
+    async def run_tick(self):
+        """
+        Выполняет одно быстрое обновление остатков и цен.
+        """
+        async with self._lock:
+            logger.info("Начало быстрого обновления остатков и цен")
+            result = {"changed_products": 0, "woo_updated": 0, "sheets_updated": 0, "errors": []}
+            state = self.load_state()
+            started_at = datetime.now(moscow_tz).strftime("%Y-%m-%d %H:%M:%S")
+            last_tick = state.get('last_tick')
+
+            stock_by_id = await self.fetch_current_stock(last_tick)
+            prices_by_id = await self.fetch_changed_prices(last_tick) if last_tick else {}
+
+            catalog = await asyncio.to_thread(product_collector_service.load_catalog)
+            updates = await asyncio.to_thread(self.diff_catalog, catalog, stock_by_id, prices_by_id)
+            result["changed_products"] = len(updates)
+
+            await self.apply_updates(updates, state, result, catalog)
+
+            state['last_tick'] = started_at
+            self.save_state(state)
+            result["since"] = last_tick
+            result["tick_time"] = started_at
+            self.last_result = result
+            logger.info(f"Быстрое обновление завершено: изменено {len(updates)} товаров")
+            return result
+
+
+stock_tick_service = StockTickService()
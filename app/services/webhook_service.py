@@ -0,0 +1,264 @@
+import asyncio
+import time
+from app.config import settings
+from app.utils.utils import logger
+from app.services.catalog_store import catalog_store
+from app.services.product_collector_service import product_collector_service
+from app.services.product_merger import ProductMerger
+from app.services.stock_tick_service import stock_tick_service
+from app.services.scheduler_service import refresh_scheduler
+
+# Типы сущностей ассортимента, изменения которых применяются к каталогу
+ENTITY_TYPES = {'product', 'variant', 'service', 'bundle'}
+# Типы складских документов, изменение которых меняет остатки
+STOCK_DOCUMENT_TYPES = {
+    'demand', 'supply', 'enter', 'loss', 'move', 'retaildemand', 'retailsalesreturn',
+    'salesreturn', 'purchasereturn', 'inventory', 'processing'
+}
+
+
+class WebhookService:
+    """
+    Прием вебхуков МойСклад и инкрементальное обновление каталога.
+
+    События накапливаются и обрабатываются пачкой после паузы WEBHOOK_DEBOUNCE секунд
+    (или сразу при достижении WEBHOOK_MAX_BATCH сущностей). Измененные товары запрашиваются
+    из API по ID одним запросом на пачку, изменения складских документов и вебхуки остатков
+    приводят к одному быстрому обновлению остатков.
+
+    Если обработка пачки завершилась ошибкой, события возвращаются в очередь и пачка
+    обрабатывается повторно через WEBHOOK_RETRY_DELAY секунд, пауза удваивается после
+    каждой следующей ошибки до WEBHOOK_RETRY_MAX_DELAY.
+    """
+
+    def __init__(self):
+        self.pending_entities = set()
+        self.stock_changed = False
+        self.assortment_deleted = False
+        self._flush_task = None
+        # Ссылки на фоновые задачи обработки, чтобы они не были удалены сборщиком мусора
+        self._tasks = set()
+        self._flush_lock = asyncio.Lock()
+        self._retry_delay = None
+        # Отдельный экземпляр: отчет общего объединителя принадлежит полной сборке каталога
+        self.merger = ProductMerger()
+        self.stats = {
+            "events_received": 0,
+            "batches_processed": 0,
+            "entities_fetched": 0,
+            "products_patched": 0,
+            "stock_ticks": 0,
+            "last_batch_at": None,
+            "last_error": None,
+        }
+
+    def accept(self, payload):
+        """
+        Принимает тело вебхука и ставит события в очередь на обработку.
+
+        :return: Количество принятых событий
+        :raises ValueError: Тело вебхука не является объектом с полем events - списком объектов
+        """
+        if not isinstance(payload, dict):
+            raise ValueError("Тело вебхука должно быть JSON объектом")
+        events = payload.get('events') or []
+        if not isinstance(events, list) or not all(isinstance(event, dict) for event in events):
+            raise ValueError("Поле events должно быть списком объектов")
+
+        accepted = 0
+        # Вебхук на изменение остатков содержит ссылку на отчет вместо списка событий
+        if payload.get('reportUrl'):
+            self.stock_changed = True
+            accepted += 1
+
+        for event in events:
+            meta = event.get('meta') or {}
+            entity_type = meta.get('type')
+            entity_id = meta.get('href', '').rstrip('/').split('/')[-1]
+            if entity_type in ENTITY_TYPES and entity_id:
+                if event.get('action') == 'DELETE':
+                    self.assortment_deleted = True
+                else:
+                    self.pending_entities.add(entity_id)
+                accepted += 1
+            elif entity_type in STOCK_DOCUMENT_TYPES:
+                self.stock_changed = True
+                accepted += 1
+
+        self.stats["events_received"] += accepted
+        if accepted:
+            self.schedule_flush()
+        return accepted
+
+    def schedule_flush(self, delay=None):
+        if len(self.pending_entities) >= settings.WEBHOOK_MAX_BATCH and delay is None:
+            self.start_task(self.flush())
+        elif self._flush_task is None or self._flush_task.done() or self._flush_task is asyncio.current_task():
+            # Повтор планируется и из самой задачи отложенной обработки, которая еще не завершена
+            self._flush_task = self.start_task(self._delayed_flush(delay))
+
+    def start_task(self, coro):
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Ошибка фоновой обработки вебхуков: {str(task.exception())}", exc_info=task.exception())
+
+    async def _delayed_flush(self, delay=None):
+        await asyncio.sleep(settings.WEBHOOK_DEBOUNCE if delay is None else delay)
+        await self.flush()
+
+    def schedule_retry(self):
+        """
+        Планирует повторную обработку событий, возвращенных в очередь после ошибки.
+        """
+        if self._retry_delay is None:
+            self._retry_delay = settings.WEBHOOK_RETRY_DELAY
+        else:
+            self._retry_delay = min(self._retry_delay * 2, settings.WEBHOOK_RETRY_MAX_DELAY)
+        logger.info(f"Повторная обработка вебхуков через {self._retry_delay} секунд")
+        self.schedule_flush(self._retry_delay)
+
+    async def fetch_entities(self, entity_ids):
+        """
+        Получает сущности ассортимента по списку ID пачками по 100.
+        """
+        rows = []
+        entity_ids = sorted(entity_ids)
+        for i in range(0, len(entity_ids), 100):
+            chunk = entity_ids[i:i + 100]
+            data = await stock_tick_service.request_json("entity/assortment", {
+                "filter": ";".join(f"id={entity_id}" for entity_id in chunk),
+                "limit": 100
+            })
+            rows.extend(data.get('rows', []))
+        self.stats["entities_fetched"] += len(rows)
+        return rows
+
+    def entity_to_fields(self, item):
+        """
+        Преобразует сущность ассортимента в поля объединенного каталога.
+        """
+        fields = {
+            'article': item.get('article', ''),
+            'externalCode': item.get('externalCode', ''),
+            'pathname': item.get('pathName', ''),
+            'name': item.get('name', ''),
+            'description': item.get('description', ''),
+            'updated': item.get('updated', ''),
+        }
+        sale_prices = item.get('salePrices') or []
+        if sale_prices:
+            fields['salePrice'] = sale_prices[0].get('value', 0) / 100
+        if 'stock' in item:
+            fields['stock'] = item['stock']
+        return fields
+
+    def diff_entities(self, catalog, rows):
+        """
+        Сравнивает полученные сущности с каталогом.
+
+        Товар каталога может быть объединен из нескольких записей с одинаковым кодом, поэтому
+        полученные поля подставляются в сохраненные записи источников этого кода и записи
+        заново объединяются по правилам MERGE_RULES: изменение одной записи не затирает
+        суммарный остаток или цену, выбранную из других записей.
+
+        :return: Кортеж (словарь код товара -> {поле: новое значение}, коды товаров, которые
+            нельзя обновить точечно - записи с разными артикулами оставлены без объединения)
+        """
+        catalog_by_code = {}
+        for product in catalog:
+            catalog_by_code.setdefault(product.get('code'), []).append(product)
+        entities = {}
+        for item in rows:
+            code = item.get('code')
+            if code not in catalog_by_code:
+                logger.info(f"Товар с кодом {code} отсутствует в каталоге и будет добавлен при пересборке")
+                continue
+            entities.setdefault(code, {})[item.get('id')] = self.entity_to_fields(item)
+
+        records_by_code = {}
+        for record in catalog_store.iter_combined(entities):
+            records_by_code.setdefault(record['code'], []).append(record)
+
+        updates = {}
+        unresolved = []
+        for code, fields_by_id in entities.items():
+            records = records_by_code.get(code, [])
+            for record in records:
+                record.update(fields_by_id.pop(record['id'], {}))
+            # Сущности, которых еще нет в сохраненных данных источников
+            records.extend({'id': entity_id, 'code': code, **fields} for entity_id, fields in fields_by_id.items())
+            merged = list(self.merger.merge(records))
+            products = catalog_by_code[code]
+            if len(merged) > 1 or len(products) > 1:
+                unresolved.append(code)
+                continue
+            changed = {
+                k: v for k, v in merged[0].items()
+                if k not in ('id', 'code') and products[0].get(k) != v
+            }
+            if changed:
+                updates[code] = changed
+        return updates, unresolved
+
+    async def flush(self):
+        """
+        Обрабатывает накопленные события одной пачкой.
+        """
+        async with self._flush_lock:
+            entity_ids = self.pending_entities
+            stock_changed = self.stock_changed
+            assortment_deleted = self.assortment_deleted
+            self.pending_entities = set()
+            self.stock_changed = False
+            self.assortment_deleted = False
+            if not entity_ids and not stock_changed and not assortment_deleted:
+                return
+
+            logger.info(f"Обработка вебхуков: {len(entity_ids)} сущностей, изменение остатков: {stock_changed}")
+            try:
+                if entity_ids:
+                    rows = await self.fetch_entities(entity_ids)
+                    catalog = await asyncio.to_thread(product_collector_service.load_catalog)
+                    updates, unresolved = self.diff_entities(catalog, rows)
+                    if updates:
+                        await stock_tick_service.push_updates(updates)
+                        self.stats["products_patched"] += len(updates)
+                    if unresolved:
+                        # Товары, не объединенные из-за разных артикулов, пересобираются полностью
+                        logger.info(f"Товары с кодами {', '.join(unresolved)} будут обновлены пересборкой каталога")
+                        assortment_deleted = True
+                if stock_changed:
+                    await stock_tick_service.run_tick()
+                    self.stats["stock_ticks"] += 1
+                if assortment_deleted:
+                    # Удаление товара требует полной пересборки каталога из ассортимента
+                    await refresh_scheduler.refresh_and_rebuild('assortment')
+                self.stats["last_error"] = None
+                self._retry_delay = None
+            except Exception as e:
+                self.stats["last_error"] = str(getattr(e, 'detail', e))
+                logger.error(f"Ошибка при обработке вебхуков: {self.stats['last_error']}", exc_info=True)
+                # Необработанные сущности возвращаются в очередь
+                self.pending_entities |= entity_ids
+                self.stock_changed = self.stock_changed or stock_changed
+                self.assortment_deleted = self.assortment_deleted or assortment_deleted
+                self.schedule_retry()
+            finally:
+                self.stats["batches_processed"] += 1
+                self.stats["last_batch_at"] = time.time()
+
+    def status(self):
+        return {
+            "pending_entities": len(self.pending_entities),
+            "stock_changed": self.stock_changed,
+            **self.stats,
+        }
+
+
+webhook_service = WebhookService()
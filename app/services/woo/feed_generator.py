@@ -0,0 +1,111 @@
+import os
+import threading
+from app.config import settings
+from app.utils.utils import logger, load_json_file
+from app.utils.streaming_writers import JsonArrayWriter, XmlListWriter
+
+# Количество товаров, записываемых в файлы фида за один вызов write()
+WRITE_CHUNK_SIZE = 1000
+
+
+class FeedGenerator:
+    """
+    Сводный фид товаров магазина WooCommerce: один XML и один JSON файл на магазин
+    вместо отдельных файлов на каждый товар.
+
+    Фид полностью строится из снимка каталога после полной синхронизации или сверки
+    и точечно обновляется по кодам товаров после инкрементальных отправок. Файлы пишутся
+    во временные и заменяются переименованием, значения в XML экранируются.
+    """
+
+    def __init__(self):
+        self._locks = {}
+        self._locks_lock = threading.Lock()
+
+    def paths(self, store):
+        """
+        :return: Кортеж (путь к XML фиду, путь к JSON фиду)
+        """
+        return (
+            os.path.join(settings.XML_DIR, f"feed_{store}.xml"),
+            os.path.join(settings.JSON_DIR, f"feed_{store}.json"),
+        )
+
+    def lock(self, store):
+        with self._locks_lock:
+            return self._locks.setdefault(store, threading.Lock())
+
+    def feed_item(self, service, product):
+        stock = product.get('stock')
+        return {
+            'code': product.get('code', ''),
+            'name': product.get('name', ''),
+            'description': product.get('description', ''),
+            'price': service.price(product),
+            'stock': stock if stock not in (None, '') else 0,
+        }
+
+    def write(self, store, items):
+        """
+        Публикует фид магазина: items - элементы фида, отсортированные по коду.
+        """
+        xml_path, json_path = self.paths(store)
+        writers = [XmlListWriter(xml_path, 'products'), JsonArrayWriter(json_path)]
+        try:
+            for start in range(0, len(items), WRITE_CHUNK_SIZE):
+                chunk = items[start:start + WRITE_CHUNK_SIZE]
+                for writer in writers:
+                    writer.write(chunk)
+        except Exception:
+            for writer in writers:
+                writer.abort()
+            raise
+        for writer in writers:
+            writer.close()
+        logger.info(f"Фид магазина {store} опубликован: {len(items)} товаров")
+
+    def rebuild(self, service, view):
+        """
+        Полностью строит фид магазина из снимка каталога.
+
+        :return: Количество товаров в фиде
+        """
+        with self.lock(service.name):
+            items = {}
+            for position in range(len(view)):
+                product = view.record(position)
+                code = product.get('code')
+                if code and code not in items:
+                    items[code] = self.feed_item(service, product)
+            self.write(service.name, list(items.values()))
+            return len(items)
+
+    def update(self, service, view, codes, removed_codes=()):
+        """
+        Точечно обновляет фид магазина: товары с кодами codes перечитываются из снимка,
+        товары removed_codes удаляются. Если фида еще нет, он строится полностью.
+
+        :return: Количество товаров в фиде
+        """
+        codes = set(codes)
+        removed_codes = set(removed_codes)
+        if not codes and not removed_codes:
+            return None
+        _, json_path = self.paths(service.name)
+        if not os.path.exists(json_path):
+            return self.rebuild(service, view)
+        with self.lock(service.name):
+            items = {item['code']: item for item in load_json_file(json_path) or []}
+            for code in removed_codes:
+                items.pop(code, None)
+            for code in codes:
+                position = view.find_code(code)
+                if position is None:
+                    items.pop(code, None)
+                else:
+                    items[code] = self.feed_item(service, view.record(position))
+            self.write(service.name, [items[code] for code in sorted(items)])
+            return len(items)
+
+
+feed_generator = FeedGenerator()
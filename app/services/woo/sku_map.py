@@ -0,0 +1,79 @@
+import threading
+from app.services.catalog_store import catalog_store
+from app.utils.utils import logger
+
+
+class WooSkuMap:
+    """
+    Сохраняемое в хранилище каталога соответствие SKU -> ID товара одного магазина WooCommerce.
+
+    Загружается из хранилища при первом обращении, полностью строится обходом
+    products?per_page=100 (WooService.build_sku_map), поддерживается созданиями и
+    обновлениями товаров; запись удаляется, если магазин ответил, что товара с таким ID нет.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self._ids = None
+        self._skus = {}
+        self.built = False
+        self._lock = threading.Lock()
+
+    def load(self):
+        if self._ids is None:
+            with self._lock:
+                if self._ids is None:
+                    ids = catalog_store.load_sku_map(self.store)
+                    self._skus = {product_id: sku for sku, product_id in ids.items()}
+                    self._ids = ids
+                    self.built = bool(ids)
+        return self._ids
+
+    def __len__(self):
+        return len(self.load())
+
+    def get(self, sku):
+        return self.load().get(sku)
+
+    def sku_for(self, product_id):
+        self.load()
+        return self._skus.get(product_id)
+
+    def update(self, mapping, replace=False):
+        """
+        Добавляет или заменяет соответствия SKU -> ID товара.
+        """
+        mapping = {sku: product_id for sku, product_id in mapping.items() if sku and product_id}
+        if not mapping and not replace:
+            return
+        if not replace:
+            # Дополнение еще не загруженного соответствия: сохраненные записи загружаются
+            # до изменения, иначе в памяти остались бы только новые
+            self.load()
+        catalog_store.save_sku_map(self.store, mapping, replace)
+        with self._lock:
+            if replace:
+                self._ids = {}
+                self._skus = {}
+            for sku, product_id in mapping.items():
+                previous = self._ids.get(sku)
+                if previous is not None:
+                    self._skus.pop(previous, None)
+                self._ids[sku] = product_id
+                self._skus[product_id] = sku
+            if replace:
+                self.built = True
+
+    def invalidate(self, skus):
+        skus = [sku for sku in skus if sku]
+        if not skus:
+            return
+        catalog_store.delete_sku_map(self.store, skus)
+        with self._lock:
+            for sku in skus:
+                product_id = (self._ids or {}).pop(sku, None)
+                self._skus.pop(product_id, None)
+        logger.info(f"Магазин {self.store}: удалено {len(skus)} устаревших соответствий SKU")
+
+    def status(self):
+        return {"entries": len(self), "built": self.built}
@@ -0,0 +1,181 @@
+import asyncio
+from app.config.woo.stores import woo_stores
+from app.utils.utils import logger
+from app.services.catalog_store import catalog_store
+from app.services.catalog_snapshot import catalog_snapshot
+from app.services.change_tracker import change_tracker
+from app.services.woo.woo_service import WooService
+
+# Количество товаров снимка, отправляемых во все магазины за один шаг синхронизации
+SYNC_CHUNK_SIZE = 1000
+
+
+class WooRegistry:
+    """
+    Реестр магазинов WooCommerce. Каталог читается один раз из общего снимка и отправляется
+    во все магазины параллельно; внутри магазина количество одновременных запросов
+    ограничивает его WooService.
+    """
+
+    def __init__(self, stores):
+        self.services = {store.name: WooService(store) for store in stores}
+
+    def get(self, name):
+        return self.services.get(name)
+
+    def select(self, names=None):
+        if not names:
+            return list(self.services.values())
+        unknown = [name for name in names if name not in self.services]
+        if unknown:
+            raise ValueError(f"Неизвестные магазины WooCommerce: {', '.join(unknown)}")
+        return [self.services[name] for name in names]
+
+    async def fan_out(self, services, func):
+        """
+        Выполняет func(service) для всех магазинов параллельно.
+
+        :return: Словарь имя магазина -> результат или исключение
+        """
+        results = await asyncio.gather(*(func(service) for service in services), return_exceptions=True)
+        return {service.name: result for service, result in zip(services, results)}
+
+    async def push_updates(self, products, updates):
+        """
+        Отправляет изменившиеся поля товаров во все магазины.
+
+        :return: Количество обновленных товаров по магазинам
+        """
+        results = await self.fan_out(self.select(), lambda service: service.push_updates(products, updates))
+        failed = {name: result for name, result in results.items() if isinstance(result, Exception)}
+        if failed:
+            raise Exception("; ".join(f"{name}: {str(error)}" for name, error in failed.items()))
+        return results
+
+    async def rebuild_sku_maps(self, names=None):
+        """
+        Заново строит соответствия SKU -> ID товара магазинов параллельно.
+
+        :return: Количество товаров или ошибка по магазинам
+        """
+        results = await self.fan_out(self.select(names), lambda service: service.build_sku_map())
+        return {name: {"error": str(result)} if isinstance(result, Exception) else {"entries": result}
+                for name, result in results.items()}
+
+    async def reconcile(self, names=None, dry_run=False, create_missing=True):
+        """
+        Полная сверка каталога из снимка со всеми (или перечисленными) магазинами параллельно.
+        Магазин без ошибок после сверки считается применившим последний запуск сборки каталога.
+        """
+        view = catalog_snapshot.current()
+        if view is None:
+            raise ValueError("Снимок каталога еще не опубликован")
+        runs = await asyncio.to_thread(catalog_store.list_change_runs, 1)
+        results = await self.fan_out(
+            self.select(names), lambda service: service.reconcile(view, dry_run, create_missing)
+        )
+        report = {}
+        for name, result in results.items():
+            if isinstance(result, Exception):
+                logger.error(f"Ошибка сверки магазина {name}: {str(result)}")
+                report[name] = {"error": str(result)}
+                continue
+            report[name] = result
+            if runs and not dry_run and not result["failed"] and (create_missing or not result["missing_in_woo"]):
+                change_tracker.mark_applied(f"woo:{name}", runs[0]['run_id'])
+        return report
+
+    def changed_codes(self, run_id):
+        """
+        Коды товаров набора изменений запуска.
+
+        :return: Кортеж (коды новых и измененных товаров, коды удаленных товаров)
+        """
+        codes, removed = [], []
+        offset = 0
+        while True:
+            items = catalog_store.load_changes(run_id, None, offset, 10000)
+            for item in items:
+                if item['code']:
+                    (removed if item['change'] == 'removed' else codes).append(item['code'])
+            if len(items) < 10000:
+                return codes, removed
+            offset += len(items)
+
+    async def sync_catalog(self, names=None, full=False):
+        """
+        Синхронизирует каталог из снимка с магазинами. Магазин, применивший предыдущий
+        запуск сборки каталога, получает только новые и измененные товары последнего
+        запуска, остальные (или все при full) - весь каталог.
+
+        :return: Отчет по магазинам
+        """
+        services = self.select(names)
+        view = catalog_snapshot.current()
+        if view is None:
+            raise ValueError("Снимок каталога еще не опубликован")
+        runs = await asyncio.to_thread(catalog_store.list_change_runs, 1)
+        run = runs[0] if runs else None
+
+        positions = {}
+        codes = removed = None
+        for service in services:
+            channel = f"woo:{service.name}"
+            if not full and run and change_tracker.in_sync(channel, run['run_id']):
+                # Последний запуск уже применен
+                positions[service.name] = set()
+            elif not full and run and change_tracker.in_sync(channel, run['previous_run_id']):
+                if codes is None:
+                    codes, removed = await asyncio.to_thread(self.changed_codes, run['run_id'])
+                positions[service.name] = await asyncio.to_thread(
+                    lambda: {p for p in map(view.find_code, codes) if p is not None}
+                )
+            else:
+                positions[service.name] = range(len(view))
+
+        report = {
+            service.name: {
+                "mode": "full" if isinstance(positions[service.name], range) else "incremental",
+                "products": len(positions[service.name]),
+                "updated": 0, "created": 0, "failed": 0, "errors": [],
+            }
+            for service in services
+        }
+        # Товары читаются из снимка частями и отправляются во все магазины одновременно
+        if any(isinstance(p, range) for p in positions.values()):
+            all_positions = range(len(view))
+        else:
+            all_positions = sorted(set().union(*positions.values()))
+        for start in range(0, len(all_positions), SYNC_CHUNK_SIZE):
+            chunk = all_positions[start:start + SYNC_CHUNK_SIZE]
+            # Записи снимка разбираются в потоке, чтобы не занимать цикл событий
+            products = await asyncio.to_thread(lambda: {position: view.record(position) for position in chunk})
+            results = await self.fan_out(services, lambda service: service.sync_products([
+                products[p] for p in chunk if p in positions[service.name]
+            ]))
+            for name, result in results.items():
+                if isinstance(result, Exception):
+                    logger.error(f"Ошибка синхронизации магазина {name}: {str(result)}")
+                    report[name]["errors"].append(str(result))
+                    continue
+                for key in ("updated", "created", "failed"):
+                    report[name][key] += result[key]
+
+        for service in services:
+            store_report = report[service.name]
+            if store_report["mode"] == "full":
+                await service.update_feed(full=True)
+            else:
+                await service.update_feed(
+                    [view.key(position)[0] for position in positions[service.name]], removed or ()
+                )
+            if run and not store_report["errors"] and not store_report["failed"]:
+                change_tracker.mark_applied(f"woo:{service.name}", run['run_id'])
+            logger.info(
+                f"Магазин {service.name}: синхронизировано {store_report['updated']} товаров, "
+                f"создано {store_report['created']}, ошибок {store_report['failed']} ({store_report['mode']})"
+            )
+        return report
+
+
+woo_registry = WooRegistry(woo_stores)
@@ -1,75 +1,353 @@
-import json
+import asyncio
 import requests
 from woocommerce import API
 from app.utils.utils import logger
+from app.utils.metrics import upstream_timer, upstream_bytes
+from app.config.woo.stores import DEFAULT_FIELD_MAPPING
+from app.services.catalog_store import catalog_store
+from app.services.catalog_snapshot import catalog_snapshot
+from app.services.woo.sku_map import WooSkuMap
+from app.services.woo.feed_generator import feed_generator
+from app.utils import json_codec
+
+# Максимум товаров в одном запросе products/batch и поиске по SKU
+BATCH_SIZE = 100
+# Поля товара WooCommerce, сравниваемые при полной сверке (кроме полей field_mapping магазина)
+RECONCILED_FIELDS = ('name', 'short_description', 'regular_price', 'manage_stock', 'stock_quantity', 'stock_status')
+# Количество примеров товаров в каждом разделе отчета сверки
+REPORT_SAMPLE_SIZE = 50
 
 class WooService:
-    def __init__(self, config):
+    """
+    Клиент одного магазина WooCommerce из реестра магазинов (app/config/woo/stores.py).
+
+    Запросы выполняются в потоках, количество одновременных запросов к магазину
+    ограничено concurrency из конфигурации магазина. Поля товара заполняются по
+    field_mapping магазина, цена - по его price_rule.
+    """
+
+    def __init__(self, store):
         self.wcapi = API(
-            url=config.WOO_URL,
-            consumer_key=config.WOO_CONSUMER_KEY,
-            consumer_secret=config.WOO_CONSUMER_SECRET,
-            version=config.WOO_VERSION
+            url=store.url,
+            consumer_key=store.consumer_key,
+            consumer_secret=store.consumer_secret,
+            version=store.version
         )
-        self.config = config
+        self.config = store
+        self.name = store.name
+        self.field_mapping = {**DEFAULT_FIELD_MAPPING, **store.field_mapping}
+        self.price_rule = store.price_rule
+        self.sku_map = WooSkuMap(store.name)
+        self.reconciled_fields = tuple(dict.fromkeys(
+            RECONCILED_FIELDS + tuple(field for field in self.field_mapping if field != 'sku')
+        ))
+        # Семафор создается в цикле событий, в котором выполняются запросы
+        self._semaphore = None
+        self._semaphore_loop = None
+
+    def request(self, method, endpoint, data=None, **kwargs):
+        """
+        Выполняет запрос к REST API WooCommerce с записью метрик.
+        """
+        with upstream_timer('woocommerce') as timer:
+            if data is None:
+                response = getattr(self.wcapi, method)(endpoint, **kwargs)
+            else:
+                response = getattr(self.wcapi, method)(endpoint, data, **kwargs)
+            timer.status = response.status_code
+            upstream_bytes.inc(len(response.content), upstream='woocommerce')
+        return response
 
-    def get_product_from_json(self, code):
+    async def call(self, method, endpoint, data=None, **kwargs):
+        """
+        Выполняет запрос в отдельном потоке с ограничением одновременных запросов к магазину.
+        """
+        async with self.semaphore():
+            return await asyncio.to_thread(self.request, method, endpoint, data, **kwargs)
+
+    def semaphore(self):
+        loop = asyncio.get_running_loop()
+        if self._semaphore_loop is not loop:
+            self._semaphore = asyncio.Semaphore(max(self.config.concurrency, 1))
+            self._semaphore_loop = loop
+        return self._semaphore
+
+    def get_product_from_catalog(self, code):
         try:
-            with open(self.config.JSON_FILE_PATH, 'r', encoding='utf-8') as f:
-                products = json.load(f)
-            return next((p for p in products if p['code'] == code), None)
+            # Снимок каталога общий для всех воркеров, хранилище - если снимок еще не опубликован
+            if catalog_snapshot.current() is not None:
+                return catalog_snapshot.get_by_code(code)
+            return catalog_store.get_product_by_code(code)
         except Exception as e:
-            logger.error(f"Error reading JSON file: {str(e)}")
+            logger.error(f"Error reading product from catalog store: {str(e)}")
             return None
 
+    def price(self, product):
+        return self.price_rule.apply(product.get('salePrice'))
+
+    def sku(self, product):
+        """
+        SKU товара каталога в магазине - поле каталога, указанное для sku в field_mapping
+        (по умолчанию код товара). По нему ищутся товары магазина и строится соответствие SKU.
+        """
+        return product.get(self.field_mapping['sku'], '')
+
     def prepare_woo_product_data(self, product):
-        return {
-            'name': product['name'],
+        data = {woo_field: product.get(field, '') for woo_field, field in self.field_mapping.items()}
+        stock = int(product['stock']) if product.get('stock') else 0
+        data.update({
             'type': 'simple',
-            'regular_price': str(product['salePrice']),
-            'short_description': product['description'],  # Изменено с 'description' на 'short_description'
-            'sku': product['code'],
+            'regular_price': str(self.price(product)),
             'manage_stock': True,
-            'stock_quantity': int(product['stock']) if product['stock'] else 0,
-            'stock_status': 'instock' if int(product['stock']) >= 1 else 'onbackorder',
-        }
+            'stock_quantity': stock,
+            'stock_status': 'instock' if stock >= 1 else 'onbackorder',
+        })
+        return data
 
     async def update_or_create_product_by_code(self, code):
-        product = self.get_product_from_json(code)
+        product = self.get_product_from_catalog(code)
         if not product:
-            logger.error(f"Product with code {code} not found in JSON file")
+            logger.error(f"Product with code {code} not found in catalog")
             return None
 
         woo_product_data = self.prepare_woo_product_data(product)
 
-        existing_product = await self.get_product_by_sku(product['code'])
-
-        if existing_product:
-            updated_product = await self.update_product(existing_product['id'], woo_product_data)
+        # ID товара берется из соответствия SKU; если магазин ответил 404, соответствие
+        # удалено и товар ищется по SKU повторно
+        sku = self.sku(product)
+        for _ in range(2):
+            product_id = await self.find_product_id(sku)
+            if product_id is None:
+                break
+            updated_product = await self.update_product(product_id, woo_product_data)
             if updated_product:
                 logger.info(f"Product with code {code} updated successfully")
-                self.generate_xml(product)
-                self.generate_json(product)
                 return updated_product
-            else:
+            if self.sku_map.get(sku) is not None:
                 logger.error(f"Failed to update product with code {code}")
                 return None
+
+        new_product = await self.create_product(woo_product_data)
+        if new_product:
+            logger.info(f"Product with code {code} created successfully")
+            return new_product
         else:
-            new_product = await self.create_product(woo_product_data)
-            if new_product:
-                logger.info(f"Product with code {code} created successfully")
-                self.generate_xml(product)
-                self.generate_json(product)
-                return new_product
+            logger.error(f"Failed to create product with code {code}")
+            return None
+
+    async def update_or_create_products(self, codes):
+        """
+        Обновляет или создает товары по кодам и обновляет фид магазина одной записью.
+
+        :return: Список результатов по кодам
+        """
+        results = []
+        done = []
+        for code in codes:
+            try:
+                result = await self.update_or_create_product_by_code(code)
+                if result:
+                    logger.info(f"Successfully updated/created product with code: {code}")
+                    results.append({"code": code, "status": "success", "message": "Product updated or created successfully"})
+                    done.append(code)
+                else:
+                    logger.warning(f"Product not found or operation failed for code: {code}")
+                    results.append({"code": code, "status": "failed", "message": "Product not found or operation failed"})
+            except Exception as e:
+                logger.error(f"Error updating or creating product for code {code}: {str(e)}")
+                results.append({"code": code, "status": "error", "message": str(e)})
+        await self.update_feed(done)
+        return results
+
+    async def update_feed(self, codes=None, removed_codes=(), full=False):
+        """
+        Обновляет сводный фид магазина по кодам товаров или полностью (full). Ошибка фида
+        не прерывает синхронизацию.
+        """
+        view = catalog_snapshot.current()
+        if view is None:
+            return
+        try:
+            if full:
+                await asyncio.to_thread(feed_generator.rebuild, self, view)
             else:
-                logger.error(f"Failed to create product with code {code}")
-                return None
+                await asyncio.to_thread(feed_generator.update, self, view, codes or (), removed_codes)
+        except Exception as e:
+            logger.error(f"Ошибка при обновлении фида магазина {self.name}: {str(e)}", exc_info=True)
+
+    async def find_product_id(self, sku):
+        """
+        ID товара магазина по SKU: из соответствия SKU, иначе запросом по SKU с сохранением в соответствие.
+        """
+        await asyncio.to_thread(self.sku_map.load)
+        product_id = self.sku_map.get(sku)
+        if product_id is None:
+            existing_product = await self.get_product_by_sku(sku)
+            if existing_product:
+                product_id = existing_product['id']
+                await asyncio.to_thread(self.sku_map.update, {sku: product_id})
+        return product_id
+
+    async def fetch_all_products(self, fields):
+        """
+        Получает все товары магазина по BATCH_SIZE на страницу только с указанными полями.
+        Если магазин сообщает количество страниц (X-WP-TotalPages), страницы после первой
+        запрашиваются параллельно.
+        """
+        params = {"per_page": BATCH_SIZE, "_fields": ",".join(fields)}
+
+        async def fetch(page):
+            response = await self.call("get", "products", params={**params, "page": page})
+            if response.status_code != 200:
+                raise Exception(f"Не удалось получить товары магазина {self.name}, код ответа {response.status_code}")
+            return response
+
+        first = await fetch(1)
+        pages = [json_codec.loads(first.content)]
+        total_pages = first.headers.get('X-WP-TotalPages')
+        if total_pages and total_pages.isdigit():
+            responses = await asyncio.gather(*(fetch(page) for page in range(2, int(total_pages) + 1)))
+            pages.extend(json_codec.loads(response.content) for response in responses)
+        else:
+            page = 1
+            while len(pages[-1]) == BATCH_SIZE:
+                page += 1
+                pages.append(json_codec.loads((await fetch(page)).content))
+        return [product for items in pages for product in items]
+
+    async def build_sku_map(self, products=None):
+        """
+        Строит соответствие SKU -> ID обходом всех товаров магазина.
+
+        :param products: Уже полученные товары магазина (с полями id и sku)
+        :return: Количество товаров с SKU
+        """
+        if products is None:
+            products = await self.fetch_all_products(["id", "sku"])
+        await asyncio.to_thread(
+            lambda: self.sku_map.update({product.get('sku'): product.get('id') for product in products}, True)
+        )
+        logger.info(f"Магазин {self.name}: соответствие SKU построено, {len(self.sku_map)} товаров")
+        return len(self.sku_map)
+
+    async def reconcile(self, view, dry_run=False, create_missing=True):
+        """
+        Полная сверка каталога из снимка с магазином: текущее состояние товаров магазина
+        загружается постранично, для каждого товара каталога сравнивается с
+        prepare_woo_product_data по полям, и отправляются только различающиеся поля.
+
+        :param view: Версия снимка каталога
+        :param dry_run: Только отчет, без записи в магазин
+        :param create_missing: Создавать товары каталога, которых нет в магазине
+        :return: Отчет сверки
+        """
+        woo_products = await self.fetch_all_products(('id', 'sku') + self.reconciled_fields)
+        report = {
+            "store": self.name,
+            "woo_products": len(woo_products),
+            "catalog_products": 0,
+            "in_sync": 0,
+            "different": 0,
+            "field_differences": {},
+            "missing_in_woo": 0,
+            "orphaned_in_woo": 0,
+            "duplicate_skus": 0,
+            "updated": 0,
+            "created": 0,
+            "dry_run": dry_run,
+            "samples": {"different": [], "missing_in_woo": [], "orphaned_in_woo": [], "duplicate_skus": []},
+        }
+
+        # Разбор товаров магазина и сравнение со всем каталогом выполняются в потоке,
+        # чтобы не занимать цикл событий; в цикле остаются только запросы к магазину
+        by_sku = await asyncio.to_thread(self.index_by_sku, woo_products, report)
+        del woo_products
+        await self.build_sku_map(list(by_sku.values()))
+        updates, creates = await asyncio.to_thread(self.diff_catalog, view, by_sku, report)
+
+        if not dry_run:
+            report["updated"], report["created"] = await asyncio.gather(
+                self.batch_products('update', updates),
+                self.batch_products('create', creates if create_missing else []),
+            )
+        if not dry_run:
+            await self.update_feed(full=True)
+        report["failed"] = 0 if dry_run else len(updates) - report["updated"] + (
+            len(creates) - report["created"] if create_missing else 0
+        )
+        logger.info(
+            f"Сверка магазина {self.name}: совпадает {report['in_sync']}, различается {report['different']}, "
+            f"нет в магазине {report['missing_in_woo']}, нет в каталоге {report['orphaned_in_woo']}, "
+            f"обновлено {report['updated']}, создано {report['created']}"
+        )
+        return report
+
+    def index_by_sku(self, woo_products, report):
+        """
+        Товары магазина по SKU; повторяющиеся SKU учитываются в отчете сверки.
+        """
+        by_sku = {}
+        for product in woo_products:
+            sku = product.get('sku')
+            if not sku:
+                continue
+            if sku in by_sku:
+                report["duplicate_skus"] += 1
+                add_sample(report, "duplicate_skus", sku)
+                continue
+            by_sku[sku] = product
+        return by_sku
+
+    def diff_catalog(self, view, by_sku, report):
+        """
+        Сравнивает товары снимка каталога с товарами магазина by_sku по полям сверки и
+        заполняет отчет. Товары из by_sku, найденные в каталоге, удаляются из него.
+
+        :return: Обновления (ID и различающиеся поля) и создаваемые товары
+        """
+        updates, creates = [], []
+        seen = set()
+        for position in range(len(view)):
+            product = view.record(position)
+            code = product.get('code')
+            sku = self.sku(product)
+            if not code or not sku or sku in seen:
+                continue
+            seen.add(sku)
+            report["catalog_products"] += 1
+            desired = self.prepare_woo_product_data(product)
+            woo_product = by_sku.pop(sku, None)
+            if woo_product is None:
+                report["missing_in_woo"] += 1
+                add_sample(report, "missing_in_woo", code)
+                creates.append(desired)
+                continue
+            changes = {
+                field: desired[field] for field in self.reconciled_fields
+                if field in desired and not same_value(field, desired[field], woo_product.get(field))
+            }
+            if not changes:
+                report["in_sync"] += 1
+                continue
+            report["different"] += 1
+            add_sample(report, "different", code)
+            for field in changes:
+                report["field_differences"][field] = report["field_differences"].get(field, 0) + 1
+            if 'stock_quantity' in changes:
+                changes['stock_status'] = desired['stock_status']
+            updates.append({'id': woo_product['id'], **changes})
+
+        report["orphaned_in_woo"] = len(by_sku)
+        for sku in by_sku:
+            if not add_sample(report, "orphaned_in_woo", sku):
+                break
+        return updates, creates
 
     async def get_product_by_sku(self, sku):
         try:
-            response = self.wcapi.get(f"products?sku={sku}")
+            response = await self.call("get", f"products?sku={sku}")
             if response.status_code == 200:
-                products = response.json()
+                products = json_codec.loads(response.content)
                 if products:
                     return products[0]
             return None
@@ -77,11 +355,178 @@ class WooService:
             logger.error(f"Error getting product by SKU: {str(e)}")
             return None
 
+    def prepare_partial_update(self, product, fields):
+        """
+        Готовит данные для частичного обновления товара только по изменившимся полям каталога.
+
+        :param product: Товар из каталога
+        :param fields: Изменившиеся поля каталога (stock, salePrice и поля field_mapping магазина)
+        """
+        data = {}
+        if 'stock' in fields:
+            stock = int(product['stock']) if product.get('stock') else 0
+            data['stock_quantity'] = stock
+            data['stock_status'] = 'instock' if stock >= 1 else 'onbackorder'
+        if 'salePrice' in fields:
+            data['regular_price'] = str(self.price(product))
+        for woo_field, field in self.field_mapping.items():
+            if field in fields and woo_field != 'sku':
+                data[woo_field] = product.get(field, '')
+        return data
+
+    async def get_products_by_skus(self, skus):
+        """
+        Получает товары WooCommerce по списку SKU. Для SKU из соответствия запрос не выполняется
+        (возвращается только ID), остальные запрашиваются пачками по BATCH_SIZE штук.
+
+        :return: Словарь SKU -> товар WooCommerce
+        """
+        await asyncio.to_thread(self.sku_map.load)
+        found = {}
+        unknown = []
+        for sku in skus:
+            product_id = self.sku_map.get(sku)
+            if product_id is not None:
+                found[sku] = {'id': product_id, 'sku': sku}
+            else:
+                unknown.append(sku)
+
+        async def fetch(chunk):
+            try:
+                response = await self.call("get", "products", params={"sku": ",".join(chunk), "per_page": BATCH_SIZE})
+                if response.status_code == 200:
+                    return json_codec.loads(response.content)
+                logger.error(f"Failed to get products by SKU. Status code: {response.status_code}")
+            except Exception as e:
+                logger.error(f"Error getting products by SKU: {str(e)}")
+            return []
+
+        pages = await asyncio.gather(*(fetch(unknown[i:i + BATCH_SIZE]) for i in range(0, len(unknown), BATCH_SIZE)))
+        fetched = {product.get('sku'): product for page in pages for product in page}
+        if fetched:
+            await asyncio.to_thread(self.sku_map.update, {sku: product.get('id') for sku, product in fetched.items()})
+        found.update(fetched)
+        return found
+
+    async def batch_products(self, action, items):
+        """
+        Создает или обновляет товары через пакетный эндпоинт products/batch (до BATCH_SIZE товаров за запрос).
+
+        :param action: create или update
+        :return: Количество успешно обработанных товаров
+        """
+        async def send(chunk):
+            try:
+                response = await self.call("post", "products/batch", {action: chunk})
+                if response.status_code == 200:
+                    items = json_codec.loads(response.content).get(action, [])
+                    await asyncio.to_thread(self.update_sku_map_from_batch, action, chunk, items)
+                    return len([p for p in items if 'error' not in p])
+                logger.error(f"Failed to batch {action} products. Status code: {response.status_code}")
+            except Exception as e:
+                logger.error(f"Error in batch {action}: {str(e)}")
+            return 0
+
+        results = await asyncio.gather(*(send(items[i:i + BATCH_SIZE]) for i in range(0, len(items), BATCH_SIZE)))
+        return sum(results)
+
+    def update_sku_map_from_batch(self, action, chunk, items):
+        """
+        Добавляет ID созданных товаров в соответствие SKU и удаляет соответствия товаров,
+        которых нет в магазине.
+        """
+        if action == 'create':
+            created = {}
+            for data, item in zip(chunk, items):
+                if 'error' not in item and item.get('id'):
+                    created[item.get('sku') or data.get('sku')] = item['id']
+            self.sku_map.update(created)
+            return
+        missing = [
+            self.sku_map.sku_for(item.get('id')) for item in items
+            if 'error' in item and is_missing_product(item['error'])
+        ]
+        self.sku_map.invalidate(missing)
+
+    async def batch_update_products(self, updates):
+        """
+        Обновляет товары через пакетный эндпоинт products/batch.
+
+        :param updates: Список словарей с полем 'id' и обновляемыми полями
+        :return: Количество успешно обновленных товаров
+        """
+        return await self.batch_products('update', updates)
+
+    async def push_updates(self, products, updates):
+        """
+        Отправляет в магазин только изменившиеся поля товаров.
+
+        :param products: Товары каталога
+        :param updates: Словарь код товара -> изменившиеся поля
+        :return: Количество обновленных товаров
+        """
+        woo_products = await self.get_products_by_skus(self.sku(p) for p in products if self.sku(p))
+        batch = []
+        for product in products:
+            woo_product = woo_products.get(self.sku(product))
+            if not woo_product:
+                continue
+            data = self.prepare_partial_update(product, updates[product['code']])
+            if not data:
+                continue
+            data['id'] = woo_product['id']
+            batch.append(data)
+        updated = await self.batch_update_products(batch)
+        if updated < len(batch):
+            raise Exception(f"Обновлено {updated} из {len(batch)} товаров")
+        await self.update_feed([product['code'] for product in products])
+        return updated
+
+    async def sync_products(self, products):
+        """
+        Полностью обновляет товары в магазине: существующие - пакетным обновлением,
+        отсутствующие - пакетным созданием.
+
+        :return: Словарь с количеством обновленных, созданных и неотправленных товаров
+        """
+        await asyncio.to_thread(self.sku_map.load)
+        if not self.sku_map.built:
+            await self.build_sku_map()
+        woo_products = await self.get_products_by_skus(self.sku(p) for p in products if p.get('code') and self.sku(p))
+        updates, creates = await asyncio.to_thread(self.split_products, products, woo_products)
+        updated, created = await asyncio.gather(
+            self.batch_products('update', updates), self.batch_products('create', creates)
+        )
+        return {
+            "updated": updated,
+            "created": created,
+            "failed": len(updates) + len(creates) - updated - created,
+        }
+
+    def split_products(self, products, woo_products):
+        """
+        Данные товаров каталога для магазина: обновления существующих (с ID) и создаваемые товары.
+        """
+        updates, creates = [], []
+        for product in products:
+            if not product.get('code') or not self.sku(product):
+                continue
+            data = self.prepare_woo_product_data(product)
+            woo_product = woo_products.get(self.sku(product))
+            if woo_product:
+                data['id'] = woo_product['id']
+                updates.append(data)
+            else:
+                creates.append(data)
+        return updates, creates
+
     async def update_product(self, product_id, data):
         try:
-            response = self.wcapi.put(f"products/{product_id}", data)
+            response = await self.call("put", f"products/{product_id}", data)
             if response.status_code == 200:
-                return response.json()
+                return json_codec.loads(response.content)
+            if response.status_code == 404:
+                await asyncio.to_thread(self.sku_map.invalidate, [self.sku_map.sku_for(product_id)])
             return None
         except Exception as e:
             logger.error(f"Error updating product: {str(e)}")
@@ -89,46 +534,45 @@ class WooService:
 
     async def create_product(self, data):
         try:
-            response = self.wcapi.post("products", data)
+            response = await self.call("post", "products", data)
             logger.info(f"Create product response status: {response.status_code}")
-            logger.info(f"Create product response content: {response.json()}")
+            logger.info(f"Create product response content: {json_codec.loads(response.content)}")
             if response.status_code == 201:
-                return response.json()
+                created = json_codec.loads(response.content)
+                await asyncio.to_thread(self.sku_map.update, {created.get('sku') or data.get('sku'): created.get('id')})
+                return created
             else:
                 logger.error(f"Failed to create product. Status code: {response.status_code}")
-                logger.error(f"Error message: {response.json()}")
+                logger.error(f"Error message: {json_codec.loads(response.content)}")
             return None
         except Exception as e:
             logger.error(f"Exception in create_product: {str(e)}")
             return None
 
-    def generate_xml(self, product):
-        xml_content = f"""<?xml version="1.0" encoding="UTF-8"?>
-<product>
-    <code>{product['code']}</code>
-    <name>{product['name']}</name>
-    <description>{product['description']}</description>
-    <price>{product['salePrice']}</price>
-    <stock>{product['stock']}</stock>
-</product>
-"""
-        file_name = f"{product['code']}.xml"
-        local_path = f"./data/xml/{file_name}"  # Сохраняем локально
 
-        try:
-            with open(local_path, 'w', encoding='utf-8') as f:
-                f.write(xml_content)
-            logger.info(f"XML file created locally for product {product['code']}")
-        except Exception as e:
-            logger.error(f"Failed to create local XML file for product {product['code']}: {str(e)}")
+def is_missing_product(error):
+    """Ошибка пакетного запроса означает, что товара с таким ID нет в магазине."""
+    return error.get('code') == 'woocommerce_rest_product_invalid_id' or (error.get('data') or {}).get('status') == 404
 
-    def generate_json(self, product):
-        file_name = f"{product['code']}.json"
-        local_path = f"./data/json/{file_name}"  # Сохраняем локально
 
+def same_value(field, desired, actual):
+    """
+    Сравнивает значение поля каталога с состоянием магазина: цены и остатки как числа,
+    строки без учета пробелов по краям.
+    """
+    if field in ('regular_price', 'stock_quantity'):
         try:
-            with open(local_path, 'w', encoding='utf-8') as f:
-                json.dump(product, f, ensure_ascii=False, indent=4)
-            logger.info(f"JSON file created locally for product {product['code']}")
-        except Exception as e:
-            logger.error(f"Failed to create local JSON file for product {product['code']}: {str(e)}")
+            return float(desired or 0) == float(actual or 0)
+        except (TypeError, ValueError):
+            return str(desired) == str(actual)
+    if isinstance(desired, bool):
+        return desired == bool(actual)
+    return str(desired if desired is not None else '').strip() == str(actual if actual is not None else '').strip()
+
+
+def add_sample(report, section, code):
+    samples = report["samples"][section]
+    if len(samples) >= REPORT_SAMPLE_SIZE:
+        return False
+    samples.append(code)
+    return True
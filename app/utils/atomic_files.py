@@ -0,0 +1,19 @@
+import os
+import tempfile
+
+# Права опубликованных файлов данных (mkstemp создает файл с правами 0600)
+FILE_MODE = 0o644
+
+
+def create_temp_file(path):
+    """
+    Создает временный файл с уникальным именем рядом с path для записи с последующей
+    заменой os.replace: одновременные записи одного файла (несколько воркеров, запусков
+    или потоков) не используют общий временный файл.
+
+    :return: Кортеж (дескриптор файла, путь к временному файлу)
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=f".{name}.", suffix='.tmp', dir=directory)
+    os.fchmod(fd, FILE_MODE)
+    return fd, tmp_path
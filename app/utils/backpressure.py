@@ -0,0 +1,138 @@
+import asyncio
+import gc
+import time
+import psutil
+from app.config import settings
+from app.utils.utils import logger
+from app.utils.metrics import (
+    sample_rss, backpressure_budget, backpressure_page_size, backpressure_concurrency,
+    backpressure_decisions, backpressure_wait
+)
+
+# Файлы лимита памяти контейнера (cgroup v2 и v1)
+CGROUP_LIMIT_FILES = ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes')
+# Доля лимита контейнера, используемая как бюджет, если MEMORY_BUDGET_MB не задан
+DEFAULT_BUDGET_RATIO = 0.8
+
+
+def container_memory_limit():
+    """
+    Лимит памяти контейнера в байтах или объем памяти машины, если лимит не задан.
+    """
+    total = psutil.virtual_memory().total
+    for path in CGROUP_LIMIT_FILES:
+        try:
+            with open(path, 'r') as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < total:
+            return int(value)
+    return total
+
+
+class MemoryBackpressure:
+    """
+    Регулирование загрузки данных по резидентной памяти процесса.
+
+    Память сравнивается с бюджетом (MEMORY_BUDGET_MB или доля лимита контейнера):
+    - ниже MEMORY_SOFT_RATIO бюджета размер страницы и число параллельных запросов
+      постепенно растут до максимума;
+    - между MEMORY_SOFT_RATIO и MEMORY_HARD_RATIO они уменьшаются вдвое на каждом шаге;
+    - выше MEMORY_HARD_RATIO загрузка приостанавливается до освобождения памяти
+      (не дольше MEMORY_MAX_WAIT секунд), страница и параллельность сбрасываются к минимуму.
+    """
+
+    def __init__(self):
+        if settings.MEMORY_BUDGET_MB > 0:
+            self.budget = settings.MEMORY_BUDGET_MB * 1024 * 1024
+        else:
+            self.budget = int(container_memory_limit() * DEFAULT_BUDGET_RATIO)
+        self.min_page_size = settings.FETCH_MIN_PAGE_SIZE
+        self.max_page_size = settings.FETCH_MAX_PAGE_SIZE
+        self.max_concurrency = settings.FETCH_MAX_CONCURRENCY
+        self.page_size = self.max_page_size
+        self.concurrency = self.max_concurrency
+        backpressure_budget.set(self.budget)
+        self.publish()
+
+    def level(self, rss=None):
+        """
+        Уровень давления памяти: ok, soft или hard.
+        """
+        ratio = (rss if rss is not None else sample_rss()) / self.budget
+        if ratio >= settings.MEMORY_HARD_RATIO:
+            return 'hard'
+        if ratio >= settings.MEMORY_SOFT_RATIO:
+            return 'soft'
+        return 'ok'
+
+    def publish(self):
+        backpressure_page_size.set(self.page_size)
+        backpressure_concurrency.set(self.concurrency)
+
+    def next_window(self):
+        """
+        Пересчитывает параметры загрузки по текущей памяти.
+
+        :return: Кортеж (размер страницы, количество параллельных запросов)
+        """
+        level = self.level()
+        page_size, concurrency = self.page_size, self.concurrency
+        if level == 'ok':
+            self.page_size = min(self.page_size * 2, self.max_page_size)
+            self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+        elif level == 'soft':
+            self.page_size = max(self.page_size // 2, self.min_page_size)
+            self.concurrency = max(self.concurrency // 2, 1)
+        else:
+            self.page_size = self.min_page_size
+            self.concurrency = 1
+        if (page_size, concurrency) != (self.page_size, self.concurrency):
+            backpressure_decisions.inc(level=level)
+            logger.info(
+                f"Давление памяти {level}: страница {page_size} -> {self.page_size}, "
+                f"параллельных запросов {concurrency} -> {self.concurrency}"
+            )
+            self.publish()
+        return self.page_size, self.concurrency
+
+    async def wait_for_memory(self):
+        """
+        Приостанавливает загрузку, пока память выше жесткого порога.
+        """
+        if self.level() != 'hard':
+            return
+        started = time.monotonic()
+        delay = 0.25
+        logger.warning(f"Память процесса выше {settings.MEMORY_HARD_RATIO:.0%} бюджета, загрузка приостановлена")
+        while time.monotonic() - started < settings.MEMORY_MAX_WAIT:
+            gc.collect()
+            if self.level() != 'hard':
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5)
+        else:
+            logger.warning("Память не освободилась за отведенное время, загрузка продолжается с минимальной страницей")
+        waited = time.monotonic() - started
+        backpressure_wait.inc(waited)
+        backpressure_decisions.inc(level='wait')
+
+    def buffer_limit(self):
+        """
+        Максимум строк, которые этап может держать в буфере перед записью.
+        """
+        return self.page_size * self.concurrency
+
+    def status(self):
+        rss = sample_rss()
+        return {
+            "budget_bytes": self.budget,
+            "rss_bytes": rss,
+            "level": self.level(rss),
+            "page_size": self.page_size,
+            "concurrency": self.concurrency,
+        }
+
+
+backpressure = MemoryBackpressure()
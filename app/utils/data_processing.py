@@ -1,14 +1,13 @@
-import json
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
 from app.config import settings
+from app.utils import json_codec
 
 def process_and_clean_data(input_file, output_file):
     """
     Обрабатывает сырые данные о товарах и сохраняет только нужную информацию.
     """
-    with open(input_file, 'r') as f:
-        raw_data = json.load(f)
+    raw_data = json_codec.load_file(input_file)
 
     cleaned_data = []
     for product in raw_data:
@@ -27,15 +26,13 @@ def process_and_clean_data(input_file, output_file):
         }
         cleaned_data.append(cleaned_product)
 
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(cleaned_data, f, ensure_ascii=False, indent=2)
+    json_codec.dump_file(cleaned_data, output_file)
 
 def convert_json_to_xml(json_file, xml_file):
     """
     Конвертирует JSON файл в XML.
     """
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = json_codec.load_file(json_file)
 
     root = ET.Element("products")
     for product in data:
@@ -0,0 +1,146 @@
+"""
+Единый JSON кодек приложения: orjson, если он установлен, иначе стандартный json.
+
+Вывод по умолчанию компактный. Файлы данных (dump_file, JsonArrayWriter) форматируются
+с отступом 2, если включена настройка JSON_PRETTY. Значения, которые orjson не
+сериализует (целые больше 64 бит и т.п.), кодируются стандартным json. Ответы API
+кодируются тем же кодеком (JsonResponse). Большие JSON массивы читаются потоково (iter_array).
+"""
+import codecs
+import json
+import os
+from fastapi.responses import JSONResponse
+from app.config import settings
+from app.utils.atomic_files import create_temp_file
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+BACKEND = 'orjson' if orjson is not None else 'json'
+
+# Размер блока при потоковом чтении JSON массива
+ARRAY_READ_SIZE = 64 * 1024
+
+
+def dumpb(obj, pretty=False):
+    """
+    :return: JSON в UTF-8 (bytes)
+    """
+    if orjson is not None:
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if pretty else 0)
+        try:
+            return orjson.dumps(obj, option=option)
+        except TypeError:
+            pass
+    return dumps_stdlib(obj, pretty).encode('utf-8')
+
+
+def dumps(obj, pretty=False):
+    """
+    :return: JSON строка
+    """
+    if orjson is not None:
+        return dumpb(obj, pretty).decode('utf-8')
+    return dumps_stdlib(obj, pretty)
+
+
+def dumps_stdlib(obj, pretty):
+    if pretty:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(',', ':'))
+
+
+def loads(data):
+    """
+    Разбирает JSON из str, bytes или memoryview.
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    if isinstance(data, memoryview):
+        data = data.tobytes()
+    return json.loads(data)
+
+
+def dump_file(obj, path, pretty=None):
+    """
+    Записывает JSON файл через временный файл (читатели не видят частичную запись).
+
+    :param pretty: Форматировать с отступом (None - по настройке JSON_PRETTY)
+    """
+    fd, tmp_path = create_temp_file(path)
+    try:
+        with open(fd, 'wb') as f:
+            f.write(dumpb(obj, settings.JSON_PRETTY if pretty is None else pretty))
+        os.replace(tmp_path, path)
+    except Exception:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+def load_file(path):
+    with open(path, 'rb') as f:
+        return loads(f.read())
+
+
+def iter_array(f, head=b''):
+    """
+    Потоково разбирает JSON массив из бинарного файла: в памяти держится только текущий
+    блок, генератор можно остановить, не дочитывая файл.
+
+    :param head: Уже прочитанное из f начало файла
+    :raises ValueError: Файл не является JSON массивом или массив оборван
+    """
+    decoder = json.JSONDecoder()
+    text = codecs.getincrementaldecoder('utf-8')()
+    buffer = text.decode(head)
+    pos = 0
+    eof = False
+    started = False
+    while True:
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n':
+            pos += 1
+        if pos < len(buffer):
+            char = buffer[pos]
+            if not started:
+                if char != '[':
+                    raise ValueError("JSON документ не является массивом")
+                started = True
+                pos += 1
+                continue
+            if char == ']':
+                return
+            if char == ',':
+                pos += 1
+                continue
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                end = None
+            # Значение, разобранное до конца блока (например, число), может продолжаться в следующем
+            if end is not None and (end < len(buffer) or eof):
+                pos = end
+                yield item
+                continue
+        elif eof:
+            raise ValueError("Неожиданный конец JSON массива")
+        # Блок дочитывается не меньше уже накопленного, чтобы большой элемент не разбирался заново много раз
+        chunk = f.read(max(ARRAY_READ_SIZE, len(buffer) - pos))
+        eof = not chunk
+        buffer = buffer[pos:] + text.decode(chunk, final=eof)
+        pos = 0
+
+
+class JsonResponse(JSONResponse):
+    """
+    Ответ API, закодированный кодеком приложения.
+    """
+
+    def render(self, content):
+        return dumpb(content)
@@ -0,0 +1,90 @@
+import copy
+import logging
+import logging.handlers
+import threading
+import time
+from datetime import datetime, timezone
+from app.utils.metrics import log_records_dropped
+from app.utils import json_codec
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler, который при переполнении очереди отбрасывает запись, а не блокирует
+    вызывающий код и не выводит ошибку обработчика.
+    """
+
+    def prepare(self, record):
+        # Сообщение и трассировка форматируются в вызывающем потоке, форматирование строки
+        # лога выполняет поток записи
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except Exception:
+            log_records_dropped.inc(reason='queue_full')
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Ограничивает количество записей с одного места вызова: не более limit записей за window
+    секунд. Предупреждения и ошибки пропускаются всегда. Количество отброшенных записей
+    добавляется к первой записи следующего окна.
+    """
+
+    def __init__(self, limit, window):
+        super().__init__()
+        self.limit = limit
+        self.window = window
+        self._sites = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        if self.limit <= 0 or record.levelno >= logging.WARNING:
+            return True
+        key = (record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            state = self._sites.get(key)
+            if state is None or now - state[0] >= self.window:
+                suppressed = state[2] if state else 0
+                self._sites[key] = [now, 1, 0]
+                if suppressed:
+                    record.msg = f"{record.getMessage()} (пропущено похожих записей: {suppressed})"
+                    record.args = None
+                return True
+            if state[1] < self.limit:
+                state[1] += 1
+                return True
+            state[2] += 1
+        log_records_dropped.inc(reason='rate_limited')
+        return False
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Форматирует запись как одну строку JSON для сборщиков логов.
+    """
+
+    def format(self, record):
+        data = {
+            "time": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "module": record.module,
+            "line": record.lineno,
+            "thread": record.threadName,
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            data["exception"] = record.exc_text
+        return json_codec.dumps(data)
@@ -0,0 +1,129 @@
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from app.config import settings
+from app.utils.utils import logger
+from app.utils.metrics import event_loop_lag, event_loop_blocked
+
+# Количество последних блокировок, отдаваемых в состоянии монитора
+RECENT_BLOCKS = 20
+# Количество кадров стека, сохраняемых для блокировки
+STACK_DEPTH = 25
+
+
+def current_task_name(loop):
+    """
+    Задача, выполняемая циклом событий в данный момент. Читается из другого потока,
+    поэтому используется только для диагностики.
+    """
+    current_tasks = getattr(asyncio.tasks, '_current_tasks', {})
+    task = current_tasks.get(loop)
+    if task is None:
+        return None
+    coro = task.get_coro()
+    return f"{task.get_name()} {getattr(coro, '__qualname__', repr(coro))}"
+
+
+class LoopMonitor:
+    """
+    Контроль задержки цикла событий.
+
+    Периодическая задача засыпает на interval секунд и записывает в гистограмму
+    event_loop_lag_seconds, насколько позже она проснулась. Сторожевой поток следит за
+    ее пробуждениями: если цикл не отвечает дольше threshold секунд, поток снимает стек
+    потока цикла событий в момент блокировки и логирует его вместе с выполняемой корутиной.
+    """
+
+    def __init__(self):
+        self.interval = settings.LOOP_MONITOR_INTERVAL
+        self.threshold = settings.LOOP_MONITOR_THRESHOLD
+        self.enabled = False
+        self.recent_blocks = deque(maxlen=RECENT_BLOCKS)
+        self._loop = None
+        self._loop_thread_id = None
+        self._task = None
+        self._stopped = None
+        # Момент, когда задача замера должна проснуться
+        self._expected_wakeup = None
+        self._reported_wakeup = None
+
+    def start(self, interval=None, threshold=None):
+        """
+        Включает монитор. Вызывается из потока цикла событий.
+        """
+        if interval:
+            self.interval = interval
+        if threshold:
+            self.threshold = threshold
+        if self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._stopped = threading.Event()
+        self._expected_wakeup = time.perf_counter() + self.interval
+        self._task = asyncio.create_task(self._sample())
+        threading.Thread(target=self._watch, args=(self._stopped,), name='loop-monitor', daemon=True).start()
+        self.enabled = True
+        logger.info(f"Монитор цикла событий включен: интервал {self.interval} с, порог {self.threshold} с")
+
+    def stop(self):
+        if not self.enabled:
+            return
+        self.enabled = False
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        logger.info("Монитор цикла событий выключен")
+
+    async def _sample(self):
+        while True:
+            self._expected_wakeup = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(time.perf_counter() - self._expected_wakeup, 0.0)
+            event_loop_lag.observe(lag)
+            if lag > self.threshold and self.recent_blocks and self.recent_blocks[-1]["duration_seconds"] is None:
+                # Длительность блокировки становится известна только после освобождения цикла
+                self.recent_blocks[-1]["duration_seconds"] = round(lag, 3)
+
+    def _watch(self, stopped):
+        period = max(min(self.threshold / 2, self.interval), 0.01)
+        while not stopped.wait(period):
+            expected = self._expected_wakeup
+            if expected is None or expected == self._reported_wakeup:
+                continue
+            blocked_for = time.perf_counter() - expected
+            if blocked_for > self.threshold:
+                self._reported_wakeup = expected
+                self._report_block(blocked_for)
+
+    def _report_block(self, blocked_for):
+        frame = sys._current_frames().get(self._loop_thread_id)
+        stack = traceback.format_stack(frame, limit=STACK_DEPTH) if frame is not None else []
+        task = current_task_name(self._loop)
+        event_loop_blocked.inc()
+        self.recent_blocks.append({
+            "detected_at": time.time(),
+            "blocked_for_seconds": round(blocked_for, 3),
+            "duration_seconds": None,
+            "task": task,
+            "stack": [line.rstrip() for line in stack],
+        })
+        logger.warning(
+            f"Цикл событий заблокирован более {blocked_for:.3f} с, задача: {task}\n"
+            + ''.join(stack)
+        )
+
+    def status(self):
+        return {
+            "enabled": self.enabled,
+            "interval": self.interval,
+            "threshold": self.threshold,
+            "recent_blocks": list(self.recent_blocks),
+        }
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,295 @@
+import asyncio
+import threading
+import time
+from contextlib import contextmanager
+from types import SimpleNamespace
+import aiohttp
+import psutil
+
+# Границы корзин гистограмм по умолчанию (секунды)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+
+def format_labels(names, values):
+    if not names:
+        return ''
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получены {tuple(labels)}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.extend(self.render_sample(key, value))
+        return lines
+
+    def render_sample(self, key, value):
+        return [f"{self.name}{format_labels(self.labelnames, key)} {format_value(value)}"]
+
+
+class Counter(Metric):
+    type_name = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type_name = 'gauge'
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_max(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = max(self._values.get(key, value), value)
+
+
+class Histogram(Metric):
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][i] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render_sample(self, key, value):
+        counts, total, count = value
+        lines = []
+        for bound, bucket_count in zip(self.buckets, counts):
+            labels = format_labels(self.labelnames + ('le',), key + (format_value(float(bound)),))
+            lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+        labels = format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {format_value(total)}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Реестр метрик с выводом в текстовом формате Prometheus.
+    """
+
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+stage_duration = registry.histogram(
+    'sync_stage_duration_seconds', 'Длительность этапов сбора данных', ('stage',)
+)
+stage_errors = registry.counter(
+    'sync_stage_errors_total', 'Количество ошибок на этапах сбора данных', ('stage',)
+)
+upstream_duration = registry.histogram(
+    'upstream_request_duration_seconds', 'Длительность запросов к внешним сервисам', ('upstream',)
+)
+upstream_requests = registry.counter(
+    'upstream_requests_total', 'Количество запросов к внешним сервисам по статусу ответа', ('upstream', 'status')
+)
+upstream_retries = registry.counter(
+    'upstream_retries_total', 'Количество повторных запросов к внешним сервисам', ('upstream',)
+)
+upstream_bytes = registry.counter(
+    'upstream_response_bytes_total', 'Объем ответов внешних сервисов в байтах', ('upstream',)
+)
+rows_processed = registry.counter(
+    'sync_rows_processed_total', 'Количество обработанных строк по наборам данных', ('dataset',)
+)
+fetch_cache_requests = registry.counter(
+    'fetch_cache_requests_total', 'Запросы наборов данных МойСклад по источнику результата (cache, shared, upstream)',
+    ('dataset', 'result')
+)
+process_rss = registry.gauge(
+    'process_resident_memory_bytes', 'Текущий объем резидентной памяти процесса'
+)
+process_rss_peak = registry.gauge(
+    'process_resident_memory_peak_bytes', 'Максимальный замеченный объем резидентной памяти процесса'
+)
+stage_rss = registry.gauge(
+    'sync_stage_resident_memory_bytes', 'Резидентная память процесса по завершении этапа', ('stage',)
+)
+event_loop_lag = registry.histogram(
+    'event_loop_lag_seconds', 'Задержка пробуждения периодической задачи цикла событий',
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+event_loop_blocked = registry.counter(
+    'event_loop_blocked_total', 'Количество блокировок цикла событий дольше порога'
+)
+log_records_dropped = registry.counter(
+    'log_records_dropped_total', 'Количество отброшенных записей лога по причине', ('reason',)
+)
+backpressure_budget = registry.gauge(
+    'backpressure_memory_budget_bytes', 'Бюджет резидентной памяти для загрузки данных'
+)
+backpressure_page_size = registry.gauge(
+    'backpressure_page_size', 'Текущий размер страницы загрузки данных МойСклад'
+)
+backpressure_concurrency = registry.gauge(
+    'backpressure_concurrency', 'Текущее количество параллельных запросов страниц МойСклад'
+)
+backpressure_decisions = registry.counter(
+    'backpressure_decisions_total', 'Изменения параметров загрузки по уровню давления памяти', ('level',)
+)
+backpressure_wait = registry.counter(
+    'backpressure_wait_seconds_total', 'Время приостановки загрузки из-за нехватки памяти'
+)
+
+
+def sample_rss():
+    """
+    Обновляет метрики резидентной памяти и возвращает текущее значение в байтах.
+    """
+    rss = psutil.Process().memory_info().rss
+    process_rss.set(rss)
+    process_rss_peak.set_max(rss)
+    return rss
+
+
+registry.collectors.append(sample_rss)
+
+
+async def rss_sampler(interval):
+    """
+    Периодически замеряет память процесса, чтобы пиковое значение учитывало всплески между опросами.
+    """
+    while True:
+        sample_rss()
+        await asyncio.sleep(interval)
+
+
+class UpstreamTimer:
+    """
+    Замер запроса к внешнему сервису. Статус ответа задается через атрибут status.
+    """
+
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.status = 'error'
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        upstream_duration.observe(time.perf_counter() - self.started, upstream=self.upstream)
+        upstream_requests.inc(upstream=self.upstream, status=str(self.status))
+        return False
+
+
+def upstream_timer(upstream):
+    return UpstreamTimer(upstream)
+
+
+@contextmanager
+def stage_timer(stage):
+    """
+    Замеряет длительность этапа сбора данных и память процесса по его завершении.
+    """
+    started = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        stage_errors.inc(stage=stage)
+        raise
+    finally:
+        stage_duration.observe(time.perf_counter() - started, stage=stage)
+        stage_rss.set(sample_rss(), stage=stage)
+
+
+def upstream_trace(upstream):
+    """
+    Создает TraceConfig aiohttp, записывающий длительность, статус и объем ответов внешнего сервиса.
+    """
+    trace = aiohttp.TraceConfig(trace_config_ctx_factory=SimpleNamespace)
+
+    async def on_request_start(session, context, params):
+        context.started = time.perf_counter()
+
+    async def on_request_end(session, context, params):
+        upstream_duration.observe(time.perf_counter() - context.started, upstream=upstream)
+        upstream_requests.inc(upstream=upstream, status=str(params.response.status))
+
+    async def on_request_exception(session, context, params):
+        upstream_duration.observe(time.perf_counter() - context.started, upstream=upstream)
+        upstream_requests.inc(upstream=upstream, status='error')
+
+    async def on_response_chunk_received(session, context, params):
+        upstream_bytes.inc(len(params.chunk), upstream=upstream)
+
+    trace.on_request_start.append(on_request_start)
+    trace.on_request_end.append(on_request_end)
+    trace.on_request_exception.append(on_request_exception)
+    trace.on_response_chunk_received.append(on_response_chunk_received)
+    return trace
+
+
+# Общий TraceConfig для запросов к API МойСклад
+moysklad_trace = upstream_trace('moysklad')
@@ -0,0 +1,223 @@
+import asyncio
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from app.config import settings
+from app.utils.utils import logger, kiev_tz
+from app.utils import json_codec
+
+# Профилировщик текущего запуска сбора данных (None - профилирование отключено)
+current_profiler = ContextVar('current_profiler', default=None)
+
+# Функции, время в которых считается блокирующим синхронным вводом-выводом
+BLOCKING_IO_FUNCTIONS = (
+    "of '_socket.socket' objects",
+    "of '_ssl._SSLSocket' objects",
+    "of '_io.BufferedWriter' objects",
+    "of '_io.BufferedReader' objects",
+    "of '_io.TextIOWrapper' objects",
+    "of '_io.FileIO' objects",
+    "<built-in method time.sleep>",
+    "<built-in method posix.fsync>",
+    "<built-in method posix.stat>",
+    "<built-in method io.open>",
+    "<built-in method select.select>",
+    "<built-in method _socket.getaddrinfo>",
+)
+
+# Одновременно в интерпретаторе может работать только один cProfile
+_profile_lock = threading.Lock()
+
+TOP_FUNCTIONS = 30
+TOP_ALLOCATIONS = 10
+
+
+def function_label(func):
+    filename, line, name = func
+    if filename == '~':
+        return name
+    return f"{filename}:{line}({name})"
+
+
+class RunProfiler:
+    """
+    Профилирование одного запуска сбора данных.
+
+    Каждый этап оборачивается в cProfile и tracemalloc. Для этапа сохраняются самые затратные
+    функции, пик выделенной памяти, крупнейшие места выделения и время, проведенное
+    в блокирующем синхронном вводе-выводе в потоке, выполняющем этап. Работа, вынесенная
+    в другие потоки (asyncio.to_thread), в профиль этапа не попадает.
+
+    Ограничение: cProfile профилирует поток целиком, поэтому профиль асинхронного этапа
+    включает и другие корутины, выполнявшиеся в цикле событий во время его await
+    (обработчики других запросов, фоновые задачи). Количество таких задач записывается
+    в отчет этапа (concurrent_tasks), при ненулевом значении профиль этапа неточен.
+    """
+
+    def __init__(self, run_id=None):
+        self.run_id = run_id or datetime.now(kiev_tz).strftime("%Y%m%d-%H%M%S-%f")
+        self.output_dir = os.path.join(settings.PROFILE_DIR, self.run_id)
+        self.stages = []
+        self.started = None
+        self._own_tracemalloc = False
+
+    def start(self):
+        self.started = time.time()
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._own_tracemalloc = True
+
+    def stop(self):
+        if self._own_tracemalloc:
+            tracemalloc.stop()
+            self._own_tracemalloc = False
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Профилирует один этап. Если профилировщик уже занят другим запуском, этап выполняется без профиля.
+        """
+        if not _profile_lock.acquire(blocking=False):
+            logger.warning(f"Профилирование этапа {name} пропущено: профилировщик занят")
+            yield
+            return
+
+        loop_switch = LoopSwitch()
+        profile = cProfile.Profile()
+        tracemalloc.reset_peak()
+        memory_before = tracemalloc.get_traced_memory()[0]
+        started = time.perf_counter()
+        profile.enable()
+        try:
+            yield
+        finally:
+            profile.disable()
+            _profile_lock.release()
+            duration = time.perf_counter() - started
+            concurrent_tasks = loop_switch.other_tasks()
+            memory_current, memory_peak = tracemalloc.get_traced_memory()
+            report = self.stage_report(name, profile, duration, memory_before, memory_current, memory_peak)
+            report["concurrent_tasks"] = concurrent_tasks
+            self.stages.append(report)
+
+    def stage_report(self, name, profile, duration, memory_before, memory_current, memory_peak):
+        stats = pstats.Stats(profile)
+
+        blocking = 0.0
+        for func, (_, _, tottime, _, _) in stats.stats.items():
+            label = function_label(func)
+            if any(pattern in label for pattern in BLOCKING_IO_FUNCTIONS):
+                blocking += tottime
+
+        top = sorted(stats.stats.items(), key=lambda item: item[1][3], reverse=True)[:TOP_FUNCTIONS]
+        top_functions = [
+            {
+                "function": function_label(func),
+                "calls": ncalls,
+                "tottime": round(tottime, 4),
+                "cumtime": round(cumtime, 4),
+            }
+            for func, (_, ncalls, tottime, cumtime, _) in top
+        ]
+
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        top_allocations = [
+            {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+            for stat in snapshot.statistics('lineno')[:TOP_ALLOCATIONS]
+        ]
+
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+
+        return {
+            "stage": name,
+            "duration_seconds": round(duration, 4),
+            "blocking_io_seconds": round(blocking, 4),
+            "memory_peak_bytes": memory_peak,
+            "memory_growth_bytes": memory_current - memory_before,
+            "top_functions": top_functions,
+            "top_allocations": top_allocations,
+            "_text": text.getvalue(),
+        }
+
+    def save(self):
+        """
+        Сохраняет отчет запуска: report.json со сводкой по этапам и <этап>.txt с выводом pstats.
+
+        :return: Путь к каталогу отчета
+        """
+        os.makedirs(self.output_dir, exist_ok=True)
+        stages = []
+        for stage in self.stages:
+            stage = dict(stage)
+            with open(os.path.join(self.output_dir, f"{stage['stage']}.txt"), 'w', encoding='utf-8') as f:
+                f.write(stage.pop('_text'))
+            stages.append(stage)
+
+        report = {
+            "run_id": self.run_id,
+            "started": datetime.fromtimestamp(self.started, kiev_tz).isoformat() if self.started else None,
+            "total_seconds": round(sum(s["duration_seconds"] for s in stages), 4),
+            "blocking_io_seconds": round(sum(s["blocking_io_seconds"] for s in stages), 4),
+            # Профили этапов с concurrent_tasks > 0 включают работу других задач цикла событий
+            "stages_with_concurrent_tasks": [s["stage"] for s in stages if s["concurrent_tasks"]],
+            "stages": stages,
+        }
+        json_codec.dump_file(report, os.path.join(self.output_dir, 'report.json'), pretty=True)
+        logger.info(f"Отчет профилирования сохранен: {self.output_dir}")
+        return self.output_dir
+
+
+class LoopSwitch:
+    """
+    Определяет, передавал ли этап управление циклу событий: обратный вызов, поставленный
+    в начале этапа, выполняется только если цикл событий работал во время этапа.
+    """
+
+    def __init__(self):
+        self.switched = False
+        try:
+            asyncio.get_running_loop().call_soon(self.mark)
+        except RuntimeError:
+            pass
+
+    def mark(self):
+        self.switched = True
+
+    def other_tasks(self):
+        """
+        Количество других задач цикла событий, которые могли выполняться во время этапа.
+        """
+        if not self.switched:
+            return 0
+        current = asyncio.current_task()
+        return len([task for task in asyncio.all_tasks() if task is not current])
+
+
+def list_profiles():
+    """
+    Возвращает список сохраненных отчетов профилирования, начиная с последнего.
+    """
+    if not os.path.isdir(settings.PROFILE_DIR):
+        return []
+    return sorted(
+        (name for name in os.listdir(settings.PROFILE_DIR)
+         if os.path.exists(os.path.join(settings.PROFILE_DIR, name, 'report.json'))),
+        reverse=True
+    )
+
+
+def load_profile(run_id):
+    path = os.path.join(settings.PROFILE_DIR, os.path.basename(run_id), 'report.json')
+    return json_codec.load_file(path)
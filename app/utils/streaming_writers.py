@@ -0,0 +1,87 @@
+import gzip
+import os
+import textwrap
+import xml.etree.ElementTree as ET
+from app.config import settings
+from app.utils import json_codec
+from app.utils.atomic_files import create_temp_file
+
+
+class AtomicFileWriter:
+    """
+    Пишет файл по частям во временный файл и заменяет целевой файл при закрытии,
+    поэтому читатели никогда не видят частично записанный файл.
+    """
+
+    def __init__(self, path, compress=False):
+        self.path = path
+        fd, self.tmp_path = create_temp_file(path)
+        if compress:
+            os.close(fd)
+            self.file = gzip.open(self.tmp_path, 'wt', encoding='utf-8')
+        else:
+            self.file = open(fd, 'w', encoding='utf-8')
+        self.count = 0
+
+    def close(self):
+        self.finish()
+        self.file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.file.close()
+        try:
+            os.remove(self.tmp_path)
+        except OSError:
+            pass
+
+    def finish(self):
+        pass
+
+
+class JsonArrayWriter(AtomicFileWriter):
+    """
+    Потоковая запись списка в JSON массив через json_codec: компактно, по строке массива
+    на элемент, или с отступом 2 (pretty, по умолчанию - настройка JSON_PRETTY).
+    """
+
+    def __init__(self, path, compress=False, pretty=None):
+        super().__init__(path, compress)
+        self.pretty = settings.JSON_PRETTY if pretty is None else pretty
+        self.file.write('[')
+
+    def write(self, rows):
+        for row in rows:
+            text = json_codec.dumps(row, self.pretty)
+            separator = ',' if self.count else ''
+            if self.pretty:
+                self.file.write(f"{separator}\n{textwrap.indent(text, '  ')}")
+            else:
+                self.file.write(f"{separator}\n{text}" if self.count else text)
+            self.count += 1
+
+    def finish(self):
+        self.file.write('\n]' if self.count and self.pretty else ']')
+
+
+class XmlListWriter(AtomicFileWriter):
+    """
+    Потоковая запись списка словарей в XML: <root><product><ключ>значение</ключ>...</product>...</root>.
+    """
+
+    def __init__(self, path, root_tag, item_tag='product'):
+        super().__init__(path)
+        self.root_tag = root_tag
+        self.item_tag = item_tag
+        self.file.write(f"<?xml version='1.0' encoding='utf-8'?>\n<{root_tag}>")
+
+    def write(self, rows):
+        for row in rows:
+            element = ET.Element(self.item_tag)
+            for key, value in row.items():
+                ET.SubElement(element, key).text = str(value)
+            self.file.write(ET.tostring(element, encoding='unicode'))
+            self.count += 1
+
+    def finish(self):
+        self.file.write(f"</{self.root_tag}>")
@@ -1,65 +1,71 @@
 import pytz
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import os
-import psutil
-import gc
-import json
 import xml.etree.ElementTree as ET
 from xml.dom import minidom
 from app.config import settings
 from app.config.field_mapping import FIELD_MAPPING
+from app.utils.log_handlers import DroppingQueueHandler, RateLimitFilter, JsonFormatter
+from app.utils import json_codec
 
 
 kiev_tz = pytz.timezone('Europe/Kiev')
 
+def create_log_handlers(log_dir):
+    """
+    Создает обработчики записи лога в файл с ротацией и в stdout.
+    """
+    if settings.LOG_FORMAT == 'json':
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    log_file = os.path.join(log_dir, 'sync.log')
+    if settings.LOG_ROTATE_WHEN:
+        file_handler = logging.handlers.TimedRotatingFileHandler(
+            log_file, when=settings.LOG_ROTATE_WHEN, backupCount=settings.LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+    else:
+        file_handler = logging.handlers.RotatingFileHandler(
+            log_file, maxBytes=settings.LOG_MAX_BYTES, backupCount=settings.LOG_BACKUP_COUNT, encoding='utf-8'
+        )
+    stream_handler = logging.StreamHandler(sys.stdout)
+    for handler in (file_handler, stream_handler):
+        handler.setFormatter(formatter)
+    return file_handler, stream_handler
+
 def setup_logger(name):
+    """
+    Настраивает логгер с асинхронной записью: записи помещаются в очередь, а в файл и stdout
+    их пишет фоновый поток, поэтому вызовы логгера не блокируются на диске. Повторный
+    вызов возвращает уже настроенный логгер.
+    """
     logger = logging.getLogger(name)
-    logger.setLevel(logging.INFO)
-    formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    if getattr(logger, 'queue_listener', None) is not None:
+        return logger
+    logger.setLevel(settings.LOG_LEVEL)
 
     log_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'logs')
     os.makedirs(log_dir, exist_ok=True)
 
-    file_handler = logging.FileHandler(os.path.join(log_dir, 'sync.log'))
-    file_handler.setFormatter(formatter)
-    stream_handler = logging.StreamHandler(sys.stdout)
-    stream_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-    logger.addHandler(stream_handler)
+    log_queue = queue.Queue(settings.LOG_QUEUE_SIZE)
+    queue_handler = DroppingQueueHandler(log_queue)
+    queue_handler.addFilter(RateLimitFilter(settings.LOG_RATE_LIMIT, settings.LOG_RATE_WINDOW))
+    listener = logging.handlers.QueueListener(log_queue, *create_log_handlers(log_dir), respect_handler_level=True)
+    listener.start()
+    # Остаток очереди дописывается при завершении процесса
+    atexit.register(listener.stop)
+
+    logger.addHandler(queue_handler)
+    logger.queue_listener = listener
     return logger
 
 logger = setup_logger('app')
 
-def check_memory_usage(threshold):
-    memory = psutil.virtual_memory()
-    return memory.percent > threshold
-
-def check_file_growth(file_path, previous_size):
-    current_size = os.path.getsize(file_path)
-    return current_size > previous_size
-
-def adjust_batch_size(current_batch_size):
-    new_batch_size = max(2, current_batch_size // 2)
-    if new_batch_size != current_batch_size:
-        logger.warning(f"Уменьшаем размер партии с {current_batch_size} до {new_batch_size}")
-    return new_batch_size
-
-async def handle_memory_overflow(file_path, current_batch_size):
-    previous_size = os.path.getsize(file_path)
-    if check_file_growth(file_path, previous_size):
-        logger.info("Размер файла увеличился, продолжаем работу")
-        return current_batch_size
-    else:
-        logger.warning("Размер файла не увеличился после получения данных")
-        return adjust_batch_size(current_batch_size)
-
-def clear_memory():
-    gc.collect()
-    process = psutil.Process()
-    memory_info = process.memory_info()
-    logger.info(f"Memory usage after cleanup: {memory_info.rss / 1024 / 1024:.2f} MB")
-
 def json_to_xml(data, xml_file_path):
     root = ET.Element('products')
     for item in data:
@@ -76,8 +82,7 @@ def json_to_xml(data, xml_file_path):
 
 def load_json_file(file_path):
     try:
-        with open(file_path, 'r', encoding='utf-8') as file:
-            return json.load(file)
+        return json_codec.load_file(file_path)
     except Exception as e:
         logger.error(f"Ошибка при загрузке файла {file_path}: {str(e)}")
         return {}
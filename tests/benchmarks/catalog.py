@@ -0,0 +1,124 @@
+"""
+Детерминированный синтетический каталог для бенчмарков.
+
+Товары не хранятся в памяти: каждая позиция вычисляется по номеру, поэтому заглушки
+отдают страницы каталога любого размера (от 10 тысяч до миллиона товаров) без
+предварительной генерации. Одинаковые size и seed всегда дают одинаковый каталог.
+"""
+
+STORES = ['Основной склад', 'Киев', 'Львов', 'Одесса', 'Днепр']
+CATEGORIES = ['Инструменты', 'Инструменты/Электроинструмент', 'Сад', 'Сад/Полив', 'Дом', 'Дом/Кухня', 'Авто']
+API_PREFIX = 'https://api.moysklad.ru/api/remap/1.2'
+
+
+def mix(i, seed):
+    """Детерминированное псевдослучайное число для позиции i."""
+    return ((i + 1) * 2654435761 + seed * 40503) % 4294967296
+
+
+class SyntheticCatalog:
+    """
+    Синтетический каталог МойСклад.
+
+    Каждый duplicate_every-й товар - вариант без артикула с кодом предыдущего товара:
+    такие пары объединяет merge_duplicate_products, как записи товара и его остатка в
+    реальном каталоге. Изображения на FTP есть у каждого image_every-го товара с артикулом.
+    """
+
+    def __init__(self, size, seed=0, duplicate_every=10, image_every=3):
+        self.size = size
+        self.seed = seed
+        self.duplicate_every = duplicate_every
+        self.image_every = image_every
+        # Переопределенные остатки: ID товара -> (остаток, момент изменения)
+        self.stock_changes = {}
+
+    def product_id(self, i):
+        return f"{i:08x}-0000-4000-8000-{self.seed:012x}"
+
+    def index_of(self, product_id):
+        try:
+            i = int(product_id.split('-')[0], 16)
+        except ValueError:
+            return None
+        return i if 0 <= i < self.size and product_id == self.product_id(i) else None
+
+    def is_duplicate(self, i):
+        return self.duplicate_every > 0 and i % self.duplicate_every == self.duplicate_every - 1
+
+    def code(self, i):
+        return f"C{(i - 1 if self.is_duplicate(i) else i):07d}"
+
+    def article(self, i):
+        return '' if self.is_duplicate(i) else f"A{i:07d}"
+
+    def price(self, i):
+        return 10000 + mix(i, self.seed) % 500000
+
+    def stock(self, i):
+        changed = self.stock_changes.get(self.product_id(i))
+        if changed is not None:
+            return changed[0]
+        return mix(i, self.seed + 1) % 50
+
+    def store_stocks(self, i):
+        value = mix(i, self.seed + 2)
+        return [{'name': store, 'stock': (value >> n) % 7} for n, store in enumerate(STORES)]
+
+    def updated(self, i):
+        return f"2024-01-{1 + i % 28:02d} 10:00:00.000"
+
+    def meta(self, i, entity='product'):
+        return {'href': f"{API_PREFIX}/entity/{entity}/{self.product_id(i)}", 'type': entity}
+
+    def assortment_row(self, i):
+        return {
+            'meta': self.meta(i),
+            'id': self.product_id(i),
+            'name': f"Товар {i}",
+            'code': self.code(i),
+            'article': self.article(i),
+            'externalCode': f"ext{i}",
+            'description': f"Описание товара {i}",
+            'pathName': CATEGORIES[i % len(CATEGORIES)],
+            'updated': self.updated(i),
+            'salePrices': [{'value': self.price(i)}],
+        }
+
+    def stock_row(self, i):
+        return {
+            'meta': self.meta(i),
+            'name': f"Товар {i}",
+            'code': self.code(i),
+            'article': self.article(i),
+            'salePrice': self.price(i),
+            'stock': self.stock(i),
+            'folder': {'pathName': CATEGORIES[i % len(CATEGORIES)]},
+            'updated': self.updated(i),
+        }
+
+    def balance_row(self, i):
+        return {'meta': self.meta(i), 'stockByStore': self.store_stocks(i)}
+
+    def images(self):
+        """Имена файлов изображений на FTP в формате <артикул>_<номер>.jpg."""
+        for i in range(0, self.size, self.image_every):
+            article = self.article(i)
+            if article:
+                yield f"{article}_1.jpg"
+                if i % 2 == 0:
+                    yield f"{article}_2.jpg"
+
+    def change_stock(self, count, moment):
+        """
+        Меняет остаток count товаров, равномерно распределенных по каталогу.
+
+        :return: Список ID измененных товаров
+        """
+        step = max(self.size // max(count, 1), 1)
+        changed = []
+        for i in range(0, self.size, step)[:count]:
+            product_id = self.product_id(i)
+            self.stock_changes[product_id] = (self.stock(i) + 1, moment)
+            changed.append(product_id)
+        return changed
@@ -0,0 +1,334 @@
+"""
+Нагрузочный тест эндпоинтов, обслуживающих живой трафик: /vtoman/products/{code},
+/image/{filename} и /FTPimages.
+
+Приложение запускается через uvicorn в отдельном процессе и работает с заглушками внешних
+сервисов (tests/standins) на синтетическом каталоге. Для каждого эндпоинта и уровня
+параллельности замеряются p50/p95/p99 задержки, пропускная способность и доля ошибок.
+
+Блокировка цикла событий определяется по пробе: во время нагрузки с постоянной частотой
+запрашивается GET /, который не выполняет никакой работы. Если его задержка растет вместе
+с нагрузкой, обработчик нагружаемого эндпоинта блокирует цикл событий синхронным вызовом.
+
+    python -m tests.benchmarks.load_test --size 10000 --concurrency 1,8,32 --duration 10
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+import aiohttp
+import requests
+from tests.benchmarks.catalog import SyntheticCatalog
+from tests.benchmarks.run_benchmark import RESULTS_DIR, REPO_ROOT, THRESHOLDS_FILE, app_environment, git_revision
+from tests.standins.upstreams import Upstreams, HOST
+
+ENDPOINTS = ('product', 'image', 'ftp_images')
+FTP_IMAGES_PER_PAGE = 50
+# Интервал запросов пробы цикла событий в секундах
+PROBE_INTERVAL = 0.05
+
+
+def percentile(values, fraction):
+    """Перцентиль по методу ближайшего ранга."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def latency_report(latencies):
+    return {
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+        "max_ms": round(max(latencies) * 1000, 2) if latencies else None,
+    }
+
+
+class Targets:
+    """
+    Генератор адресов запросов по синтетическому каталогу.
+    """
+
+    def __init__(self, catalog, seed=0):
+        self.random = random.Random(seed)
+        self.codes = [catalog.code(i) for i in range(0, catalog.size, max(catalog.size // 5000, 1))]
+        self.images = list(catalog.images())[::max(catalog.size // 15000, 1)]
+        articles = sum(1 for i in range(0, catalog.size, catalog.image_every) if catalog.article(i))
+        self.ftp_pages = max((articles + FTP_IMAGES_PER_PAGE - 1) // FTP_IMAGES_PER_PAGE, 1)
+
+    def path(self, endpoint):
+        if endpoint == 'product':
+            return f"/vtoman/products/{self.random.choice(self.codes)}"
+        if endpoint == 'image':
+            return f"/image/{self.random.choice(self.images)}"
+        if endpoint == 'ftp_images':
+            return f"/FTPimages?page={self.random.randint(1, self.ftp_pages)}&per_page={FTP_IMAGES_PER_PAGE}"
+        raise ValueError(f"Неизвестный эндпоинт {endpoint}")
+
+
+async def probe(session, base_url, stop, latencies):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            async with session.get(f"{base_url}/") as response:
+                await response.read()
+            latencies.append(time.perf_counter() - started)
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(PROBE_INTERVAL)
+
+
+async def run_step(base_url, targets, endpoint, concurrency, duration, timeout):
+    """
+    Нагружает один эндпоинт заданным числом параллельных клиентов в течение duration секунд.
+    """
+    latencies = []
+    statuses = {}
+    probe_latencies = []
+    stop = asyncio.Event()
+    deadline = time.perf_counter() + duration
+
+    async def client(session):
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                async with session.get(f"{base_url}{targets.path(endpoint)}") as response:
+                    await response.read()
+                    status = str(response.status)
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                status = type(e).__name__
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    connector = aiohttp.TCPConnector(limit=concurrency + 1)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        probe_task = asyncio.create_task(probe(session, base_url, stop, probe_latencies))
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe_task
+
+    total = sum(statuses.values())
+    errors = sum(count for status, count in statuses.items() if not status.startswith(('2', '3')))
+    return {
+        "endpoint": endpoint,
+        "concurrency": concurrency,
+        "requests": total,
+        "seconds": round(elapsed, 3),
+        "requests_per_second": round(total / elapsed, 1) if elapsed > 0 else None,
+        "error_rate": round(errors / total, 4) if total else None,
+        "statuses": statuses,
+        "latency": latency_report(latencies),
+        "probe": latency_report(probe_latencies),
+    }
+
+
+async def idle_probe(base_url, duration=2.0):
+    """
+    Задержка пробы без нагрузки - точка отсчета для определения блокировки цикла событий.
+    """
+    latencies = []
+    stop = asyncio.Event()
+    async with aiohttp.ClientSession() as session:
+        task = asyncio.create_task(probe(session, base_url, stop, latencies))
+        await asyncio.sleep(duration)
+        stop.set()
+        await task
+    return latency_report(latencies)
+
+
+def wait_for_app(base_url, process, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError("Приложение завершилось при запуске")
+        try:
+            if requests.get(f"{base_url}/", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("Приложение не запустилось")
+
+
+def prepare_catalog(base_url):
+    """
+    Заполняет каталог и индекс изображений одним сбором данных.
+    """
+    response = requests.get(f"{base_url}/collect_products", timeout=3600)
+    response.raise_for_status()
+    if response.json().get('errors'):
+        raise RuntimeError(f"Сбор данных завершился с ошибками: {response.json()['errors']}")
+
+
+def start_app(upstreams, workdir, port, workers):
+    env = dict(os.environ, **app_environment(upstreams, workdir))
+    log = open(os.path.join(workdir, 'app.log'), 'w', encoding='utf-8')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', HOST, '--port', str(port),
+         '--workers', str(workers), '--no-access-log'],
+        cwd=REPO_ROOT, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    return process, log
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind((HOST, 0))
+        return sock.getsockname()[1]
+
+
+def evaluate(steps, idle, thresholds):
+    """
+    Проверяет шаги нагрузки по порогам секции load файла thresholds.json.
+    """
+    rules = thresholds.get("load", {})
+    checks = []
+    for step in steps:
+        name = f"{step['endpoint']}@{step['concurrency']}"
+        rule = rules.get("endpoints", {}).get(step['endpoint'], {})
+        if "max_p99_ms" in rule and step["latency"]["p99_ms"] is not None:
+            checks.append({
+                "check": f"{name}.p99_ms", "value": step["latency"]["p99_ms"],
+                "limit": rule["max_p99_ms"], "passed": step["latency"]["p99_ms"] <= rule["max_p99_ms"],
+            })
+        if "max_error_rate" in rules and step["error_rate"] is not None:
+            checks.append({
+                "check": f"{name}.error_rate", "value": step["error_rate"],
+                "limit": rules["max_error_rate"], "passed": step["error_rate"] <= rules["max_error_rate"],
+            })
+        # Блокировка цикла событий: проба ждет дольше допустимого сверх задержки без нагрузки
+        probe_p99 = step["probe"]["p99_ms"]
+        if "max_probe_delay_ms" in rules and probe_p99 is not None:
+            limit = (idle["p99_ms"] or 0) + rules["max_probe_delay_ms"]
+            step["loop_blocked"] = probe_p99 > limit
+            checks.append({
+                "check": f"{name}.probe_p99_ms", "value": probe_p99,
+                "limit": round(limit, 2), "passed": not step["loop_blocked"],
+            })
+    return checks
+
+
+def run_load_test(size=10000, seed=0, endpoints=ENDPOINTS, concurrency=(1, 8, 32), duration=10.0,
+                  workers=1, timeout=30.0, app_url=None, thresholds_file=THRESHOLDS_FILE,
+                  results_dir=RESULTS_DIR, save=True):
+    """
+    Выполняет нагрузочный тест. Если app_url не задан, приложение и заглушки запускаются локально.
+
+    :return: Результат со сводкой по шагам и проверками порогов
+    """
+    with open(thresholds_file, 'r', encoding='utf-8') as f:
+        thresholds = json.load(f)
+    catalog = SyntheticCatalog(size, seed)
+    targets = Targets(catalog, seed)
+
+    upstreams = process = log = workdir = None
+    try:
+        if app_url is None:
+            upstreams = Upstreams(size, seed).__enter__()
+            workdir = tempfile.mkdtemp(prefix=f'warehouse-load-{size}-')
+            port = free_port()
+            process, log = start_app(upstreams, workdir, port, workers)
+            app_url = f"http://{HOST}:{port}"
+            wait_for_app(app_url, process)
+            prepare_catalog(app_url)
+        else:
+            wait_for_app(app_url, None)
+
+        idle = asyncio.run(idle_probe(app_url))
+        steps = []
+        for endpoint in endpoints:
+            for level in concurrency:
+                steps.append(asyncio.run(run_step(app_url, targets, endpoint, level, duration, timeout)))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(30)
+            log.close()
+        if upstreams is not None:
+            upstreams.__exit__(None, None, None)
+        if workdir is not None:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    checks = evaluate(steps, idle, thresholds)
+    result = {
+        "timestamp": datetime.now().strftime("%Y%m%d-%H%M%S"),
+        "revision": git_revision(),
+        "size": size,
+        "workers": workers,
+        "duration": duration,
+        "idle_probe": idle,
+        "steps": steps,
+        "thresholds": thresholds.get("load", {}),
+        "checks": checks,
+        "passed": all(check["passed"] for check in checks),
+    }
+    if save:
+        os.makedirs(results_dir, exist_ok=True)
+        path = os.path.join(results_dir, f"load-{result['timestamp']}-{size}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        result["path"] = path
+    return result
+
+
+def print_summary(result):
+    print(f"\nНагрузочный тест: каталог {result['size']} товаров, воркеров {result['workers']} ({result['revision']})")
+    print(f"Проба цикла событий без нагрузки: p99 {result['idle_probe']['p99_ms']} мс")
+    print(f"{'эндпоинт':<14}{'клиентов':>9}{'запр/с':>10}{'ошибки':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'проба p99':>11}")
+    for step in result["steps"]:
+        latency = step["latency"]
+        blocked = ' цикл заблокирован' if step.get("loop_blocked") else ''
+        print(
+            f"{step['endpoint']:<14}{step['concurrency']:>9}{step['requests_per_second'] or '-':>10}"
+            f"{step['error_rate'] if step['error_rate'] is not None else '-':>9}"
+            f"{latency['p50_ms'] or '-':>9}{latency['p95_ms'] or '-':>9}{latency['p99_ms'] or '-':>9}"
+            f"{step['probe']['p99_ms'] or '-':>11}{blocked}"
+        )
+    for check in result["checks"]:
+        if not check["passed"]:
+            print(f"НЕ ПРОЙДЕНО {check['check']}: {check['value']} > {check['limit']}")
+    if result.get("path"):
+        print(f"Результат сохранен: {result['path']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Нагрузочный тест эндпоинтов живого трафика")
+    parser.add_argument('--size', type=int, default=10000, help="Количество товаров синтетического каталога")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--endpoints', default=','.join(ENDPOINTS), help="Эндпоинты через запятую: " + ', '.join(ENDPOINTS))
+    parser.add_argument('--concurrency', default='1,8,32', help="Уровни параллельности через запятую")
+    parser.add_argument('--duration', type=float, default=10.0, help="Длительность каждого шага в секундах")
+    parser.add_argument('--workers', type=int, default=1, help="Количество воркеров uvicorn")
+    parser.add_argument('--timeout', type=float, default=30.0, help="Таймаут одного запроса в секундах")
+    parser.add_argument('--app-url', default=None, help="Адрес уже запущенного приложения вместо локального запуска")
+    parser.add_argument('--thresholds', default=THRESHOLDS_FILE)
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--no-save', action='store_true', help="Не сохранять результат")
+    args = parser.parse_args()
+
+    result = run_load_test(
+        size=args.size, seed=args.seed,
+        endpoints=[endpoint for endpoint in args.endpoints.split(',') if endpoint],
+        concurrency=[int(level) for level in args.concurrency.split(',') if level],
+        duration=args.duration, workers=args.workers, timeout=args.timeout, app_url=args.app_url,
+        thresholds_file=args.thresholds, results_dir=args.results_dir, save=not args.no_save
+    )
+    print_summary(result)
+    sys.exit(0 if result["passed"] else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,354 @@
+"""
+Сквозной бенчмарк сбора данных на синтетическом каталоге с заглушками внешних сервисов.
+
+Для каждого размера каталога запускается отдельный процесс с приложением и заглушками
+МойСклад, WooCommerce, Google Sheets и FTP. Замеряются время, пропускная способность
+и пиковая резидентная память каждого этапа /collect_products и всего запроса, а также
+полного и инкрементального обновления остатков /stock_tick.
+
+Результаты вместе с примененными порогами сохраняются в tests/benchmarks/results/.
+Запуск завершается с кодом 1, если превышен порог из thresholds.json или результат
+хуже предыдущего запуска того же размера больше чем на regression_tolerance.
+
+    python -m tests.benchmarks.run_benchmark --sizes 10000,100000,1000000
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+import psutil
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_ROOT = os.path.dirname(os.path.dirname(BENCHMARK_DIR))
+THRESHOLDS_FILE = os.path.join(BENCHMARK_DIR, 'thresholds.json')
+RESULTS_DIR = os.path.join(BENCHMARK_DIR, 'results')
+
+# Доля товаров, остаток которых меняется перед инкрементальным обновлением
+STOCK_CHANGE_RATIO = 0.01
+MB = 1024 * 1024
+
+
+class RssSampler(threading.Thread):
+    """
+    Фоновый замер резидентной памяти процесса для поиска пиков внутри этапов.
+    """
+
+    def __init__(self, interval=0.01):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.process = psutil.Process()
+        self.samples = []
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.is_set():
+            self.sample()
+            time.sleep(self.interval)
+
+    def sample(self):
+        rss = self.process.memory_info().rss
+        self.samples.append((time.perf_counter(), rss))
+        return rss
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+
+    def peak(self, started, finished):
+        values = [rss for moment, rss in self.samples if started <= moment <= finished]
+        return max(values) if values else self.sample()
+
+
+@contextmanager
+def measure(sampler, size):
+    """
+    Замеряет блок кода: время, пропускную способность и пик памяти.
+    """
+    measurement = {}
+    sampler.sample()
+    started = time.perf_counter()
+    try:
+        yield measurement
+    finally:
+        finished = time.perf_counter()
+        sampler.sample()
+        measurement.update(window_report(sampler, size, started, finished))
+
+
+def window_report(sampler, size, started, finished):
+    seconds = finished - started
+    return {
+        "seconds": round(seconds, 3),
+        "products_per_second": round(size / seconds, 1) if seconds > 0 else None,
+        "peak_rss_mb": round(sampler.peak(started, finished) / MB, 1),
+    }
+
+
+def app_environment(upstreams, workdir):
+    """
+    Переменные окружения приложения: заглушки внешних сервисов и данные во временном каталоге.
+    """
+    env = upstreams.env()
+    for name in ('ARCHIVE_DIR', 'JSON_DIR', 'XML_DIR', 'PROFILE_DIR', 'STATE_DIR'):
+        env[name] = os.path.join(workdir, name.lower()[:-4])
+    env['CATALOG_DB_URL'] = 'sqlite:///' + os.path.join(workdir, 'catalog.db')
+    env['SCHEDULER_ENABLED'] = 'false'
+    return env
+
+
+def run_worker(size, seed, output):
+    """
+    Выполняет один замер в текущем процессе. Окружение приложения настраивается
+    до его импорта, поэтому замер выполняется в отдельном процессе на каждый размер.
+    """
+    from tests.standins.upstreams import Upstreams
+
+    workdir = os.path.dirname(os.path.abspath(output))
+    with Upstreams(size, seed) as upstreams:
+        os.environ.update(app_environment(upstreams, workdir))
+        os.environ['METRICS_RSS_SAMPLE_INTERVAL'] = '0'
+
+        from fastapi.testclient import TestClient
+        from app.main import app
+        from app.services.product_collector_service import product_collector_service
+
+        sampler = RssSampler()
+        windows = []
+        original_stage = product_collector_service.stage
+
+        @contextmanager
+        def timed_stage(name):
+            started = time.perf_counter()
+            try:
+                with original_stage(name):
+                    yield
+            finally:
+                windows.append((name, started, time.perf_counter()))
+
+        product_collector_service.stage = timed_stage
+        sampler.start()
+        report = {"size": size, "seed": seed, "baseline_rss_mb": round(sampler.sample() / MB, 1)}
+
+        with TestClient(app) as client:
+            with measure(sampler, size) as end_to_end:
+                response = client.get('/collect_products')
+            body = response.json()
+            if response.status_code != 200 or body.get('errors'):
+                raise RuntimeError(f"Сбор данных завершился с ошибкой: {response.status_code} {body}")
+            report["end_to_end"] = end_to_end
+            report["stages"] = {
+                name: window_report(sampler, size, started, finished) for name, started, finished in windows
+            }
+
+            with measure(sampler, size) as full_tick:
+                client.get('/stock_tick').raise_for_status()
+            changed = upstreams.change_stock(max(int(size * STOCK_CHANGE_RATIO), 1))
+            with measure(sampler, changed) as incremental_tick:
+                tick = client.get('/stock_tick')
+            tick.raise_for_status()
+            full_tick["changed_products"] = 0
+            incremental_tick["changed_products"] = tick.json().get("changed_products")
+            report["stock_tick_full"] = full_tick
+            report["stock_tick_incremental"] = incremental_tick
+
+        sampler.stop()
+        report["peak_rss_mb"] = round(max(rss for _, rss in sampler.samples) / MB, 1)
+        report["upstream_requests"] = {name: stats["requests"] for name, stats in upstreams.stats().items()}
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+def limit_for(rule, key, size):
+    """
+    Порог метрики для каталога заданного размера: <key>_base + <key>_per_1k * size / 1000.
+    """
+    if f"{key}_base" not in rule and f"{key}_per_1k" not in rule:
+        return None
+    return rule.get(f"{key}_base", 0) + rule.get(f"{key}_per_1k", 0) * size / 1000
+
+
+def evaluate(report, thresholds, baseline):
+    """
+    Сравнивает замеры с порогами и с предыдущим результатом того же размера.
+
+    :return: Список проверок с полем passed
+    """
+    size = report["size"]
+    tolerance = thresholds.get("regression_tolerance", 0.25)
+    min_seconds = thresholds.get("min_compared_seconds", 1.0)
+    measurements = {
+        "end_to_end": report["end_to_end"],
+        "stock_tick_full": report["stock_tick_full"],
+        "stock_tick_incremental": report["stock_tick_incremental"],
+    }
+    measurements.update({f"stages.{name}": value for name, value in report["stages"].items()})
+
+    checks = []
+    for name, value in measurements.items():
+        rule_name = name.split('.', 1)[1] if name.startswith('stages.') else name
+        rule = thresholds.get("stages", {}).get(rule_name, {}) if name.startswith('stages.') else thresholds.get(name, {})
+        for key, metric in (("max_seconds", "seconds"), ("max_peak_rss_mb", "peak_rss_mb")):
+            limit = limit_for(rule, key, size)
+            if limit is not None:
+                checks.append({
+                    "check": f"{name}.{metric}", "kind": "threshold", "value": value[metric],
+                    "limit": round(limit, 3), "passed": value[metric] <= limit,
+                })
+            previous = baseline_value(baseline, name, metric)
+            if previous is not None and (metric != "seconds" or previous >= min_seconds):
+                limit = previous * (1 + tolerance)
+                checks.append({
+                    "check": f"{name}.{metric}", "kind": "regression", "value": value[metric],
+                    "baseline": previous, "limit": round(limit, 3), "passed": value[metric] <= limit,
+                })
+    return checks
+
+
+def baseline_value(baseline, name, metric):
+    if not baseline:
+        return None
+    section = baseline["measurements"]
+    for part in name.split('.'):
+        section = section.get(part) if isinstance(section, dict) else None
+    return section.get(metric) if isinstance(section, dict) else None
+
+
+def latest_result(results_dir, size):
+    """
+    Последний сохраненный результат для каталога того же размера.
+    """
+    if not os.path.isdir(results_dir):
+        return None
+    suffix = f"-{size}.json"
+    names = sorted(name for name in os.listdir(results_dir) if name.endswith(suffix))
+    if not names:
+        return None
+    with open(os.path.join(results_dir, names[-1]), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_size(size, seed, workdir, timeout):
+    """
+    Запускает замер одного размера каталога в отдельном процессе.
+    """
+    output = os.path.join(workdir, 'measurement.json')
+    log_path = os.path.join(workdir, 'app.log')
+    with open(log_path, 'w', encoding='utf-8') as log:
+        completed = subprocess.run(
+            [sys.executable, '-m', 'tests.benchmarks.run_benchmark', '--worker',
+             '--size', str(size), '--seed', str(seed), '--output', output],
+            cwd=REPO_ROOT, stdout=log, stderr=subprocess.STDOUT, timeout=timeout
+        )
+    if completed.returncode != 0:
+        with open(log_path, 'r', encoding='utf-8', errors='replace') as log:
+            tail = log.readlines()[-30:]
+        raise RuntimeError(f"Замер для {size} товаров завершился с ошибкой:\n{''.join(tail)}")
+    with open(output, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def run_benchmark(sizes, seed=0, thresholds_file=THRESHOLDS_FILE, results_dir=RESULTS_DIR, save=True,
+                  keep_workdir=False, timeout=None):
+    """
+    Выполняет замеры для всех размеров каталога.
+
+    :return: Список результатов с проверками порогов
+    """
+    with open(thresholds_file, 'r', encoding='utf-8') as f:
+        thresholds = json.load(f)
+
+    results = []
+    for size in sizes:
+        workdir = tempfile.mkdtemp(prefix=f'warehouse-bench-{size}-')
+        try:
+            measurements = run_size(size, seed, workdir, timeout)
+        finally:
+            if not keep_workdir:
+                shutil.rmtree(workdir, ignore_errors=True)
+
+        baseline = latest_result(results_dir, size)
+        checks = evaluate(measurements, thresholds, baseline)
+        result = {
+            "timestamp": datetime.now().strftime("%Y%m%d-%H%M%S"),
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "size": size,
+            "measurements": measurements,
+            "thresholds": thresholds,
+            "baseline": {"timestamp": baseline["timestamp"], "revision": baseline["revision"]} if baseline else None,
+            "checks": checks,
+            "passed": all(check["passed"] for check in checks),
+        }
+        if save:
+            os.makedirs(results_dir, exist_ok=True)
+            path = os.path.join(results_dir, f"{result['timestamp']}-{size}.json")
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(result, f, ensure_ascii=False, indent=2)
+            result["path"] = path
+        results.append(result)
+    return results
+
+
+def print_summary(result):
+    measurements = result["measurements"]
+    print(f"\nКаталог {result['size']} товаров ({result['revision']})")
+    print(f"{'этап':<24}{'секунды':>10}{'товаров/с':>14}{'пик RSS, МБ':>14}")
+    rows = [(f"  {name}", value) for name, value in measurements["stages"].items()]
+    rows += [(name, measurements[name]) for name in ('end_to_end', 'stock_tick_full', 'stock_tick_incremental')]
+    for name, value in rows:
+        print(f"{name:<24}{value['seconds']:>10}{value['products_per_second'] or '-':>14}{value['peak_rss_mb']:>14}")
+    for check in result["checks"]:
+        if not check["passed"]:
+            print(f"НЕ ПРОЙДЕНО {check['kind']} {check['check']}: {check['value']} > {check['limit']}")
+    if result.get("path"):
+        print(f"Результат сохранен: {result['path']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сквозной бенчмарк сбора данных о товарах")
+    parser.add_argument('--sizes', default='10000', help="Размеры каталога через запятую, например 10000,100000,1000000")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--thresholds', default=THRESHOLDS_FILE)
+    parser.add_argument('--results-dir', default=RESULTS_DIR)
+    parser.add_argument('--no-save', action='store_true', help="Не сохранять результат")
+    parser.add_argument('--keep-workdir', action='store_true', help="Не удалять временные данные приложения")
+    parser.add_argument('--timeout', type=float, default=None, help="Ограничение времени замера одного размера")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--size', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--output', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args.size, args.seed, args.output)
+        return
+
+    sizes = [int(size) for size in args.sizes.split(',') if size]
+    results = run_benchmark(sizes, args.seed, args.thresholds, args.results_dir, not args.no_save,
+                            args.keep_workdir, args.timeout)
+    for result in results:
+        print_summary(result)
+    sys.exit(0 if all(result["passed"] for result in results) else 1)
+
+
+if __name__ == "__main__":
+    main()
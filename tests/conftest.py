@@ -0,0 +1,30 @@
+"""
+Окружение приложения для тестов, выполняемых в процессе pytest: внешние сервисы
+недоступны (обращения к ним подменяются в тестах), данные во временном каталоге.
+Задается до импорта приложения, так как настройки читаются при импорте.
+"""
+import os
+import tempfile
+
+WORKDIR = tempfile.mkdtemp(prefix='warehouse-sync-tests-')
+
+os.environ.update({
+    'MY_SKLAD_API_URL': 'http://127.0.0.1:9/api/remap/1.2',
+    'MY_SKLAD_LOGIN': 'test',
+    'MY_SKLAD_PASSWORD': 'test',
+    'WOO_URL': 'http://127.0.0.1:9',
+    'GOOGLE_SHEETS_ENDPOINT': 'http://127.0.0.1:9/',
+    'FTP_HOST': '127.0.0.1',
+    'FTP_USER': 'test',
+    'FTP_PASSWORD': 'test',
+    'DATA_DIR': WORKDIR,
+    'ARCHIVE_DIR': os.path.join(WORKDIR, 'arc'),
+    'JSON_DIR': os.path.join(WORKDIR, 'json'),
+    'XML_DIR': os.path.join(WORKDIR, 'xml'),
+    'PROFILE_DIR': os.path.join(WORKDIR, 'profiles'),
+    'STATE_DIR': os.path.join(WORKDIR, 'state'),
+    'OUTPUT_FILE': os.path.join(WORKDIR, 'products.json'),
+    'CATALOG_DB_URL': 'sqlite:///' + os.path.join(WORKDIR, 'catalog.db'),
+    'SCHEDULER_ENABLED': 'false',
+    'METRICS_RSS_SAMPLE_INTERVAL': '0',
+})
@@ -0,0 +1,93 @@
+"""
+Минимальный FTP сервер для бенчмарков: USER, PASS, TYPE, PASV, LIST, RETR, QUIT.
+
+Список файлов формируется из изображений SyntheticCatalog, содержимое файлов синтетическое.
+"""
+import socket
+import socketserver
+import threading
+
+IMAGE_SIZE = 2048
+
+
+class FTPHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode('utf-8'))
+
+    def transfer(self, passive, data):
+        self.reply('150 Opening data connection')
+        connection, _ = passive.accept()
+        with connection:
+            connection.sendall(data)
+        passive.close()
+        self.reply('226 Transfer complete')
+
+    def handle(self):
+        passive = None
+        self.reply('220 Warehouse sync FTP stand-in')
+        try:
+            while True:
+                line = self.rfile.readline()
+                if not line:
+                    break
+                command, _, argument = line.decode('utf-8', 'replace').strip().partition(' ')
+                command = command.upper()
+                if command == 'USER':
+                    self.reply('331 Password required')
+                elif command == 'PASS':
+                    self.reply('230 Logged in')
+                elif command == 'TYPE':
+                    self.reply('200 Type set')
+                elif command == 'PASV':
+                    passive = socket.create_server(('127.0.0.1', 0))
+                    port = passive.getsockname()[1]
+                    self.reply(f'227 Entering Passive Mode (127,0,0,1,{port >> 8},{port & 255})')
+                elif command in ('LIST', 'RETR'):
+                    if passive is None:
+                        self.reply('425 Use PASV first')
+                        continue
+                    data = self.server.listing() if command == 'LIST' else image_content(argument)
+                    self.transfer(passive, data)
+                    passive = None
+                    self.server.stats[command.lower()] += 1
+                elif command == 'QUIT':
+                    self.reply('221 Bye')
+                    break
+                else:
+                    self.reply('502 Command not implemented')
+        finally:
+            if passive is not None:
+                passive.close()
+
+
+def image_content(filename):
+    seed = filename.encode('utf-8')
+    body = (seed * (IMAGE_SIZE // max(len(seed), 1) + 1))[:IMAGE_SIZE - 4]
+    return b'\xff\xd8' + body + b'\xff\xd9'
+
+
+class FTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, catalog, address=('127.0.0.1', 0)):
+        super().__init__(address, FTPHandler)
+        self.catalog = catalog
+        self.stats = {'list': 0, 'retr': 0}
+        self._listing = None
+        self._listing_lock = threading.Lock()
+
+    def listing(self):
+        with self._listing_lock:
+            if self._listing is None:
+                self._listing = ''.join(
+                    f"-rw-r--r-- 1 ftp ftp {IMAGE_SIZE} Jan 01 00:00 {name}\r\n"
+                    for name in self.catalog.images()
+                ).encode('utf-8')
+            return self._listing
+
+
+def start_ftp_server(catalog):
+    server = FTPServer(catalog)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
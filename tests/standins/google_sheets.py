@@ -0,0 +1,56 @@
+"""
+Заглушка Google Sheets API v4 для GOOGLE_SHEETS_ENDPOINT.
+
+Хранит только первые столбцы строк (id, артикул, код): их читают проверка количества
+загруженных строк и поиск строк по коду при частичном обновлении.
+"""
+from aiohttp import web
+
+STORED_COLUMNS = 3
+
+
+def column_index(cell_range):
+    """Индекс столбца из диапазона вида Data!C:C."""
+    letter = cell_range.split('!')[-1][:1].upper()
+    return ord(letter) - ord('A') if letter.isalpha() else 0
+
+
+def create_app():
+    rows = []
+    stats = {'requests': 0, 'appended_rows': 0, 'updated_cells': 0}
+
+    async def handle(request):
+        stats['requests'] += 1
+        path = request.path
+        if path == '/_bench/stats':
+            return web.json_response(dict(stats, rows=len(rows)))
+        if not path.startswith('/v4/spreadsheets/'):
+            raise web.HTTPNotFound()
+        rest = path[len('/v4/spreadsheets/'):]
+
+        if request.method == 'GET' and '/values/' not in rest:
+            return web.json_response({'sheets': [{'properties': {'sheetId': 0, 'title': 'Data'}}]})
+        if rest.endswith(':batchUpdate'):
+            body = await request.json()
+            stats['updated_cells'] += len(body.get('data', []))
+            return web.json_response({})
+
+        cell_range = rest.split('/values/', 1)[1]
+        if cell_range.endswith(':clear'):
+            rows.clear()
+            return web.json_response({})
+        if cell_range.endswith(':append'):
+            body = await request.json()
+            values = body.get('values', [])
+            rows.extend(row[:STORED_COLUMNS] for row in values)
+            stats['appended_rows'] += len(values)
+            return web.json_response({'updates': {'updatedRows': len(values)}})
+
+        column = column_index(cell_range)
+        return web.json_response({
+            'values': [[row[column]] if column < len(row) else [] for row in rows]
+        })
+
+    app = web.Application(client_max_size=256 * 1024 * 1024)
+    app.router.add_route('*', '/{tail:.*}', handle)
+    return app
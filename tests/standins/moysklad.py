@@ -0,0 +1,97 @@
+"""
+Заглушка API МойСклад для бенчмарков: токен, ассортимент, отчеты по остаткам.
+
+Страницы отдаются из SyntheticCatalog по мере запроса, поэтому размер каталога
+ограничен только временем ответа, а не памятью заглушки.
+"""
+import json
+from datetime import datetime
+import pytz
+from aiohttp import web
+
+API_PATH = '/api/remap/1.2'
+moscow_tz = pytz.timezone('Europe/Moscow')
+
+
+def json_response(data):
+    return web.Response(text=json.dumps(data, ensure_ascii=False), content_type='application/json')
+
+
+def page(request, catalog, build_row, indexes=None):
+    offset = int(request.query.get('offset', 0))
+    limit = min(int(request.query.get('limit', 1000)), 1000)
+    if indexes is None:
+        indexes = range(catalog.size)
+    rows = [build_row(i) for i in indexes[offset:offset + limit]]
+    return json_response({'meta': {'size': len(indexes), 'limit': limit, 'offset': offset}, 'rows': rows})
+
+
+def filter_indexes(catalog, expression):
+    """
+    Поддерживает фильтры, которые использует приложение: id=a;id=b и updated>=момент.
+    """
+    ids = []
+    updated_since = None
+    for condition in expression.split(';'):
+        if condition.startswith('id='):
+            ids.append(condition[3:])
+        elif condition.startswith('updated>='):
+            updated_since = condition[len('updated>='):]
+    if ids:
+        indexes = [catalog.index_of(product_id) for product_id in ids]
+        return [i for i in indexes if i is not None]
+    if updated_since:
+        return [i for i in range(catalog.size) if catalog.updated(i) >= updated_since]
+    return list(range(catalog.size))
+
+
+def create_app(catalog):
+    stats = {'requests': 0}
+
+    @web.middleware
+    async def count_requests(request, handler):
+        stats['requests'] += 1
+        return await handler(request)
+
+    async def token(request):
+        return web.json_response({'access_token': 'benchmark-token'}, status=201)
+
+    async def assortment(request):
+        expression = request.query.get('filter')
+        indexes = filter_indexes(catalog, expression) if expression else None
+        return page(request, catalog, catalog.assortment_row, indexes)
+
+    async def stock_all(request):
+        return page(request, catalog, catalog.stock_row)
+
+    async def stock_by_store(request):
+        return page(request, catalog, catalog.balance_row)
+
+    async def stock_current(request):
+        changed_since = request.query.get('changedSince')
+        if changed_since:
+            rows = [
+                {'assortmentId': product_id, 'stock': stock}
+                for product_id, (stock, moment) in catalog.stock_changes.items() if moment >= changed_since
+            ]
+        else:
+            rows = [{'assortmentId': catalog.product_id(i), 'stock': catalog.stock(i)} for i in range(catalog.size)]
+        return json_response(rows)
+
+    async def change_stock(request):
+        moment = datetime.now(moscow_tz).strftime("%Y-%m-%d %H:%M:%S")
+        changed = catalog.change_stock(int(request.query.get('count', 100)), moment)
+        return web.json_response({'changed': len(changed)})
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(middlewares=[count_requests])
+    app.router.add_post(f'{API_PATH}/security/token', token)
+    app.router.add_get(f'{API_PATH}/entity/assortment', assortment)
+    app.router.add_get(f'{API_PATH}/report/stock/all', stock_all)
+    app.router.add_get(f'{API_PATH}/report/stock/bystore', stock_by_store)
+    app.router.add_get(f'{API_PATH}/report/stock/all/current', stock_current)
+    app.router.add_post('/_bench/stock_changes', change_stock)
+    app.router.add_get('/_bench/stats', get_stats)
+    return app
@@ -0,0 +1,60 @@
+"""
+Локальная замена МойСклад, отправляющая вебхуки на запущенный сервер.
+
+Пример: python -m tests.standins.moysklad_webhooks --url http://localhost:8000 --products 5 --documents 1
+"""
+import argparse
+import uuid
+import requests
+
+API_URL = "https://api.moysklad.ru/api/remap/1.2"
+
+
+def entity_event(entity_type, entity_id, action="UPDATE"):
+    return {
+        "meta": {
+            "type": entity_type,
+            "href": f"{API_URL}/entity/{entity_type}/{entity_id}"
+        },
+        "action": action,
+        "accountId": "00000000-0000-0000-0000-000000000000"
+    }
+
+
+def build_payload(product_ids=(), document_count=0):
+    events = [entity_event("product", product_id) for product_id in product_ids]
+    events += [entity_event("demand", str(uuid.uuid4()), "CREATE") for _ in range(document_count)]
+    return {"auditContext": {"uid": "admin@standin", "moment": "2024-01-01 00:00:00"}, "events": events}
+
+
+def build_stock_payload():
+    return {
+        "accountId": "00000000-0000-0000-0000-000000000000",
+        "stockType": "stock",
+        "reportType": "all",
+        "reportUrl": f"{API_URL}/report/stock/all/current?changedSince=2024-01-01 00:00:00"
+    }
+
+
+def post_events(base_url, payload, token=''):
+    params = {"token": token} if token else None
+    return requests.post(f"{base_url}/webhooks/moysklad", json=payload, params=params, timeout=10)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Отправка тестовых вебхуков МойСклад")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--token", default="")
+    parser.add_argument("--products", nargs="*", default=[], help="ID товаров для событий UPDATE")
+    parser.add_argument("--documents", type=int, default=0, help="Количество событий складских документов")
+    parser.add_argument("--stock", action="store_true", help="Отправить вебхук изменения остатков")
+    args = parser.parse_args()
+
+    payload = build_stock_payload() if args.stock else build_payload(args.products, args.documents)
+    response = post_events(args.url, payload, args.token)
+    print(f"Status Code: {response.status_code}")
+    print(f"Response Content: {response.text}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Запуск всех заглушек внешних сервисов (МойСклад, WooCommerce, Google Sheets, FTP)
+в отдельном процессе, чтобы их память и процессорное время не влияли на замеры приложения.
+
+Запуск вручную для работы приложения с заглушками:
+    python -m tests.standins.upstreams --size 100000
+"""
+import argparse
+import asyncio
+import multiprocessing
+import requests
+from aiohttp import web
+from tests.benchmarks.catalog import SyntheticCatalog
+from tests.standins import moysklad, woocommerce, google_sheets
+from tests.standins.ftp import start_ftp_server
+
+HOST = '127.0.0.1'
+
+
+async def start_app(app):
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, HOST, 0)
+    await site.start()
+    return runner.addresses[0][1]
+
+
+def serve(size, seed, connection):
+    catalog = SyntheticCatalog(size, seed)
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    ports = {
+        'moysklad': loop.run_until_complete(start_app(moysklad.create_app(catalog))),
+        'woocommerce': loop.run_until_complete(start_app(woocommerce.create_app(catalog))),
+        'sheets': loop.run_until_complete(start_app(google_sheets.create_app())),
+        'ftp': start_ftp_server(catalog).server_address[1],
+    }
+    connection.send(ports)
+    connection.close()
+    loop.run_forever()
+
+
+class Upstreams:
+    """
+    Контекстный менеджер, запускающий заглушки для каталога заданного размера.
+    """
+
+    def __init__(self, size, seed=0):
+        self.size = size
+        self.seed = seed
+        self.process = None
+        self.ports = None
+
+    def __enter__(self):
+        context = multiprocessing.get_context('spawn')
+        receiver, sender = context.Pipe(duplex=False)
+        self.process = context.Process(target=serve, args=(self.size, self.seed, sender), daemon=True)
+        self.process.start()
+        if not receiver.poll(60):
+            self.process.terminate()
+            raise RuntimeError("Заглушки внешних сервисов не запустились")
+        self.ports = receiver.recv()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.process.terminate()
+        self.process.join(10)
+        return False
+
+    def url(self, name):
+        return f"http://{HOST}:{self.ports[name]}"
+
+    def env(self):
+        """
+        Переменные окружения, направляющие приложение на заглушки.
+        """
+        return {
+            'MY_SKLAD_API_URL': f"{self.url('moysklad')}{moysklad.API_PATH}",
+            'MY_SKLAD_LOGIN': 'benchmark',
+            'MY_SKLAD_PASSWORD': 'benchmark',
+            'WOO_URL': self.url('woocommerce'),
+            'GOOGLE_SHEETS_ENDPOINT': f"{self.url('sheets')}/",
+            'FTP_HOST': HOST,
+            'FTP_PORT': str(self.ports['ftp']),
+            'FTP_USER': 'benchmark',
+            'FTP_PASSWORD': 'benchmark',
+        }
+
+    def change_stock(self, count):
+        response = requests.post(f"{self.url('moysklad')}/_bench/stock_changes", params={'count': count})
+        response.raise_for_status()
+        return response.json()['changed']
+
+    def stats(self):
+        return {
+            name: requests.get(f"{self.url(name)}/_bench/stats").json()
+            for name in ('moysklad', 'woocommerce', 'sheets')
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Заглушки внешних сервисов для локального запуска приложения")
+    parser.add_argument('--size', type=int, default=10000, help="Количество товаров синтетического каталога")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    with Upstreams(args.size, args.seed) as upstreams:
+        for name, value in upstreams.env().items():
+            print(f"export {name}={value}")
+        try:
+            upstreams.process.join()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
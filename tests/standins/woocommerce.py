@@ -0,0 +1,86 @@
+"""
+Заглушка REST API WooCommerce: поиск товаров по SKU, пакетные и одиночные обновление и создание.
+
+Все коды синтетического каталога считаются существующими товарами магазина; без фильтра
+по SKU список товаров отдается постранично (page, per_page) с заголовком X-WP-TotalPages.
+Поля, записанные обновлениями и созданиями, сохраняются и возвращаются в списке товаров.
+"""
+from aiohttp import web
+
+API_PATH = '/wp-json/wc/v3'
+
+
+def product_id(sku):
+    return int(sku[1:]) + 1 if sku[1:].isdigit() else None
+
+
+def create_app(catalog=None):
+    skus = []
+    if catalog is not None:
+        skus = [catalog.code(i) for i in range(catalog.size) if not catalog.is_duplicate(i)]
+    # Записанные поля товаров: ID -> поля
+    products = {}
+
+    def product(sku):
+        return {**products.get(product_id(sku), {}), 'id': product_id(sku), 'sku': sku}
+
+    def select_fields(item, request):
+        fields = [f for f in request.query.get('_fields', '').split(',') if f]
+        return {f: item[f] for f in fields if f in item} if fields else item
+
+    def save(product_id_, fields):
+        products.setdefault(product_id_, {}).update({k: v for k, v in fields.items() if k != 'id'})
+
+    stats = {'requests': 0, 'updated': 0, 'created': 0}
+
+    @web.middleware
+    async def count_requests(request, handler):
+        stats['requests'] += 1
+        return await handler(request)
+
+    async def list_products(request):
+        if 'sku' not in request.query:
+            per_page = int(request.query.get('per_page', 10))
+            page = int(request.query.get('page', 1))
+            items = skus[(page - 1) * per_page:page * per_page]
+            total_pages = (len(skus) + per_page - 1) // per_page
+            return web.json_response(
+                [select_fields(product(sku), request) for sku in items],
+                headers={'X-WP-Total': str(len(skus)), 'X-WP-TotalPages': str(total_pages)}
+            )
+        requested = [sku for sku in request.query['sku'].split(',') if sku]
+        return web.json_response([select_fields(product(sku), request) for sku in requested if product_id(sku)])
+
+    async def batch(request):
+        body = await request.json()
+        updated = [{'id': item['id']} for item in body.get('update', [])]
+        created = [{'id': product_id(item.get('sku', '')) or 0, 'sku': item.get('sku')} for item in body.get('create', [])]
+        for item in body.get('update', []):
+            save(item['id'], item)
+        for item, result in zip(body.get('create', []), created):
+            save(result['id'], item)
+        stats['updated'] += len(updated)
+        stats['created'] += len(created)
+        return web.json_response({'update': updated, 'create': created})
+
+    async def update_product(request):
+        stats['updated'] += 1
+        save(int(request.match_info['id']), await request.json())
+        return web.json_response({'id': int(request.match_info['id'])})
+
+    async def create_product(request):
+        body = await request.json()
+        stats['created'] += 1
+        save(product_id(body.get('sku', '')) or 0, body)
+        return web.json_response({'id': product_id(body.get('sku', '')) or 0, **body}, status=201)
+
+    async def get_stats(request):
+        return web.json_response(stats)
+
+    app = web.Application(middlewares=[count_requests])
+    app.router.add_get(f'{API_PATH}/products', list_products)
+    app.router.add_post(f'{API_PATH}/products', create_product)
+    app.router.add_post(f'{API_PATH}/products/batch', batch)
+    app.router.add_put(f'{API_PATH}/products/{{id}}', update_product)
+    app.router.add_get('/_bench/stats', get_stats)
+    return app
@@ -0,0 +1,14 @@
+from fastapi.testclient import TestClient
+from app import main
+from app.config import settings
+
+
+def test_startup_tasks_are_kept_and_cancelled_on_shutdown(monkeypatch):
+    monkeypatch.setattr(settings, 'METRICS_RSS_SAMPLE_INTERVAL', 60)
+    with TestClient(main.app):
+        tasks = list(main.background_tasks)
+        assert len(tasks) == 2
+        # Замер памяти работает до остановки приложения
+        assert not tasks[0].done()
+    assert all(task.done() for task in tasks)
+    assert main.background_tasks == []
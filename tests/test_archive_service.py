@@ -0,0 +1,23 @@
+from app.services.archive_service import archive_service
+
+ROWS = [{"id": str(i), "name": f"Товар {i}"} for i in range(25)]
+
+
+def test_archived_list_is_read_page_by_page():
+    writer = archive_service.writer('test_pages')
+    writer.write(ROWS[:10])
+    writer.write(ROWS[10:])
+    writer.close()
+    writer.future.result(10)
+    name = writer.archive_path.rsplit('/', 1)[-1]
+
+    assert archive_service.load_archive(name, 0, 10) == {"items": ROWS[:10], "next_offset": 10}
+    assert archive_service.load_archive(name, 20, 10) == {"items": ROWS[20:], "next_offset": None}
+    assert archive_service.load_archive(name, 30, 10) == {"items": [], "next_offset": None}
+
+
+def test_archived_object_is_returned_whole():
+    path = archive_service.save('test_object', {"rows": ROWS[:2], "meta": {"size": 2}})
+    archive_service.shutdown()
+    name = path.rsplit('/', 1)[-1]
+    assert archive_service.load_archive(name, 0, 1) == {"data": {"rows": ROWS[:2], "meta": {"size": 2}}}
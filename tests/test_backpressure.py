@@ -0,0 +1,53 @@
+import asyncio
+from app.config import settings
+from app.utils import backpressure as backpressure_module
+from app.utils.backpressure import MemoryBackpressure
+
+MB = 1024 * 1024
+
+
+def make_backpressure(monkeypatch, rss):
+    monkeypatch.setattr(settings, 'MEMORY_BUDGET_MB', 100)
+    monkeypatch.setattr(settings, 'FETCH_MIN_PAGE_SIZE', 100)
+    monkeypatch.setattr(settings, 'FETCH_MAX_PAGE_SIZE', 1000)
+    monkeypatch.setattr(settings, 'FETCH_MAX_CONCURRENCY', 4)
+    monkeypatch.setattr(backpressure_module, 'sample_rss', lambda: rss[0])
+    return MemoryBackpressure()
+
+
+def test_page_size_and_concurrency_follow_memory_pressure(monkeypatch):
+    rss = [10 * MB]
+    pressure = make_backpressure(monkeypatch, rss)
+    assert pressure.next_window() == (1000, 4)
+
+    rss[0] = 75 * MB
+    assert pressure.level() == 'soft'
+    assert pressure.next_window() == (500, 2)
+    assert pressure.next_window() == (250, 1)
+    assert pressure.buffer_limit() == 250
+
+    rss[0] = 95 * MB
+    assert pressure.next_window() == (100, 1)
+
+    # После снижения памяти параметры растут постепенно, не выше максимума
+    rss[0] = 10 * MB
+    assert pressure.next_window() == (200, 2)
+    for _ in range(5):
+        pressure.next_window()
+    assert (pressure.page_size, pressure.concurrency) == (1000, 4)
+
+
+def test_loading_waits_while_memory_is_above_hard_limit(monkeypatch):
+    rss = [95 * MB]
+    pressure = make_backpressure(monkeypatch, rss)
+    monkeypatch.setattr(settings, 'MEMORY_MAX_WAIT', 5)
+    sleeps = []
+
+    async def sleep(delay):
+        sleeps.append(delay)
+        if len(sleeps) == 2:
+            rss[0] = 50 * MB
+
+    monkeypatch.setattr(backpressure_module.asyncio, 'sleep', sleep)
+    asyncio.run(pressure.wait_for_memory())
+    assert sleeps == [0.25, 0.5]
@@ -0,0 +1,11 @@
+from tests.benchmarks.run_benchmark import run_benchmark, print_summary
+
+def test_collect_products_benchmark_smoke():
+    # Небольшой каталог: проверяет, что сбор данных проходит на заглушках и укладывается в пороги
+    results = run_benchmark([2000], save=False, timeout=300)
+    for result in results:
+        print_summary(result)
+    assert all(result["passed"] for result in results)
+
+if __name__ == "__main__":
+    test_collect_products_benchmark_smoke()
@@ -0,0 +1,75 @@
+import pytest
+from app.services.catalog_index import CatalogIndex, encode_cursor, decode_cursor
+from app.services.catalog_snapshot import catalog_snapshot, write_snapshot
+
+
+def product(code, product_id, pathname, store, stock, updated="2024-01-01 00:00:00"):
+    return {"id": product_id, "code": code, "name": f"Товар {code}", "pathname": pathname,
+            "store": store, "stock": stock, "updated": updated}
+
+
+CATALOG = [
+    product("C3", "3", "Одежда/Куртки", "Основной", 5),
+    product("C1", "1", "Одежда", "Основной, Дальний", 0),
+    product("C2", "b", "Обувь", "Дальний", 12, "2024-03-01 00:00:00"),
+    product("C2", "a", "Одежда/Брюки", "Основной", 3),
+    product("C4", "4", "Одеждами", "Основной", 7),
+]
+
+
+def publish(catalog):
+    write_snapshot(catalog, catalog_snapshot.path)
+    index = CatalogIndex()
+    index.refresh()
+    return index
+
+
+def codes(items):
+    return [(item["code"], item["id"]) for item in items]
+
+
+def pages(index, limit, **filters):
+    result, cursor = [], None
+    while True:
+        items, cursor = index.query(cursor=cursor, limit=limit, **filters)
+        result.append(codes(items))
+        if cursor is None:
+            return result
+
+
+def test_pages_follow_code_and_id_order():
+    index = publish(CATALOG)
+    assert pages(index, 2) == [
+        [("C1", "1"), ("C2", "a")], [("C2", "b"), ("C3", "3")], [("C4", "4")]
+    ]
+    items, cursor = index.query(limit=5, fields=["code", "stock"])
+    assert items[0] == {"code": "C1", "stock": 0} and cursor is None
+
+
+def test_filters_by_category_store_stock_and_update_date():
+    index = publish(CATALOG)
+    # Подкатегории входят в выборку, категория с тем же началом имени - нет
+    assert pages(index, 2, category="Одежда") == [[("C1", "1"), ("C2", "a")], [("C3", "3")]]
+    assert pages(index, 10, store="Дальний") == [[("C1", "1"), ("C2", "b")]]
+    assert pages(index, 10, category="Одежда", store="Основной", stock_min=1) == [[("C2", "a"), ("C3", "3")]]
+    assert pages(index, 10, stock_max=4) == [[("C1", "1"), ("C2", "a")]]
+    assert pages(index, 10, updated_since="2024-02-01") == [[("C2", "b")]]
+
+
+def test_cursor_stays_valid_across_snapshot_versions():
+    index = publish(CATALOG)
+    first, cursor = index.query(limit=2)
+    assert codes(first) == [("C1", "1"), ("C2", "a")]
+
+    # В новой версии каталога товар перед курсором удален, после курсора - добавлен
+    updated = [item for item in CATALOG if item["code"] != "C1"] + [product("C2", "c", "Обувь", "Основной", 1)]
+    index = publish(updated)
+    items, _ = index.query(cursor=cursor, limit=10)
+    assert codes(items) == [("C2", "b"), ("C2", "c"), ("C3", "3"), ("C4", "4")]
+
+
+def test_invalid_cursor_is_rejected():
+    assert decode_cursor(encode_cursor(("C1", "1"))) == ("C1", "1")
+    index = publish(CATALOG)
+    with pytest.raises(ValueError, match="Некорректный курсор"):
+        index.query(cursor="не курсор")
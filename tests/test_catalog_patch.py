@@ -0,0 +1,58 @@
+import os
+from app.config import settings
+from app.services.catalog_snapshot import catalog_snapshot, write_snapshot, SnapshotView
+from app.services.catalog_store import catalog_store
+from app.services.change_tracker import change_tracker
+from app.services.product_collector_service import product_collector_service
+from app.utils import json_codec
+
+CATALOG = [
+    {"id": "p1", "code": "C1", "article": "A1", "name": "Товар 1", "pathname": "Обувь", "store": "Склад А",
+     "salePrice": 10.0, "stock": 1, "updated": "2024-01-01 00:00:00"},
+    {"id": "p2", "code": "C2", "article": "A2", "name": "Товар 2", "pathname": "Обувь", "store": "Склад А, Склад Б",
+     "salePrice": 20.0, "stock": 2, "updated": "2024-01-01 00:00:00"},
+    {"id": "p3", "code": "C3", "article": "A3", "name": "Товар 3", "pathname": "Сумки", "store": "Склад Б",
+     "salePrice": 30.0, "stock": 3, "updated": "2024-01-01 00:00:00"},
+]
+
+
+def view_contents(view):
+    postings = {kind: {name: list(view.postings(kind, name)) for name in view.names(kind)}
+                for kind in ("categories", "stores")}
+    records = [(view.key(i), view.record(i), view.stock(i), view.updated(i)) for i in range(len(view))]
+    return records, postings
+
+
+def test_patch_updates_rows_snapshot_and_change_run(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, 'CATALOG_OUTPUT_DEBOUNCE', 60)
+    catalog = [dict(product) for product in CATALOG]
+    catalog_store.save_catalog(catalog)
+    write_snapshot(catalog, catalog_snapshot.path)
+    build = change_tracker.diff(catalog)
+    change_tracker.commit(build)
+    change_tracker.mark_applied('sheets', build.run_id)
+
+    patched, changes = product_collector_service.patch_catalog({"C2": {"stock": 9, "pathname": "Сумки", "store": "Склад Б"}})
+
+    assert [product["id"] for product in patched] == ["p2"]
+    expected = [dict(product) for product in CATALOG]
+    expected[1].update(stock=9, pathname="Сумки", store="Склад Б")
+    assert {p["id"]: p for p in catalog_store.load_catalog()}["p2"]["pathname"] == "Сумки"
+
+    # Точечно обновленный снимок совпадает со снимком, записанным полностью
+    full_path = str(tmp_path / "full.snap")
+    write_snapshot(expected, full_path)
+    assert view_contents(catalog_snapshot.current()) == view_contents(SnapshotView(full_path))
+
+    # Изменение сохранено отдельным запуском, канал, применивший прошлый запуск, остается в синхронизации
+    assert changes.previous_run_id == build.run_id
+    assert changes.updates() == {"C2": {"pathname": "Сумки", "store": "Склад Б", "stock": 9}}
+    assert catalog_store.list_change_runs(limit=1)[0]["run_id"] == changes.run_id
+    assert change_tracker.in_sync('sheets', changes.previous_run_id)
+    assert not change_tracker.diff(expected).changed
+
+    # Файлы каталога перезаписываются отложенно
+    product_collector_service.flush_catalog_outputs()
+    catalog_file = os.path.join(settings.JSON_DIR, 'combined_products.json')
+    saved = {product["id"]: product for product in json_codec.load_file(catalog_file)}
+    assert saved["p2"]["stock"] == 9
@@ -0,0 +1,31 @@
+from sqlalchemy import select
+from app.services.catalog_store import catalog_store, store_balances_table
+
+
+def balances(item_id, stock_by_store):
+    return {"id": item_id, "stockByStore": stock_by_store}
+
+
+def stored_balances():
+    with catalog_store.engine.connect() as connection:
+        rows = connection.execute(select(store_balances_table.c.id, store_balances_table.c.store)).all()
+    return sorted(tuple(row) for row in rows)
+
+
+def test_replace_deletes_only_rows_missing_from_the_replacement():
+    replace = catalog_store.start_replace('balances')
+    replace.write([balances("1", {"Склад А": 1, "Склад Б": 2}), balances("2", {"Склад А": 3})])
+    replace.close()
+
+    first = catalog_store.start_replace('balances')
+    second = catalog_store.start_replace('balances')
+    first.write([balances("1", {"Склад А": 1})])
+    # Одновременная замена из другого процесса перезаписывает sync_id общих строк
+    second.write([balances("1", {"Склад А": 1}), balances("2", {"Склад А": 4})])
+    first.close()
+
+    # Удалены только строки, которых нет в первой замене; строка, входящая в нее,
+    # остается, хотя вторая замена записала ее со своим sync_id
+    assert stored_balances() == [("1", "Склад А")]
+    second.close()
+    assert stored_balances() == [("1", "Склад А")]
@@ -0,0 +1,79 @@
+import os
+from datetime import datetime
+import pytest
+from sqlalchemy import delete
+from app.services.catalog_store import (
+    catalog_store, content_hashes_table, change_runs_table, catalog_changes_table
+)
+from app.services.change_tracker import change_tracker
+
+
+@pytest.fixture(autouse=True)
+def empty_tracker():
+    catalog_store.init()
+    with catalog_store.engine.begin() as connection:
+        for table in (content_hashes_table, change_runs_table, catalog_changes_table):
+            connection.execute(delete(table))
+    if os.path.exists(change_tracker.state_file):
+        os.remove(change_tracker.state_file)
+    yield
+
+
+def product(product_id, price, stock=1):
+    return {"id": product_id, "code": f"C-{product_id}", "name": f"Товар {product_id}", "salePrice": price, "stock": stock}
+
+
+def build(catalog):
+    changes = change_tracker.diff(catalog)
+    change_tracker.commit(changes)
+    return changes
+
+
+def test_diff_reports_new_changed_and_removed_products():
+    first = build([product("1", 10), product("2", 20), product("3", 30)])
+    assert [item[0]["id"] for item in first.new] == ["1", "2", "3"]
+
+    second = build([product("1", 10.0), product("2", 25), product("4", 40)])
+    assert second.previous_run_id == first.run_id
+    assert second.unchanged == 1
+    assert [(item[0]["id"], item[3]) for item in second.changed] == [("2", ["salePrice"])]
+    assert [item[0]["id"] for item in second.new] == ["4"]
+    assert second.removed == [("3", "C-3")]
+    assert second.updates() == {"C-2": {"salePrice": 25}}
+    assert [run["run_id"] for run in catalog_store.list_change_runs()] == [second.run_id, first.run_id]
+
+
+def test_empty_build_is_not_recorded_and_keeps_channels_in_sync():
+    first = build([product("1", 10)])
+    change_tracker.mark_applied("sheets", first.run_id)
+
+    unchanged = build([product("1", 10)])
+    assert unchanged.is_empty()
+    assert unchanged.run_id == first.run_id
+    assert len(catalog_store.list_change_runs()) == 1
+    assert change_tracker.in_sync("sheets", unchanged.previous_run_id)
+
+    changed = build([product("1", 11)])
+    assert change_tracker.in_sync("sheets", changed.previous_run_id)
+    assert not change_tracker.in_sync("woo:vtoman", changed.previous_run_id)
+
+
+def test_in_sync_walks_past_runs_without_changes():
+    first = build([product("1", 10)])
+    change_tracker.mark_applied("sheets", first.run_id)
+    # Пустой запуск, сохраненный до того, как пустые сборки перестали записываться
+    catalog_store.save_change_set(
+        {"run_id": "empty", "previous_run_id": first.run_id, "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f"),
+         "new": 0, "changed": 0, "removed": 0, "unchanged": 1},
+        [], [], [], 20
+    )
+    assert change_tracker.in_sync("sheets", "empty")
+
+    missed = build([product("1", 12)])
+    assert missed.previous_run_id == "empty"
+    change_tracker.mark_applied("sheets", first.run_id)
+    later = build([product("1", 13)])
+    # Канал пропустил запуск с изменениями - нужна полная выгрузка
+    assert not change_tracker.in_sync("sheets", later.previous_run_id)
+    change_tracker.mark_applied("sheets", later.run_id)
+    assert change_tracker.in_sync("sheets", later.run_id)
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from app.config import settings
+from app.services.fetch_cache import FetchCache
+
+
+def test_result_is_cached_for_ttl_and_force_fetches_again(monkeypatch):
+    monkeypatch.setattr(settings, 'FETCH_CACHE_TTL', 60)
+    monkeypatch.setattr(settings, 'FETCH_CACHE_TTLS', {'stock': 0})
+    cache = FetchCache()
+    calls = []
+
+    async def fetch():
+        calls.append(True)
+        return {"rows": len(calls)}
+
+    async def scenario():
+        first = await cache.get('assortment', fetch)
+        second = await cache.get('assortment', fetch)
+        forced = await cache.get('assortment', fetch, force=True)
+        # Набор с TTL 0 загружается при каждом запросе
+        await cache.get('stock', fetch)
+        await cache.get('stock', fetch)
+        return first, second, forced
+
+    first, second, forced = asyncio.run(scenario())
+    assert (first["rows"], first["cache"]["source"]) == (1, "upstream")
+    assert (second["rows"], second["cache"]["source"]) == (1, "cache")
+    assert (forced["rows"], forced["cache"]["source"]) == (2, "upstream")
+    assert len(calls) == 4
+
+
+def test_concurrent_requests_share_one_fetch():
+    cache = FetchCache()
+    calls = []
+
+    async def fetch():
+        calls.append(True)
+        await asyncio.sleep(0.05)
+        return {"rows": 1}
+
+    async def scenario():
+        return await asyncio.gather(*(cache.get('balances', fetch, force=True) for _ in range(3)))
+
+    results = asyncio.run(scenario())
+    assert len(calls) == 1
+    assert sorted(result["cache"]["source"] for result in results) == ["shared", "shared", "upstream"]
+
+
+def test_errors_are_not_cached():
+    cache = FetchCache()
+    calls = []
+
+    async def fetch():
+        calls.append(True)
+        if len(calls) == 1:
+            raise RuntimeError("МойСклад недоступен")
+        return {"rows": 1}
+
+    async def scenario():
+        with pytest.raises(RuntimeError):
+            await cache.get('assortment', fetch)
+        return await cache.get('assortment', fetch)
+
+    assert asyncio.run(scenario())["cache"]["source"] == "upstream"
+    assert len(calls) == 2
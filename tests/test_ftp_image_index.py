@@ -0,0 +1,35 @@
+import os
+import threading
+import time
+from app.services.ftp_service import ftp_service
+from app.utils import json_codec
+
+
+def test_stale_image_index_is_served_while_one_background_refresh_runs(monkeypatch):
+    json_codec.dump_file({"A1": [{"filename": "A1_1.jpg", "ftp_link": "ftp://host/A1_1.jpg"}]}, ftp_service.index_file)
+    stale = time.time() - 3600
+    os.utime(ftp_service.index_file, (stale, stale))
+    started = threading.Event()
+    release = threading.Event()
+    crawls = []
+
+    def get_image_links():
+        crawls.append(True)
+        started.set()
+        release.wait(5)
+        return {"A2": [{"filename": "A2_1.jpg", "ftp_link": "ftp://host/A2_1.jpg"}]}
+
+    monkeypatch.setattr(ftp_service, 'get_image_links', get_image_links)
+
+    # Пока FTP обходится в фоне, запросы сразу получают устаревший индекс
+    requested = time.monotonic()
+    for _ in range(3):
+        assert ftp_service.load_image_index(max_age=60)[2] == ["A1"]
+    assert time.monotonic() - requested < 1
+    assert started.wait(5)
+    assert crawls == [True]
+
+    release.set()
+    ftp_service._refresh_thread.join(5)
+    assert ftp_service.load_image_index(max_age=60)[2] == ["A2"]
+    assert crawls == [True]
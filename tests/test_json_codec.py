@@ -0,0 +1,63 @@
+import io
+import json
+import pytest
+from app.config import settings
+from app.utils import json_codec
+
+DATA = {"code": "C1", "name": "Товар «1»", "price": 10.5, "stock": 3, "links": ["a", "b"], "empty": None}
+
+
+@pytest.fixture(params=["orjson", "json"])
+def backend(request, monkeypatch):
+    if request.param == "json":
+        monkeypatch.setattr(json_codec, "orjson", None)
+    elif json_codec.orjson is None:
+        pytest.skip("orjson не установлен")
+    return request.param
+
+
+def test_compact_and_pretty_output_match_stdlib(backend):
+    assert json_codec.dumps(DATA) == json.dumps(DATA, ensure_ascii=False, separators=(',', ':'))
+    assert json_codec.dumps(DATA, pretty=True) == json.dumps(DATA, ensure_ascii=False, indent=2)
+    assert json_codec.dumpb(DATA) == json_codec.dumps(DATA).encode('utf-8')
+
+
+def test_loads_accepts_str_bytes_and_memoryview(backend):
+    encoded = json_codec.dumpb(DATA)
+    assert json_codec.loads(encoded) == DATA
+    assert json_codec.loads(encoded.decode('utf-8')) == DATA
+    assert json_codec.loads(memoryview(encoded)) == DATA
+
+
+def test_values_unsupported_by_orjson_fall_back_to_stdlib(backend):
+    data = {"big": 2 ** 70, 1: "числовой ключ"}
+    assert json_codec.loads(json_codec.dumpb(data)) == {"big": 2 ** 70, "1": "числовой ключ"}
+
+
+def test_dump_file_follows_json_pretty(backend, tmp_path, monkeypatch):
+    path = str(tmp_path / "data.json")
+    monkeypatch.setattr(settings, "JSON_PRETTY", False)
+    json_codec.dump_file(DATA, path)
+    assert open(path, encoding='utf-8').read() == json_codec.dumps(DATA)
+    monkeypatch.setattr(settings, "JSON_PRETTY", True)
+    json_codec.dump_file(DATA, path)
+    assert open(path, encoding='utf-8').read() == json.dumps(DATA, ensure_ascii=False, indent=2)
+    assert json_codec.load_file(path) == DATA
+    assert list(tmp_path.iterdir()) == [tmp_path / "data.json"]
+
+
+def test_response_uses_codec(backend):
+    assert json_codec.JsonResponse(DATA).body == json_codec.dumpb(DATA)
+
+
+def test_iter_array_reads_items_across_block_boundaries(monkeypatch):
+    monkeypatch.setattr(json_codec, "ARRAY_READ_SIZE", 3)
+    items = [DATA, 123456789, "строка ж", [1, [2]], None]
+    for pretty in (False, True):
+        encoded = json_codec.dumpb(items, pretty)
+        assert list(json_codec.iter_array(io.BytesIO(encoded[2:]), encoded[:2])) == items
+    assert list(json_codec.iter_array(io.BytesIO(b" [ ] "))) == []
+    with pytest.raises(ValueError):
+        list(json_codec.iter_array(io.BytesIO(b'{"a": 1}')))
+    with pytest.raises(ValueError):
+        list(json_codec.iter_array(io.BytesIO(b'[1, 2')))
@@ -0,0 +1,140 @@
+import time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.config import settings
+from app.services.catalog_store import catalog_store
+from app.services.product_merger import ProductMerger
+from app.services.stock_tick_service import stock_tick_service
+from app.services.google_sheets_service import google_sheets_service
+from app.services.webhook_service import webhook_service
+from tests.standins.moysklad_webhooks import build_payload
+
+PRODUCT_IDS = ["b4b1b2c8-0000-11ee-0a80-000000000001", "b4b1b2c8-0000-11ee-0a80-000000000002"]
+
+
+def entity(product_id, code, name, price, stock):
+    return {
+        "id": product_id, "code": code, "article": f"A-{code}", "externalCode": code,
+        "pathName": "Группа", "name": name, "description": "", "updated": "2024-01-01 00:00:00",
+        "salePrices": [{"value": price * 100}], "stock": stock,
+    }
+
+
+def wait_for(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_moysklad_webhooks_are_debounced_into_one_catalog_patch(monkeypatch):
+    catalog_store.save_catalog([
+        {**entity(PRODUCT_IDS[0], "C1", "Старое название", 10, 1), "pathname": "Группа", "salePrice": 10.0},
+        {**entity(PRODUCT_IDS[1], "C2", "Товар 2", 20, 2), "pathname": "Группа", "salePrice": 20.0},
+    ])
+    # Ответ МойСклад на запрос сущностей по ID: у первого товара изменились название и остаток
+    entities = {
+        PRODUCT_IDS[0]: entity(PRODUCT_IDS[0], "C1", "Новое название", 10, 5),
+        PRODUCT_IDS[1]: entity(PRODUCT_IDS[1], "C2", "Товар 2", 20, 2),
+    }
+    requests = []
+
+    async def request_json(endpoint, params):
+        requests.append((endpoint, params))
+        ids = [part.split('=', 1)[1] for part in params["filter"].split(';')]
+        return {"rows": [entities[entity_id] for entity_id in ids]}
+
+    ticks = []
+    woo_pushes = []
+
+    async def run_tick():
+        ticks.append(True)
+
+    async def push_to_woo(patched, updates):
+        woo_pushes.append(updates)
+        return len(patched)
+
+    monkeypatch.setattr(settings, 'WEBHOOK_DEBOUNCE', 0.5)
+    monkeypatch.setattr(stock_tick_service, 'request_json', request_json)
+    monkeypatch.setattr(stock_tick_service, 'run_tick', run_tick)
+    monkeypatch.setattr(stock_tick_service, 'push_to_woo', push_to_woo)
+    monkeypatch.setattr(google_sheets_service, 'update_cells_by_code', lambda updates: len(updates))
+    batches = webhook_service.stats["batches_processed"]
+
+    with TestClient(app) as client:
+        assert client.post("/webhooks/moysklad", json=[]).status_code == 400
+        assert client.post("/webhooks/moysklad", json={"events": "product"}).status_code == 400
+
+        response = client.post("/webhooks/moysklad", json=build_payload(PRODUCT_IDS[:1], document_count=1))
+        assert response.json() == {"accepted": 2}
+        response = client.post("/webhooks/moysklad", json=build_payload(PRODUCT_IDS))
+        assert response.json() == {"accepted": 2}
+        # До истечения паузы события только накапливаются
+        assert requests == []
+        assert client.get("/webhooks/moysklad").json()["pending_entities"] == 2
+
+        assert wait_for(lambda: webhook_service.stats["batches_processed"] > batches)
+
+    # Все события обработаны одной пачкой: один запрос сущностей и одно обновление остатков
+    assert len(requests) == 1
+    assert sorted(requests[0][1]["filter"].split(';')) == [f"id={product_id}" for product_id in PRODUCT_IDS]
+    assert ticks == [True]
+    assert woo_pushes == [{"C1": {"name": "Новое название", "stock": 5}}]
+    catalog = {product["code"]: product for product in catalog_store.load_catalog()}
+    assert catalog["C1"]["name"] == "Новое название"
+    assert int(catalog["C1"]["stock"]) == 5
+    assert catalog["C2"]["name"] == "Товар 2"
+    assert webhook_service.stats["last_error"] is None
+
+
+def test_webhook_for_merged_product_keeps_merge_rules():
+    # Товар каталога объединен из основной записи с артикулом и варианта без артикула:
+    # остаток и цена берутся из варианта (MERGE_RULES)
+    primary = {**entity("m-primary", "M1", "Товар", 10, 0), "pathname": "Группа", "salePrice": 10.0}
+    variant = {**entity("m-variant", "M1", "Товар", 12, 7), "article": "", "pathname": "Группа", "salePrice": 12.0}
+    catalog_store.save_assortment([primary, variant])
+    catalog_store.save_stock([primary, variant])
+    catalog = list(ProductMerger().merge(catalog_store.iter_combined(["M1"])))
+    assert len(catalog) == 1 and catalog[0]["stock"] == 7 and catalog[0]["salePrice"] == 12
+
+    # Изменение основной записи не затирает остаток и цену варианта
+    updates, unresolved = webhook_service.diff_entities(catalog, [entity("m-primary", "M1", "Новый товар", 15, 3)])
+    assert updates == {"M1": {"name": "Новый товар"}}
+    assert unresolved == []
+
+    updates, _ = webhook_service.diff_entities(catalog, [{**entity("m-variant", "M1", "Товар", 12, 9), "article": ""}])
+    assert updates == {"M1": {"stock": 9}}
+
+
+def test_failed_webhook_batch_is_retried(monkeypatch):
+    catalog_store.save_catalog([{**entity(PRODUCT_IDS[0], "C1", "Товар 1", 10, 1), "pathname": "Группа", "salePrice": 10.0}])
+    calls = []
+
+    async def request_json(endpoint, params):
+        calls.append(params)
+        if len(calls) == 1:
+            raise RuntimeError("МойСклад недоступен")
+        return {"rows": [entity(PRODUCT_IDS[0], "C1", "Товар 1", 10, 4)]}
+
+    pushed = []
+
+    async def push_updates(updates):
+        pushed.append(updates)
+
+    monkeypatch.setattr(settings, 'WEBHOOK_DEBOUNCE', 0.1)
+    monkeypatch.setattr(settings, 'WEBHOOK_RETRY_DELAY', 0.2)
+    monkeypatch.setattr(stock_tick_service, 'request_json', request_json)
+    monkeypatch.setattr(stock_tick_service, 'push_updates', push_updates)
+
+    with TestClient(app) as client:
+        client.post("/webhooks/moysklad", json=build_payload(PRODUCT_IDS[:1]))
+        assert wait_for(lambda: pushed)
+
+    assert len(calls) == 2
+    assert pushed == [{"C1": {"stock": 4}}]
+    assert webhook_service.stats["last_error"] is None
+
+
+if __name__ == "__main__":
+    import pytest
+    pytest.main([__file__])
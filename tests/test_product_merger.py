@@ -0,0 +1,68 @@
+import pytest
+from app.services.product_merger import ProductMerger
+
+
+def record(product_id, code, article='', stock=None, **fields):
+    return {"id": product_id, "code": code, "article": article, "stock": stock, **fields}
+
+
+def test_primary_is_first_record_with_article_and_variant_has_largest_stock():
+    merger = ProductMerger({'id': 'primary', 'name': 'primary', 'stock': 'variant', 'salePrice': 'variant'})
+    records = [
+        record("v1", "C1", stock=2, name="Вариант 1", salePrice=11),
+        record("p1", "C1", article="A1", stock=0, name="Основной", salePrice=10),
+        record("v2", "C1", stock=5, name="Вариант 2", salePrice=12),
+    ]
+    [merged] = merger.merge(records)
+    assert merged["id"] == "p1"
+    assert merged["name"] == "Основной"
+    assert merged["stock"] == 5
+    assert merged["salePrice"] == 12
+
+
+def test_group_without_articles_uses_first_record_as_primary():
+    [merged] = ProductMerger({'id': 'primary'}).merge([record("a", "C1", stock=1), record("b", "C1", stock=3)])
+    assert merged["id"] == "a"
+
+
+def test_sum_max_join_and_first_nonempty_rules():
+    merger = ProductMerger({
+        'id': 'primary', 'stock': 'sum', 'salePrice': 'max', 'store': 'join', 'description': 'first_nonempty',
+    })
+    records = [
+        record("p1", "C1", article="A1", stock=1.0, salePrice=10, store="Склад А", description=""),
+        record("v1", "C1", stock=2, salePrice="12.5", store="Склад Б, Склад А", description="Описание варианта"),
+        record("v2", "C1", stock="н/д", salePrice=None, store="", description="Другое"),
+    ]
+    [merged] = merger.merge(records)
+    assert merged["stock"] == 3
+    assert merged["salePrice"] == 12.5
+    assert merged["store"] == "Склад А, Склад Б"
+    assert merged["description"] == "Описание варианта"
+    # Поле без правила берется по правилу по умолчанию (primary)
+    assert merged["article"] == "A1"
+
+
+def test_article_conflicts_are_merged_or_kept_and_reported():
+    records = [record("p1", "C1", article="A1", stock=1), record("p2", "C1", article="A2", stock=2),
+               record("p3", "C2", stock=1), record("p4", "", stock=1), record("p5", "", stock=2)]
+
+    merger = ProductMerger({'id': 'primary'}, article_conflicts='merge')
+    merged = list(merger.merge(records))
+    assert [p["id"] for p in merged] == ["p1", "p3", "p4", "p5"]
+    assert merger.report == {
+        "input": 5, "output": 4, "groups_merged": 1, "records_merged": 2, "group_sizes": {"2": 1},
+        "article_conflicts": 1, "article_conflicts_kept": 0, "conflict_codes": ["C1"],
+    }
+
+    merger = ProductMerger({'id': 'primary'}, article_conflicts='keep')
+    assert [p["id"] for p in merger.merge(records)] == ["p1", "p2", "p3", "p4", "p5"]
+    assert merger.report["groups_merged"] == 0
+    assert merger.report["article_conflicts_kept"] == 1
+
+
+def test_unknown_rule_is_rejected():
+    with pytest.raises(ValueError):
+        ProductMerger({'stock': 'min'})
+    with pytest.raises(ValueError):
+        ProductMerger(article_conflicts='drop')
@@ -0,0 +1,39 @@
+import asyncio
+import time
+from app.services.scheduler_service import RefreshScheduler
+from app.services.product_collector_service import product_collector_service
+
+
+def test_manual_refresh_and_rebuild_loop_share_one_rebuild(monkeypatch):
+    scheduler = RefreshScheduler()
+    builds = []
+
+    async def fetch_dataset(name):
+        pass
+
+    def build_catalog():
+        builds.append(True)
+        time.sleep(0.1)
+        return [{"code": "C1"}], None, None
+
+    monkeypatch.setattr(scheduler, 'fetch_dataset', fetch_dataset)
+    monkeypatch.setattr(scheduler, 'file_fingerprint', lambda name: f"{name}-{len(builds)}")
+    monkeypatch.setattr(product_collector_service, 'build_catalog', build_catalog)
+
+    async def rebuild_loop_iteration():
+        await scheduler._rebuild_event.wait()
+        await scheduler.rebuild_catalog()
+
+    async def scenario():
+        # Фоновый цикл получает сигнал от ручного обновления и пересобирает одновременно с ним
+        loop_task = asyncio.create_task(rebuild_loop_iteration())
+        changed = await scheduler.refresh_and_rebuild('stock')
+        await loop_task
+        return changed
+
+    assert asyncio.run(scenario())
+    # Изменение учтено одной пересборкой, сигнал фоновому циклу снят
+    assert builds == [True]
+    assert not scheduler._rebuild_event.is_set()
+    assert scheduler.catalog["rebuilt_from"] == ['stock']
+    assert scheduler.catalog["total_products"] == 1
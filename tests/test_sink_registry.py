@@ -0,0 +1,56 @@
+import pytest
+from app.config import settings
+from app.services.sink_registry import SinkRegistry, sink_registry
+
+
+class ListSink:
+    def __init__(self):
+        self.rows = []
+        self.closed = False
+
+    def write(self, rows):
+        self.rows.extend(rows)
+
+    def close(self):
+        self.closed = True
+
+    def abort(self):
+        self.rows = []
+
+
+def test_validate_rejects_unknown_dataset_and_format(monkeypatch):
+    sink_registry.validate()
+
+    monkeypatch.setattr(settings, 'OUTPUT_SINKS', {'prices': ['json']})
+    with pytest.raises(ValueError, match="набор данных prices"):
+        sink_registry.validate()
+
+    monkeypatch.setattr(settings, 'OUTPUT_SINKS', {'stock': ['json', 'csv']})
+    with pytest.raises(ValueError, match="форматы csv"):
+        sink_registry.validate()
+
+    # Выгрузка в Google Sheets допустима только для каталога
+    monkeypatch.setattr(settings, 'OUTPUT_SINKS', {'stock': ['sheets']})
+    with pytest.raises(ValueError, match="форматы sheets"):
+        sink_registry.validate()
+
+
+def test_open_writes_selected_sinks_and_skips_service_formats(monkeypatch):
+    registry = SinkRegistry()
+    processed, raw = ListSink(), ListSink()
+    registry.register('memory', lambda dataset, filename, xml_root: processed)
+    registry.register('raw_memory', lambda dataset, filename, xml_root: raw, raw=True)
+    monkeypatch.setattr(settings, 'OUTPUT_SINKS', {'catalog': ['memory', 'raw_memory', 'sheets', 'memory']})
+    assert registry.enabled('catalog', 'sheets')
+    assert not registry.enabled('stock', 'memory')
+
+    required = ListSink()
+    sinks = registry.open('catalog', {'store': required})
+    assert sinks.formats() == ['store', 'memory', 'raw_memory']
+    sinks.write([{"code": "C1"}], [{"id": "1"}])
+    sinks.close()
+
+    assert required.rows == processed.rows == [{"code": "C1"}]
+    assert raw.rows == [{"id": "1"}]
+    assert required.closed and processed.closed and raw.closed
+    assert sinks.report()['memory']['rows'] == 1
@@ -0,0 +1,71 @@
+import asyncio
+from app.config.woo.stores import WooStoreConfig
+from app.services.woo.woo_service import WooService
+from app.utils import json_codec
+
+
+class FakeResponse:
+    def __init__(self, data, status_code=200):
+        self.content = json_codec.dumpb(data)
+        self.status_code = status_code
+        self.headers = {}
+
+
+def test_batch_update_counts_successes_and_evicts_missing_products():
+    store = WooService(WooStoreConfig(name='test-batch', url='http://127.0.0.1:9', consumer_key='k', consumer_secret='s'))
+    store.sku_map.update({'A1': 1, 'A2': 2, 'A3': 3}, True)
+    response = {"update": [
+        {"id": 1, "sku": "A1"},
+        {"id": 2, "error": {"code": "woocommerce_rest_product_invalid_id", "message": "Invalid ID.", "data": {"status": 400}}},
+        {"id": 3, "error": {"code": "woocommerce_rest_cannot_edit", "message": "Forbidden", "data": {"status": 403}}},
+    ]}
+    store.request = lambda method, endpoint, data=None, **kwargs: FakeResponse(response)
+
+    updated = asyncio.run(store.batch_update_products([{"id": 1}, {"id": 2}, {"id": 3}]))
+
+    assert updated == 1
+    # Соответствие удаляется только для товара, которого нет в магазине
+    assert store.sku_map.get('A2') is None
+    assert store.sku_map.get('A1') == 1
+    assert store.sku_map.get('A3') == 3
+    store.sku_map.update({}, True)
+
+
+class SnapshotView:
+    def __init__(self, products):
+        self.products = products
+
+    def __len__(self):
+        return len(self.products)
+
+    def record(self, position):
+        return self.products[position]
+
+
+def test_products_are_matched_by_mapped_sku_field():
+    store = WooService(WooStoreConfig(
+        name='test-sku-field', url='http://127.0.0.1:9', consumer_key='k', consumer_secret='s',
+        field_mapping={'sku': 'article'},
+    ))
+    catalog = [
+        {"code": "C1", "article": "ART-1", "name": "Товар 1", "description": "", "salePrice": 10, "stock": 1},
+        {"code": "C2", "article": "ART-2", "name": "Товар 2", "description": "", "salePrice": 20, "stock": 2},
+    ]
+    report = {"catalog_products": 0, "in_sync": 0, "different": 0, "field_differences": {}, "missing_in_woo": 0,
+              "samples": {"different": [], "missing_in_woo": [], "orphaned_in_woo": []}}
+    by_sku = {"ART-1": {"id": 11, "sku": "ART-1", "name": "Старое название"}, "C2": {"id": 12, "sku": "C2"}}
+
+    updates, creates = store.diff_catalog(SnapshotView(catalog), by_sku, report)
+
+    assert updates[0]["id"] == 11 and updates[0]["name"] == "Товар 1"
+    # Товар магазина с SKU, равным коду каталога, не считается товаром C2
+    assert [item["sku"] for item in creates] == ["ART-2"]
+    assert report["orphaned_in_woo"] == 1
+
+    updates, creates = store.split_products(catalog, {"ART-2": {"id": 12}})
+    assert [item["id"] for item in updates] == [12]
+    assert [item["sku"] for item in creates] == ["ART-1"]
+
+
+if __name__ == "__main__":
+    test_batch_update_counts_successes_and_evicts_missing_products()
@@ -0,0 +1,16 @@
+from app.services.woo.sku_map import WooSkuMap
+
+
+def test_update_before_load_keeps_persisted_mappings():
+    WooSkuMap('test-sku-map').update({'A1': 1, 'A2': 2}, True)
+
+    # Новый экземпляр (например, после перезапуска) дополняется до первого чтения
+    sku_map = WooSkuMap('test-sku-map')
+    sku_map.update({'A3': 3})
+    assert sku_map.get('A1') == 1
+    assert sku_map.get('A3') == 3
+    assert sku_map.sku_for(2) == 'A2'
+    assert len(WooSkuMap('test-sku-map')) == 3
+
+    sku_map.update({}, True)
+    assert len(WooSkuMap('test-sku-map')) == 0